@@ -0,0 +1,73 @@
+from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MIN_BATCH_SIZE = 100
+DEFAULT_MAX_BATCH_SIZE = 10000
+DEFAULT_BATCH_RETRIES = 3
+# Batches committing slower than this shrink, batches committing in less than half of it grow
+TARGET_COMMIT_SECONDS = 2.0
+GROWTH_FACTOR = 1.5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+# Batches shrink when less than this part of system memory is available
+LOW_MEMORY_RATIO = 0.1
+MEMINFO_FILE = '/proc/meminfo'
+
+
+def is_retriable_error(error):
+    """
+    Check if an error is transient, e.g. deadlock, lock timeout or cluster leader switch, so the failed transaction
+    can be retried
+    """
+    if isinstance(error, TransientError):
+        return error.is_retriable()
+    return isinstance(error, (ServiceUnavailable, SessionExpired))
+
+
+def get_retry_delay(attempt):
+    """
+    Exponential backoff delay (seconds) before given retry attempt, starting from 1
+    """
+    return min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+
+
+def is_memory_low():
+    """
+    Check available system memory, only supported on Linux, always False elsewhere
+    """
+    try:
+        meminfo = {}
+        with open(MEMINFO_FILE) as in_file:
+            for line in in_file:
+                name, value = line.split(':', 1)
+                meminfo[name] = int(value.split()[0])
+        return meminfo['MemAvailable'] < meminfo['MemTotal'] * LOW_MEMORY_RATIO
+    except (OSError, KeyError, ValueError, IndexError):
+        return False
+
+
+class AdaptiveBatchSize:
+    """
+    Number of rows written per transaction for one node type in split transactions mode.
+    Size grows while full batches commit fast, and shrinks when commits are slow, batches fail or memory is low.
+    """
+    def __init__(self, minimum=DEFAULT_MIN_BATCH_SIZE, maximum=DEFAULT_MAX_BATCH_SIZE, initial=DEFAULT_BATCH_SIZE):
+        if minimum < 1 or maximum < minimum:
+            raise ValueError('Invalid batch size bounds: {} - {}'.format(minimum, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = min(max(initial, minimum), maximum)
+
+    def update(self, rows, seconds):
+        """
+        Adjust size from a committed batch
+        :param rows: number of rows in the batch
+        :param seconds: time used to write and commit the batch
+        """
+        if is_memory_low() or seconds > TARGET_COMMIT_SECONDS:
+            self.shrink()
+        elif seconds < TARGET_COMMIT_SECONDS / 2 and rows >= self.size:
+            self.size = min(int(self.size * GROWTH_FACTOR), self.maximum)
+
+    def shrink(self):
+        self.size = max(self.size // 2, self.minimum)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+
+from bento.common.utils import get_logger, UUID
+from data_loader import DataLoader, NODE_TYPE, COLUMN_VALUE, check_encoding, convert_int, convert_float, \
+    BOOLEAN_TRUE_PATTERN, BOOLEAN_FALSE_PATTERN
+from icdc_schema import ICDC_Schema, is_parent_pointer
+from props import Props
+
+COLUMNAR_CHUNK_SIZE = 10000
+# Values matching these patterns are parsed by NumPy, exactly as int() and float() would, other values use the
+# row-wise converters
+INT_PATTERN = r'[+-]?[0-9]{1,18}'
+FLOAT_PATTERN = r'[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?'
+
+
+def is_columnar_compatible(file_name, field_count):
+    """
+    Check if pandas reads a data file the same way as csv.DictReader: no quotes, no line breaks other than \\n and
+    \\r\\n, and every non-blank line has as many fields as the header
+    :param file_name: data file
+    :param field_count: number of fields in header
+    :return: True if file can be read in columnar mode
+    """
+    if field_count < 2:
+        return False
+    with open(file_name, 'rb') as in_file:
+        for line in in_file:
+            line = line.rstrip(b'\n')
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            if not line:
+                continue
+            if b'"' in line or b'\r' in line or line.count(b'\t') != field_count - 1:
+                return False
+    return True
+
+
+class ColumnarDataLoader(DataLoader):
+    """
+    DataLoader that reads data files with pandas in chunks of dtype=str columns, and converts values column by column
+    using the column plans of prepare_node. Rows stored are identical to the row-wise reader.
+    Files pandas can't read the same way as csv.DictReader are read row by row.
+    """
+    def fill_row_store(self, store, file_name):
+        file_encoding = check_encoding(file_name)
+        with open(file_name, encoding=file_encoding) as in_file:
+            header = next(csv.reader(in_file, delimiter='\t'), [])
+        keys = tuple(key if not key else key.strip() for key in header)
+        if len(set(keys)) != len(keys) or not is_columnar_compatible(file_name, len(keys)):
+            self.log.info('File "{}" can\'t be read in columnar mode, reading it row by row'.format(file_name))
+            return super().fill_row_store(store, file_name)
+
+        with open(file_name, encoding=file_encoding) as in_file:
+            reader = pd.read_csv(in_file, sep='\t', header=None, skiprows=1, names=list(range(len(keys))),
+                                 index_col=False, dtype=str, na_filter=False, chunksize=COLUMNAR_CHUNK_SIZE)
+            line_num = 2
+            for chunk in reader:
+                self._add_chunk(store, keys, chunk.reset_index(drop=True), line_num)
+                line_num += len(chunk)
+
+    def _add_chunk(self, store, keys, chunk, line_num):
+        row_count = len(chunk)
+        # Remove extra spaces at beginning and end of the values, same as cleanup_node
+        columns = {key: chunk[index].astype(object).str.strip() for index, key in enumerate(keys)}
+        obj_values = list(zip(*[column.tolist() for column in columns.values()]))
+
+        prepared_rows = [None] * row_count
+        if NODE_TYPE in columns:
+            types = columns[NODE_TYPE]
+            for node_type in types.unique():
+                if not node_type:
+                    continue
+                index = np.flatnonzero((types == node_type).to_numpy(dtype=bool))
+                if len(index) == row_count:
+                    group = columns
+                else:
+                    group = {key: column.iloc[index].reset_index(drop=True) for key, column in columns.items()}
+                prepared_keys, prepared_values = self._prepare_columns(group, node_type)
+                for position, values in zip(index, prepared_values):
+                    prepared_rows[position] = (prepared_keys, values)
+
+        for position in range(row_count):
+            prepared = prepared_rows[position]
+            if prepared is None:
+                store.append_values(line_num + position, keys, obj_values[position])
+            else:
+                store.append_values(line_num + position, keys, obj_values[position], prepared[0], prepared[1])
+
+    def _prepare_columns(self, columns, node_type):
+        """
+        Prepare rows of one node type by column, same as prepare_node
+        :param columns: dict of column name -> Series of cleaned values
+        :param node_type: node type of all rows
+        :return: tuple of prepared keys, and list of prepared value tuples
+        """
+        row_count = len(columns[NODE_TYPE])
+        prepared = {}
+        for key, convert, parent_id_field, extra_props in self.get_column_plan(tuple(columns.keys()), node_type):
+            values = self._convert_column(columns[key], convert)
+            prepared[key] = values
+            if parent_id_field:
+                prepared[parent_id_field] = values
+            for extra_prop_name, extra_value in extra_props:
+                prepared[extra_prop_name] = values if extra_value is COLUMN_VALUE else [extra_value] * row_count
+        if UUID not in prepared:
+            prepared[UUID] = self._get_uuids(prepared, row_count)
+        return tuple(prepared.keys()), list(zip(*prepared.values()))
+
+    def _convert_column(self, column, convert):
+        if convert is None:
+            return column.tolist()
+        elif convert is convert_int:
+            return self._convert_numbers(column, INT_PATTERN, np.int64, convert_int)
+        elif convert is convert_float:
+            return self._convert_numbers(column, FLOAT_PATTERN, np.float64, convert_float)
+        elif convert == self._convert_boolean:
+            return self._convert_booleans(column)
+        else:
+            # Dates and arrays only depend on the value, convert each distinct value once
+            converted = {value: convert(value) for value in column.unique()}
+            return [converted[value] for value in column.tolist()]
+
+    @staticmethod
+    def _convert_numbers(column, pattern, dtype, convert):
+        values = np.full(len(column), None, dtype=object)
+        matched = column.str.fullmatch(pattern).to_numpy(dtype=bool)
+        if matched.any():
+            values[matched] = column[matched].to_numpy(dtype=str).astype(dtype).tolist()
+        for position in np.flatnonzero(~matched):
+            values[position] = convert(column.iat[position])
+        return values.tolist()
+
+    def _convert_booleans(self, column):
+        values = np.full(len(column), None, dtype=object)
+        true_values = column.str.contains(BOOLEAN_TRUE_PATTERN).to_numpy(dtype=bool)
+        false_values = ~true_values & column.str.contains(BOOLEAN_FALSE_PATTERN).to_numpy(dtype=bool)
+        values[true_values] = True
+        values[false_values] = False
+        for position in np.flatnonzero(~(true_values | false_values)):
+            self.log.debug('Unsupported Boolean value: "{}"'.format(column.iat[position]))
+        return values.tolist()
+
+    def _get_uuids(self, prepared, row_count):
+        # Type column may have been converted, use it the same way as prepare_node does
+        node_types = prepared[NODE_TYPE]
+        signatures = None
+        uuids = []
+        # Same ID or signature always gets same UUID, generate it once per chunk
+        generated = {}
+        for position in range(row_count):
+            node_type = node_types[position]
+            id_field = self.schema.get_id_field({NODE_TYPE: node_type})
+            id_values = prepared.get(id_field)
+            signature = id_values[position] if id_values is not None else None
+            if not signature:
+                if signatures is None:
+                    signatures = self._get_signatures(prepared, row_count)
+                signature = signatures[position]
+            uuid = generated.get((node_type, signature))
+            if uuid is None:
+                uuid = self.schema.get_uuid_for_node(node_type, signature)
+                generated[(node_type, signature)] = uuid
+            uuids.append(uuid)
+        return uuids
+
+    @staticmethod
+    def _get_signatures(prepared, row_count):
+        """
+        Build signatures of all rows by column, same as get_signature
+        """
+        parts = []
+        for key in sorted(prepared.keys()):
+            if not is_parent_pointer(key):
+                prefix = '{}: '.format(key)
+                parts.append([prefix + format(value) for value in prepared[key]])
+        if not parts:
+            return ['{  }'] * row_count
+        return ['{{ {} }}'.format(', '.join(row_parts)) for row_parts in zip(*parts)]
+
+
+def benchmark(schema, file_list, log):
+    """
+    Read data files with row-wise and columnar loaders, compare rows and report throughput
+    :return: True if both loaders produced identical rows
+    """
+    stores = []
+    for loader_class in [DataLoader, ColumnarDataLoader]:
+        loader = loader_class(None, schema)
+        start = timer()
+        rows = 0
+        for file_name in file_list:
+            rows += len(loader.get_row_store(file_name))
+        elapsed = timer() - start
+        log.info('{}: {} rows in {:.2f} seconds, {:.0f} rows/second'.format(loader_class.__name__, rows, elapsed,
+                                                                            rows / elapsed if elapsed else 0))
+        stores.append(loader)
+
+    identical = True
+    row_loader, columnar_loader = stores
+    for file_name in file_list:
+        if len(row_loader.get_row_store(file_name)) != len(columnar_loader.get_row_store(file_name)):
+            log.error('File "{}": numbers of rows are different!'.format(file_name))
+            identical = False
+            continue
+        for row, columnar_row in zip(row_loader.get_row_store(file_name), columnar_loader.get_row_store(file_name)):
+            if row != columnar_row or [type(v) for v in (row[2] or {}).values()] != \
+                    [type(v) for v in (columnar_row[2] or {}).values()]:
+                log.error('File "{}", line {}: rows are different!'.format(file_name, row[0]))
+                identical = False
+                break
+    for loader in stores:
+        loader.clear_row_stores()
+    return identical
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark columnar reading of data files against row-wise reading')
+    parser.add_argument('-s', '--schema', help='Schema files', action='append', required=True)
+    parser.add_argument('--prop-file', help='Property file, example is in config/props.example.yml', required=True)
+    parser.add_argument('files', help='Data files (TSV/TXT)', nargs='+')
+    return parser.parse_args()
+
+
+def main(args):
+    log = get_logger('Columnar Benchmark')
+    schema = ICDC_Schema(args.schema, Props(args.prop_file))
+    if benchmark(schema, args.files, log):
+        log.info('Rows read by both loaders are identical')
+    else:
+        log.error('Rows read by columnar loader are different from row-wise loader!')
+
+
+if __name__ == '__main__':
+    main(parse_arguments())
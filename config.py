@@ -43,6 +43,17 @@ class BentoConfig:
             self.dataset = None
             self.no_parents = None
             self.split_transactions = None
+            self.row_store_memory_limit = None
+            self.load_workers = None
+            self.columnar = None
+            self.fused = None
+            self.validation_workers = None
+            self.validation_chunk_size = None
+            self.validation_report_format = None
+            self.validate_sample = None
+            self.min_batch_size = None
+            self.max_batch_size = None
+            self.batch_retries = None
             self.upload_log_dir = None
             self.verbose = None
             self.database_type = "neo4j"
@@ -106,6 +117,17 @@ class BentoConfig:
                     self.dataset = config.get('dataset')
                     self.no_parents = config.get('no_parents')
                     self.split_transactions = config.get('split_transactions')
+                    self.row_store_memory_limit = config.get('row_store_memory_limit')
+                    self.load_workers = config.get('load_workers')
+                    self.columnar = config.get('columnar')
+                    self.fused = config.get('fused')
+                    self.validation_workers = config.get('validation_workers')
+                    self.validation_chunk_size = config.get('validation_chunk_size')
+                    self.validation_report_format = config.get('validation_report_format')
+                    self.validate_sample = config.get('validate_sample')
+                    self.min_batch_size = config.get('min_batch_size')
+                    self.max_batch_size = config.get('max_batch_size')
+                    self.batch_retries = config.get('batch_retries')
                     self.upload_log_dir = config.get('upload_log_dir')
                     self.verbose = config.get('verbose')
                     self.database_type = config.get("database_type")
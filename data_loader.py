@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import os
+import codecs
+import io
 from collections import deque
 import csv
 import re
@@ -9,6 +11,12 @@ import sys
 import platform
 import subprocess
 import json
+import random
+import threading
+from contextlib import nullcontext
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_EXCEPTION
 import pandas as pd
 import datetime
 from timeit import default_timer as timer
@@ -19,6 +27,11 @@ from create_index import create_index, NEO4J, MEMGRAPH
 from neo4j import Driver
 
 from icdc_schema import ICDC_Schema, is_parent_pointer
+from row_store import RowStore, RowStoreBudget, DEFAULT_MEMORY_LIMIT_MB
+from duplicate_ids import DuplicateIdDetector
+from validation_report import create_report, compress_line_numbers, XLSX_FORMAT
+from adaptive_batch import AdaptiveBatchSize, is_retriable_error, get_retry_delay, DEFAULT_MIN_BATCH_SIZE, \
+    DEFAULT_MAX_BATCH_SIZE, DEFAULT_BATCH_RETRIES
 from bento.common.utils import get_logger, NODES_CREATED, RELATIONSHIP_CREATED, UUID, \
     RELATIONSHIP_TYPE, MULTIPLIER, ONE_TO_ONE, DEFAULT_MULTIPLIER, UPSERT_MODE, \
     NEW_MODE, DELETE_MODE, NODES_DELETED, RELATIONSHIP_DELETED, NODES_UPDATED, combined_dict_counters, \
@@ -39,7 +52,19 @@ INT_NODE_CREATED = 'int_node_created'
 PROVIDED_PARENTS = 'provided_parents'
 RELATIONSHIP_PROPS = 'relationship_properties'
 BATCH_SIZE = 1000
+CHILD_ID_PARAM = '__childID__'
+PARENT_ID_PARAM = '__parentID__'
 OTHER = '__other__'
+ENCODING_CHUNK_SIZE = 1024 * 1024
+# Line number of the first row in data files, the header is line 1
+FIRST_LINE_NUM = 2
+BOOLEAN_TRUE_PATTERN = re.compile(r'yes|true', re.IGNORECASE)
+BOOLEAN_FALSE_PATTERN = re.compile(r'no|false', re.IGNORECASE)
+# Placeholder in column plans for values that are copied from the column being converted
+COLUMN_VALUE = object()
+
+# Encodings of data files, keyed by (absolute path, size, modification time)
+encoding_cache = {}
 
 maxInt = sys.maxsize
 while True:
@@ -114,15 +139,63 @@ def backup_neo4j(backup_dir, name, address, log):
 
 
 def check_encoding(file_name):
+    """
+    Detect encoding of a data file, UTF-8 if the whole file decodes as UTF-8, otherwise windows-1252
+    Detection decodes the file incrementally and stops at the first invalid byte, results are memoized until the
+    file changes, so each file is only scanned once per run
+    :param file_name: data file
+    :return: encoding name
+    """
     utf8 = 'utf-8'
     windows1252 = 'windows-1252'
+    file_stat = os.stat(file_name)
+    cache_key = (os.path.abspath(file_name), file_stat.st_size, file_stat.st_mtime_ns)
+    encoding = encoding_cache.get(cache_key)
+    if encoding:
+        return encoding
+
+    encoding = utf8
+    decoder = codecs.getincrementaldecoder(utf8)()
+    with open(file_name, 'rb') as file:
+        try:
+            while True:
+                data = file.read(ENCODING_CHUNK_SIZE)
+                decoder.decode(data, final=not data)
+                if not data:
+                    break
+        except UnicodeDecodeError:
+            encoding = windows1252
+    encoding_cache[cache_key] = encoding
+    return encoding
+
+
+def convert_int(value):
     try:
-        with open(file_name, encoding=utf8) as file:
-            for _ in file.readlines():
-                pass
-        return utf8
-    except UnicodeDecodeError:
-        return windows1252
+        if value is None:
+            return None
+        return int(value)
+    except ValueError:
+        return None
+
+
+def convert_float(value):
+    try:
+        if value is None:
+            return None
+        return float(value)
+    except ValueError:
+        return None
+
+
+def convert_date(value):
+    if value is None:
+        return None
+    return reformat_date(value)
+
+
+VALIDATION_RESULT_COLUMNS = ['File Name', 'Property', 'Value', 'Reason', 'Line Numbers', 'Severity']
+INVALID_COLUMNS = ['invalid_properties', 'invalid_values', 'invalid_reason', 'invalid_line_num', 'node_type']
+MISSING_COLUMNS = ['missing_properties', 'missing_reason', 'missing_line_num', 'node_type']
 
 
 # Mask all relationship properties, so they won't participate in property comparison
@@ -135,6 +208,125 @@ def get_props_signature(props):
     return signature
 
 
+def has_batch_api(plugin):
+    """
+    Check if a plugin can create nodes for a whole chunk of rows with create_nodes(session, event, rows), rows are
+    dicts of create_node keyword arguments, and a list of booleans (node created for the row) is returned
+    """
+    return callable(getattr(plugin, 'create_nodes', None))
+
+
+class OneToOneChecker:
+    """
+    Checks if one_to_one parents referenced by rows already have another child, with one query per batch of
+    references. Results are cached until the parents are invalidated by relationships written later.
+    """
+    def __init__(self, schema, rows):
+        """
+        :param schema: ICDC_Schema
+        :param rows: prepared nodes whose one_to_one references will be checked
+        """
+        self.schema = schema
+        # Pattern (node type, id field, relationship type, parent type, parent id field) -> (parent ID, child ID) set
+        self.references = {}
+        for obj in rows:
+            node_type = obj[NODE_TYPE]
+            id_field = self.schema.get_id_field(obj)
+            for key, value in obj.items():
+                if is_parent_pointer(key):
+                    parent_type, parent_id_field = key.split('.')
+                    relationship = self.schema.relationships.get(node_type, {}).get(parent_type)
+                    if isinstance(relationship, dict) and relationship[MULTIPLIER] == ONE_TO_ONE:
+                        pattern = (node_type, id_field, relationship[RELATIONSHIP_TYPE], parent_type,
+                                   parent_id_field)
+                        self.references.setdefault(pattern, set()).update(
+                            (parent_id, obj.get(id_field)) for parent_id in self.schema.get_list_values(value))
+        self.results = {}
+
+    def has_other_child(self, session, pattern, parent_id, child_id):
+        """
+        Check if a parent already has a child other than given child
+        :param session: session or transaction used to query DB, None if validating without DB
+        :param pattern: (node type, id field, relationship type, parent type, parent id field)
+        :return: True if the first child found is not the given child
+        """
+        if session is None:
+            return False
+        key = (pattern, parent_id, child_id)
+        if key not in self.results:
+            self._query(session, pattern, key)
+        return self.results[key]
+
+    def _query(self, session, pattern, key):
+        node_type, id_field, relationship_name, parent_type, parent_id_field = pattern
+        statement = 'UNWIND $rows AS row'
+        statement += ' MATCH (c:{0})-[:{1}]->(m:{2} {{ {3}: row.{4} }})'.format(node_type, relationship_name,
+                                                                              parent_type, parent_id_field,
+                                                                              PARENT_ID_PARAM)
+        statement += ' WITH row, collect(c)[0] AS c'
+        statement += ' OPTIONAL MATCH (n:{0} {{ {1}: row.{2} }})'.format(node_type, id_field, CHILD_ID_PARAM)
+        statement += ' RETURN row.{0} AS {0}, row.{1} AS {1}, n IS NULL OR id(c) <> id(n) AS conflict'.format(
+            PARENT_ID_PARAM, CHILD_ID_PARAM)
+        references = [(parent_id, child_id) for parent_id, child_id in self.references.get(pattern, ())
+                      if (pattern, parent_id, child_id) not in self.results]
+        if key[1:] not in self.references.get(pattern, ()):
+            references.append(key[1:])
+        for i in range(0, len(references), BATCH_SIZE):
+            batch = references[i:i + BATCH_SIZE]
+            conflicts = {}
+            result = session.run(statement, {'rows': [{PARENT_ID_PARAM: parent_id, CHILD_ID_PARAM: child_id}
+                                                      for parent_id, child_id in batch]})
+            for record in result:
+                # Same as querying one by one, first record of a reference decides
+                conflicts.setdefault((record[PARENT_ID_PARAM], record[CHILD_ID_PARAM]), record['conflict'])
+            for reference in batch:
+                self.results[(pattern,) + reference] = conflicts.get(reference, False)
+
+    def invalidate(self, pending_keys):
+        """
+        Forget results of parents whose relationships have been written or deleted
+        :param pending_keys: relationship keys from DataLoader._get_relationship_keys
+        """
+        parents = {key[1:] for key in pending_keys if key[0] == PARENT_ID_PARAM}
+        if parents:
+            self.results = {key: conflict for key, conflict in self.results.items()
+                            if (key[0][3], key[0][2], key[1]) not in parents}
+
+
+# DataLoader of a validation worker process, see init_validation_worker
+validation_loader = None
+
+
+def init_validation_worker(loader_class, schema, row_store_memory_limit):
+    """
+    Initialize a validation worker process, schema is pickled once per worker and its validators are compiled again
+    :param loader_class: DataLoader or a subclass of it
+    :param schema: ICDC_Schema object
+    :param row_store_memory_limit: memory (MB) used to keep rows in this worker
+    """
+    global validation_loader
+    validation_loader = loader_class(None, schema)
+    validation_loader.row_store_memory_limit = row_store_memory_limit
+    validation_loader.cheat_mode = False
+
+
+def validate_chunk_in_worker(file_name, file_encoding, start, end, verbose):
+    return validation_loader.validate_chunk(file_name, file_encoding, start, end, verbose)
+
+
+def validate_file_in_worker(file_name, max_violations, verbose):
+    """
+    Validate a data file in a validation worker process
+    :return: tuple of validation result, and dict of node type -> list of report frames
+    """
+    validation_loader.df_validation_dict = {}
+    try:
+        result = validation_loader.validate_file(file_name, max_violations, verbose)
+        return result, validation_loader.df_validation_dict
+    finally:
+        validation_loader.clear_row_stores()
+
+
 class DataLoader:
     def __init__(self, driver, schema, config=None, memgraph_snapshot_dir=None, plugins=None):
         if plugins is None:
@@ -144,8 +336,38 @@ class DataLoader:
         self.log = get_logger('Data Loader')
         self.driver = driver
         self.database_type = NEO4J
+        self.row_store_memory_limit = DEFAULT_MEMORY_LIMIT_MB
+        self.load_workers = 1
+        self.min_batch_size = DEFAULT_MIN_BATCH_SIZE
+        self.max_batch_size = DEFAULT_MAX_BATCH_SIZE
+        self.batch_retries = DEFAULT_BATCH_RETRIES
+        self.fused = False
+        self.validation_workers = 1
+        self.validation_chunk_size = None
+        self.validation_report_format = XLSX_FORMAT
+        self.validate_sample = None
         if config is not None:
             self.database_type = config.database_type
+            if config.row_store_memory_limit:
+                self.row_store_memory_limit = config.row_store_memory_limit
+            if config.load_workers:
+                self.load_workers = config.load_workers
+            if config.min_batch_size:
+                self.min_batch_size = config.min_batch_size
+            if config.max_batch_size:
+                self.max_batch_size = config.max_batch_size
+            if config.batch_retries is not None:
+                self.batch_retries = config.batch_retries
+            if config.fused:
+                self.fused = config.fused
+            if config.validation_workers:
+                self.validation_workers = config.validation_workers
+            if config.validation_chunk_size:
+                self.validation_chunk_size = config.validation_chunk_size
+            if config.validation_report_format:
+                self.validation_report_format = config.validation_report_format
+            if config.validate_sample:
+                self.validate_sample = config.validate_sample
 
         self.schema = schema
         self.rel_prop_delimiter = self.schema.rel_prop_delimiter
@@ -175,10 +397,86 @@ class DataLoader:
         self.relationships_stat = {}
         self.nodes_deleted_stat = {}
         self.relationships_deleted_stat = {}
+        # Nodes recorded for NODE_LOADED plugins, and (nodes processed, nodes created, seconds) of each plugin
+        self.loaded_nodes = []
+        self.plugin_timings = {}
         self.validation_result_file_key = ""
+        # Estimated error rates of properties from sample validation, keyed by file name
+        self.sample_error_rates = {}
+        # Report sink rows are streamed to while validating files, frames of each node type are kept in
+        # df_validation_dict when there is no sink, e.g. in validation workers
+        self.validation_report = None
         self.df_validation_dict = {}
         self.skip_validation_flag = False
         self.cheat_mode = True
+        # Parent IDs known to exist in DB, and all parent IDs checked against DB, keyed by (label, id field)
+        self.existing_parent_ids = {}
+        self.checked_parent_ids = {}
+        # IDs of nodes defined in data files being validated, keyed by (label, id field), None if not indexed
+        self.dataset_parent_ids = None
+        # Rows of data files, read and prepared once, shared by all validation and loading phases
+        self.row_stores = {}
+        # Memory shared by row stores of all files
+        self.row_store_budget = RowStoreBudget()
+        # Compiled column plans for prepare_node, keyed by (header, node type)
+        self.column_plans = {}
+        # Guards loading statistics when files are loaded by multiple workers
+        self.stats_lock = threading.Lock()
+        # Adaptive batch sizes in split transactions mode, keyed by node type
+        self.batch_sizes = {}
+        # Guards parent ID caches, batch sizes and column plans shared by loading workers
+        self.cache_lock = threading.Lock()
+
+    def get_row_store(self, file_name):
+        """
+        Get rows of a data file, file is read, cleaned and prepared on first call
+        :param file_name: data file
+        :return: RowStore that yields (line number, cleaned row, prepared row) tuples,
+                 prepared row is None for rows without a node type
+        """
+        store = self.row_stores.get(file_name)
+        if store is None:
+            # Memory limit may be changed after construction, e.g. in validation workers
+            self.row_store_budget.memory_limit = self.row_store_memory_limit * 1024 * 1024
+            store = RowStore(self.row_store_budget)
+            self.fill_row_store(store, file_name)
+            store.finish()
+            if store.is_spilled():
+                self.log.info('Rows of file "{}" are cached in a temporary file'.format(file_name))
+            self.row_stores[file_name] = store
+        return store
+
+    def fill_row_store(self, store, file_name):
+        """
+        Read, clean and prepare all rows of a data file into a row store
+        :param store: empty RowStore
+        :param file_name: data file
+        """
+        file_encoding = check_encoding(file_name)
+        with open(file_name, encoding=file_encoding) as in_file:
+            reader = csv.DictReader(in_file, delimiter='\t')
+            line_num = 1
+            for org_obj in reader:
+                line_num += 1
+                obj = self.cleanup_node(org_obj)
+                prepared = self.prepare_node(obj, file_name) if obj.get(NODE_TYPE) else None
+                store.append(line_num, obj, prepared)
+
+    def get_prepared_rows(self, file_name):
+        """
+        Iterate over prepared rows of a data file
+        :param file_name: data file
+        :return: generator of (line number, prepared row) tuples
+        """
+        for line_num, obj, prepared in self.get_row_store(file_name):
+            if prepared is None:
+                prepared = self.prepare_node(obj, file_name)
+            yield line_num, prepared
+
+    def clear_row_stores(self):
+        for store in self.row_stores.values():
+            store.close()
+        self.row_stores = {}
 
     def check_files(self, file_list):
         if not file_list:
@@ -196,31 +494,25 @@ class DataLoader:
         try:
             with self.driver.session() as session:
                 for txt in file_list:
-                    file_encoding = check_encoding(txt)
-                    with open(txt, encoding=file_encoding) as in_file:
-                        reader = csv.DictReader(in_file, delimiter='\t')
-                        line_number = 1
-                        for org_obj in reader:
-                            line_number += 1
-                            obj = self.cleanup_node(org_obj)
-                            id_field = self.schema.get_id_field(obj)
-                            if id_field not in obj.keys():
-                                self.log.error(f'Line: {line_number}: Required id field {id_field} is missing, validation failed')
-                                return False
-                            elif obj[id_field] is None:
-                                self.log.error(f'Line: {line_number}: Required id field {id_field} is None, validation failed')
-                                return False
-                            if NODE_TYPE not in obj.keys():
-                                self.log.error(f'Line: {line_number}: Required node type field {NODE_TYPE} is missing, validation failed')
-                                return True
-                            elif obj[NODE_TYPE] is None:
-                                self.log.error(f'Line: {line_number}: Required node type field {NODE_TYPE} is None, validation failed')
-                                return False
-                            node_type = obj.get(NODE_TYPE, None)
-                            if not self.node_exists(session, node_type, id_field, obj[id_field]):
-                                self.log.error(f'Line: {line_number}: The node to be deleted (:{obj[NODE_TYPE]} {{{id_field}: "{obj[id_field]}"}}) not found in DB!, validation failed')
-                                validation_result = False
-                            
+                    for line_number, obj, _ in self.get_row_store(txt):
+                        id_field = self.schema.get_id_field(obj)
+                        if id_field not in obj.keys():
+                            self.log.error(f'Line: {line_number}: Required id field {id_field} is missing, validation failed')
+                            return False
+                        elif obj[id_field] is None:
+                            self.log.error(f'Line: {line_number}: Required id field {id_field} is None, validation failed')
+                            return False
+                        if NODE_TYPE not in obj.keys():
+                            self.log.error(f'Line: {line_number}: Required node type field {NODE_TYPE} is missing, validation failed')
+                            return True
+                        elif obj[NODE_TYPE] is None:
+                            self.log.error(f'Line: {line_number}: Required node type field {NODE_TYPE} is None, validation failed')
+                            return False
+                        node_type = obj.get(NODE_TYPE, None)
+                        if not self.node_exists(session, node_type, id_field, obj[id_field]):
+                            self.log.error(f'Line: {line_number}: The node to be deleted (:{obj[NODE_TYPE]} {{{id_field}: "{obj[id_field]}"}}) not found in DB!, validation failed')
+                            validation_result = False
+                        
         except Exception as e:
             self.log.error(e)
             self.log.error("Delete file validation failed, abort the deletion")
@@ -234,23 +526,39 @@ class DataLoader:
                 self.cheat_mode = False
                 validation_failed = False
                 output_key_invalid = ""
-                for txt in file_list:
-                    validate_result = self.validate_file(txt, max_violations, verbose)
-                    if not validate_result:
-                        self.log.error('Validating file "{}" failed!'.format(txt))
-                        validation_failed = True
-                if validation_failed:
-                    if not os.path.exists(temp_folder):
-                        os.makedirs(temp_folder)
-                    df_validation_result_file_key = os.path.basename(os.path.dirname(file_list[0]))
-                    timestamp = get_time_stamp()
-                    output_key_invalid = os.path.join(temp_folder, df_validation_result_file_key) + "_" + timestamp + ".xlsx"
-                    #df_validation_result.to_csv(output_key_invalid, index=False)
-                    writer=pd.ExcelWriter(output_key_invalid, engine='xlsxwriter')
-                    for key in self.df_validation_dict.keys():
-                        sheet_name_new = key
-                        self.df_validation_dict[key].to_excel(writer,sheet_name=sheet_name_new, index=False)
-                    writer.close()
+                df_validation_result_file_key = os.path.basename(os.path.dirname(file_list[0]))
+                timestamp = get_time_stamp()
+                # Report rows are written as soon as each file is validated, report is removed if validation passed
+                self.validation_report = create_report(
+                    self.validation_report_format,
+                    os.path.join(temp_folder, df_validation_result_file_key) + "_" + timestamp,
+                    VALIDATION_RESULT_COLUMNS)
+                sample_stage = partial(self.validate_files_sample, file_list, self.validate_sample, verbose) \
+                    if self.validate_sample else None
+                try:
+                    # Full validation runs in the background while samples are validated, in a single worker
+                    # process if no validation workers are configured. Rows validated in worker processes aren't
+                    # kept in row stores, so files are read again when loading
+                    if sample_stage or (self.validation_workers > 1 and
+                                        (len(file_list) > 1 or self.validation_chunk_size)):
+                        validate_results = self.validate_files_in_workers(file_list, max_violations, verbose,
+                                                                          sample_stage)
+                    else:
+                        validate_results = (self.validate_file(txt, max_violations, verbose) for txt in file_list)
+                    for txt, validate_result in zip(file_list, validate_results):
+                        if not validate_result:
+                            self.log.error('Validating file "{}" failed!'.format(txt))
+                            validation_failed = True
+                    if validation_failed:
+                        self.validation_report.close()
+                        output_key_invalid = self.validation_report.file_name
+                    else:
+                        self.validation_report.discard()
+                except Exception:
+                    self.validation_report.discard()
+                    raise
+                finally:
+                    self.validation_report = None
 
                 self.validation_result_file_key = output_key_invalid
                 return not validation_failed
@@ -264,8 +572,228 @@ class DataLoader:
             self.log.info('Cheat mode enabled, all validations skipped!')
             return True
 
+    def validate_files_in_workers(self, file_list, max_violations, verbose, foreground=None):
+        """
+        Validate data files in a pool of worker processes, report frames are merged in the order of files,
+        so the report is the same as validating files one by one.
+        Files larger than validation_chunk_size are split into chunks validated by multiple workers.
+        Rows read by workers are not kept, files are read again when they are loaded
+        :param foreground: function run in this process while workers validate files, e.g. sample validation
+        :return: list of validation results in the order of files
+        """
+        tasks = []
+        results = []
+        self.log.info('Validating {} files with {} worker processes'.format(len(file_list), self.validation_workers))
+        with ProcessPoolExecutor(max_workers=self.validation_workers, initializer=init_validation_worker,
+                                 # Workers share the memory limit
+                                 initargs=(type(self), self.schema,
+                                           self.row_store_memory_limit / self.validation_workers)) as executor:
+            for txt in file_list:
+                chunks = self.get_validation_chunks(txt)
+                if chunks:
+                    file_encoding = check_encoding(txt)
+                    self.log.info('Validating file "{}" in {} chunks'.format(txt, len(chunks)))
+                    tasks.append([executor.submit(validate_chunk_in_worker, txt, file_encoding, start, end, verbose)
+                                  for start, end in chunks])
+                else:
+                    tasks.append(executor.submit(validate_file_in_worker, txt, max_violations, verbose))
+            if foreground:
+                foreground()
+            for txt, task in zip(file_list, tasks):
+                if isinstance(task, list):
+                    chunk_results = [future.result() for future in task]
+                    if None in chunk_results:
+                        self.log.info('File "{}" can\'t be split into chunks, validating it in one process'.format(
+                            txt))
+                        results.append(self.validate_file(txt, max_violations, verbose))
+                    else:
+                        records = self.get_chunk_records(chunk_results)
+                        results.append(self.validate_file(txt, max_violations, verbose, records))
+                    continue
+                validate_result, df_validation_dict = task.result()
+                for node_type, frames in df_validation_dict.items():
+                    for df_validation_result in frames:
+                        self.add_validation_result(node_type, df_validation_result)
+                results.append(validate_result)
+        return results
+
+    def validate_files_sample(self, file_list, sample_size, verbose):
+        """
+        Validate header, first rows and a random sample of rest of rows of each data file for early feedback,
+        duplicate IDs are not checked. Nothing is added to the validation report
+        :param sample_size: number of first rows, and number of rows sampled from rest of each file
+        :return: True if no errors found in samples
+        """
+        sample_failed = False
+        for txt in file_list:
+            if not self.validate_file_sample(txt, sample_size, verbose):
+                self.log.error('Sample validation of file "{}" failed!'.format(txt))
+                sample_failed = True
+        self.log.info('Sample validation {}, {}'.format('failed' if sample_failed else 'passed',
+                                                       'full validation continues'))
+        return not sample_failed
+
+    def get_sample_rows(self, file_name, sample_size):
+        """
+        Read first rows and a reservoir sample of rest of rows of a data file, only sampled rows are cleaned.
+        Sampling is seeded by file name, so same rows are sampled in every run
+        :return: tuple of sampled (line number, cleaned row) tuples of first rows and of rest of rows,
+                 and number of rows in file
+        """
+        first_rows = []
+        reservoir = []
+        sampler = random.Random(file_name)
+        row_count = 0
+        with open(file_name, encoding=check_encoding(file_name)) as in_file:
+            line_num = FIRST_LINE_NUM - 1
+            for org_obj in csv.DictReader(in_file, delimiter='\t'):
+                line_num += 1
+                row_count += 1
+                if len(first_rows) < sample_size:
+                    first_rows.append((line_num, org_obj))
+                    continue
+                rest_count = row_count - len(first_rows)
+                if len(reservoir) < sample_size:
+                    reservoir.append((line_num, org_obj))
+                else:
+                    position = sampler.randrange(rest_count)
+                    if position < sample_size:
+                        reservoir[position] = (line_num, org_obj)
+        reservoir.sort(key=lambda row: row[0])
+        return ([(line_num, self.cleanup_node(org_obj)) for line_num, org_obj in first_rows],
+                [(line_num, self.cleanup_node(org_obj)) for line_num, org_obj in reservoir], row_count)
+
+    def validate_file_sample(self, file_name, sample_size, verbose):
+        """
+        Validate header, first sample_size rows and sample_size rows sampled from rest of a data file.
+        Error rate of each property is estimated from errors in first rows plus errors in sampled rows scaled to
+        rest of file, rates are logged and kept in sample_error_rates
+        :return: True if no errors found in sampled rows
+        """
+        self.skip_validation_flag = False
+        self.log.info('Validating sample of file "{}" ...'.format(file_name))
+        # Header is validated again by full validation, keep sample results out of the report
+        report, df_validation_dict = self.validation_report, self.df_validation_dict
+        self.validation_report, self.df_validation_dict = None, {}
+        try:
+            if not self.validate_field_name(file_name):
+                return False
+        finally:
+            self.validation_report, self.df_validation_dict = report, df_validation_dict
+
+        first_rows, sampled_rows, row_count = self.get_sample_rows(file_name, sample_size)
+        rest_count = row_count - len(first_rows)
+        sample_failed = False
+        # Property -> [errors in first rows, errors in sampled rows]
+        errors = {}
+        for part, rows in enumerate([first_rows, sampled_rows]):
+            for line_num, _, _, _, _, validate_result in self.validate_rows(rows, verbose):
+                if validate_result is None:
+                    continue
+                for prop in set(validate_result.get('invalid_properties', []) +
+                                validate_result.get('missing_properties', [])):
+                    errors.setdefault(prop, [0, 0])[part] += 1
+                if not validate_result['result'] and not validate_result['warning']:
+                    sample_failed = True
+                    for msg in validate_result['messages']:
+                        self.log.error('Invalid data at line {}: "{}"!'.format(line_num, msg))
+
+        error_rates = {}
+        for prop, (first_errors, sampled_errors) in errors.items():
+            estimated_errors = first_errors
+            if sampled_rows:
+                estimated_errors += sampled_errors * rest_count / len(sampled_rows)
+            error_rates[prop] = estimated_errors / row_count
+            self.log.warning('File "{}", property "{}": estimated error rate {:.1%}, {} errors in {} sampled rows'
+                             .format(file_name, prop, error_rates[prop], first_errors + sampled_errors,
+                                     len(first_rows) + len(sampled_rows)))
+        self.sample_error_rates[file_name] = error_rates
+        self.log.info('{} of {} rows in file "{}" validated'.format(len(first_rows) + len(sampled_rows), row_count,
+                                                                  file_name))
+        return not sample_failed
+
+    def get_validation_chunks(self, file_name):
+        """
+        Split a data file larger than validation_chunk_size into byte ranges aligned to line boundaries
+        :param file_name: data file
+        :return: list of (start, end) byte offsets, or None if the file is not split
+        """
+        if not self.validation_chunk_size:
+            return None
+        chunk_bytes = int(self.validation_chunk_size * 1024 * 1024)
+        file_size = os.path.getsize(file_name)
+        if file_size <= chunk_bytes:
+            return None
+        chunks = []
+        with open(file_name, 'rb') as in_file:
+            if not in_file.readline().rstrip(b'\r\n'):
+                return None
+            start = in_file.tell()
+            while start < file_size:
+                in_file.seek(start + chunk_bytes)
+                in_file.readline()
+                end = min(in_file.tell(), file_size)
+                chunks.append((start, end))
+                start = end
+        return chunks
+
+    def validate_chunk(self, file_name, file_encoding, start, end, verbose):
+        """
+        Validate rows in a byte range of a data file, see validate_rows
+        :param file_name: data file
+        :param file_encoding: encoding of the whole file
+        :param start: offset of first byte, at the beginning of a line
+        :param end: offset after last byte, at the beginning of a line or end of file
+        :return: tuple of validation records with line numbers starting from 0, number of rows in chunk,
+                 and the exception raised by the row after the last record or None;
+                 None if rows can't be read from the chunk the same way as from the whole file
+        """
+        with open(file_name, 'rb') as in_file:
+            header = in_file.readline()
+            in_file.seek(start)
+            data = in_file.read(end - start)
+        # Quoted values may contain line breaks, and a \r not followed by \n is a line break when reading the whole file
+        for part in [header, data]:
+            if b'"' in part or part.count(b'\r') != part.count(b'\r\n'):
+                return None
+        field_names = next(csv.reader([header.decode(file_encoding).rstrip('\r\n')], delimiter='\t'))
+        reader = csv.DictReader(io.StringIO(data.decode(file_encoding).replace('\r\n', '\n')),
+                                fieldnames=field_names, delimiter='\t')
+        rows = [self.cleanup_node(org_obj) for org_obj in reader]
+        records = []
+        try:
+            for record in self.validate_rows(enumerate(rows), verbose):
+                records.append(record)
+        except Exception as e:
+            return records, len(rows), e
+        return records, len(rows), None
+
+    @staticmethod
+    def get_chunk_records(chunk_results):
+        """
+        Iterate over validation records of all chunks of a file with line numbers of the whole file.
+        Exception raised by a row in a worker is raised again when that row is reached
+        :param chunk_results: results of validate_chunk, in the order of chunks
+        """
+        line_num = FIRST_LINE_NUM
+        for records, row_count, error in chunk_results:
+            for record in records:
+                yield (record[0] + line_num,) + record[1:]
+            if error is not None:
+                raise error
+            line_num += row_count
+
     def load(self, file_list, cheat_mode, dry_run, loading_mode, wipe_db, max_violations, temp_folder, verbose,
              split=False, no_backup=True, neo4j_uri=None, backup_folder="/", username=None, password=None):
+        try:
+            return self._load(file_list, cheat_mode, dry_run, loading_mode, wipe_db, max_violations, temp_folder,
+                              verbose, split, no_backup, neo4j_uri, backup_folder, username, password)
+        finally:
+            # Row stores may hold temp files, release them whether loading succeeded or not
+            self.clear_row_stores()
+
+    def _load(self, file_list, cheat_mode, dry_run, loading_mode, wipe_db, max_violations, temp_folder, verbose,
+              split, no_backup, neo4j_uri, backup_folder, username, password):
         if not self.check_files(file_list):
             return False
         start = timer()
@@ -289,23 +817,18 @@ class DataLoader:
                 #    self.log.error('Backup Memgraph failed, abort loading!')
                 #    sys.exit(1)
         if dry_run:
+            if loading_mode == NEW_MODE and isinstance(self.driver, Driver):
+                if not self.check_new_nodes_in_files(file_list):
+                    return False
             end = timer()
             self.log.info('Dry run mode, no nodes or relationships loaded.')  # Time in seconds, e.g. 5.38091952400282
             self.log.info('Running time: {:.2f} seconds'.format(end - start))  # Time in seconds, e.g. 5.38091952400282
             return {NODES_CREATED: 0, RELATIONSHIP_CREATED: 0}
 
-        self.nodes_created = 0
-        self.nodes_updated = 0
-        self.relationships_created = 0
+        self.reset_stats()
         self.indexes_created = 0
-        self.nodes_deleted = 0
-        self.relationships_deleted = 0
-        self.nodes_stat = {}
-        self.nodes_stat_updated = {}
-        self.relationships_stat = {}
-        self.nodes_deleted_stat = {}
-        self.relationships_deleted_stat = {}
         self.cheat_mode = True
+        self.clear_parent_id_cache()
         if not self.driver or not isinstance(self.driver, Driver):
             self.log.error('Invalid Neo4j Python Driver!')
             return False
@@ -324,16 +847,38 @@ class DataLoader:
 
             # Split Transactions Disabled
             else:
-                # Data updates transaction
-                tx = session.begin_transaction()
-                try:
-                    self._load_all(tx, file_list, loading_mode, split, wipe_db)
-                    tx.commit()
-                except Exception as e:
-                    tx.rollback()
-                    self.log.exception(e)
-                    #return False
-                    sys.exit(1)
+                attempt = 0
+                # Plugins keep state outside of the transaction, so loading can't be retried with plugins,
+                # creating or deleting nodes again isn't safe if a failed commit was applied by server
+                retry = not self.plugins and loading_mode not in (NEW_MODE, DELETE_MODE)
+                while True:
+                    # Data updates transaction
+                    tx = session.begin_transaction()
+                    committing = False
+                    try:
+                        self._load_all(tx, file_list, loading_mode, split, wipe_db)
+                        committing = True
+                        tx.commit()
+                        break
+                    except Exception as e:
+                        if not committing:
+                            try:
+                                tx.rollback()
+                            except Exception as rollback_error:
+                                # Connection may be lost already, transaction is rolled back by server then
+                                self.log.warning('Rollback failed: {}'.format(rollback_error))
+                        attempt += 1
+                        # Outcome of a failed commit is unknown, it may have been applied, so it's never retried
+                        if retry and not committing and is_retriable_error(e) and attempt <= self.batch_retries:
+                            delay = get_retry_delay(attempt)
+                            self.log.warning('Transient error, retry loading in {} seconds: {}'.format(delay, e))
+                            time.sleep(delay)
+                            self.reset_stats()
+                            self.clear_parent_id_cache()
+                            continue
+                        self.log.exception(e)
+                        #return False
+                        sys.exit(1)
 
         # End the timer
         end = timer()
@@ -354,6 +899,7 @@ class DataLoader:
         for rel in sorted(self.relationships_stat.keys()):
             count = self.relationships_stat[rel]
             self.log.info('Relationship: [:{}] loaded: {}'.format(rel, count))
+        self.log_plugin_timings()
         self.log.info('{} new indexes created!'.format(self.indexes_created))
         self.log.info('{} nodes and {} relationships loaded!'.format(self.nodes_created, self.relationships_created))
         self.log.info('{} nodes and {} relationships deleted!'.format(self.nodes_deleted, self.relationships_deleted))
@@ -362,20 +908,368 @@ class DataLoader:
         return {NODES_CREATED: self.nodes_created, RELATIONSHIP_CREATED: self.relationships_created,
                 NODES_DELETED: self.nodes_deleted, RELATIONSHIP_DELETED: self.relationships_deleted, NODES_UPDATED: self.nodes_updated}
 
+    def log_plugin_timings(self):
+        for plugin_name, (count, int_nodes_created, elapsed) in self.plugin_timings.items():
+            self.log.info('Plugin {}: {} loaded node(s) processed, {} intermediate node(s) created in {:.2f} seconds'
+                          .format(plugin_name, count, int_nodes_created, elapsed))
+
+    def reset_stats(self):
+        self.loaded_nodes = []
+        self.plugin_timings = {}
+        self.nodes_created = 0
+        self.nodes_updated = 0
+        self.relationships_created = 0
+        self.nodes_deleted = 0
+        self.relationships_deleted = 0
+        self.nodes_stat = {}
+        self.nodes_stat_updated = {}
+        self.relationships_stat = {}
+        self.nodes_deleted_stat = {}
+        self.relationships_deleted_stat = {}
+
     def _load_all(self, tx, file_list, loading_mode, split, wipe_db):
         if wipe_db:
             self.wipe_db(tx, split)
+        fused_files = set()
+        # Concurrent loading needs a session per worker, so it's only possible with split transactions
+        if split and self.load_workers > 1 and loading_mode != DELETE_MODE:
+            levels = self.get_load_levels(file_list)
+            if self.fused:
+                fused_files = self.get_fused_files(file_list, levels)
+
+            def load_file(session, file_name, mode, split_transactions):
+                if file_name in fused_files:
+                    self.load_nodes_and_relationships(session, file_name, mode, split_transactions)
+                else:
+                    self.load_nodes(session, file_name, mode, split_transactions)
+            self._load_levels(levels, load_file, loading_mode)
+            # Nodes loaded above may have been cached as missing parents
+            self.clear_parent_id_cache()
+            levels = [[[file_name for file_name in group if file_name not in fused_files] for group in groups]
+                      for groups in levels]
+            levels = [[group for group in groups if group] for groups in levels]
+            self._load_levels([groups for groups in levels if groups], self.load_relationships, loading_mode)
+            self.run_node_loaded_plugins(tx, split)
+            return
+        if self.fused and loading_mode != DELETE_MODE:
+            fused_files = self.get_fused_files(file_list)
         for txt in file_list:
-            self.load_nodes(tx, txt, loading_mode, split)
+            if txt in fused_files:
+                self.load_nodes_and_relationships(tx, txt, loading_mode, split)
+            else:
+                self.load_nodes(tx, txt, loading_mode, split)
         if loading_mode != DELETE_MODE:
+            # Nodes loaded above may have been cached as missing parents
+            self.clear_parent_id_cache()
             for txt in file_list:
-                self.load_relationships(tx, txt, loading_mode, split)
+                if txt not in fused_files:
+                    self.load_relationships(tx, txt, loading_mode, split)
+            self.run_node_loaded_plugins(tx, split)
+
+    def run_node_loaded_plugins(self, session, split):
+        """
+        Run NODE_LOADED plugins on nodes recorded while loading relationships of all files, in batches of their own,
+        and in their own transactions in split-transactions mode. Plugins get the node type and ID of each node as
+        src.
+        :param session: session in split-transactions mode, otherwise the transaction of whole loading
+        """
+        nodes = {}
+        for line_num, node_type, id_field, node_id in self.loaded_nodes:
+            nodes.setdefault((node_type, node_id), (line_num, {NODE_TYPE: node_type, id_field: node_id}))
+        for plugin in self.plugins:
+            rows = [(line_num, {'line_num': line_num, 'src': src}) for (node_type, _), (line_num, src)
+                    in nodes.items() if plugin.should_run(node_type, NODE_LOADED)]
+            if not rows:
+                continue
+
+            def write(tx, batch):
+                if has_batch_api(plugin):
+                    return sum(1 for created in plugin.create_nodes(tx, NODE_LOADED, [row for _, row in batch])
+                               if created)
+                return sum(1 for _, row in batch if plugin.create_node(session=tx, **row))
+
+            plugin_name = type(plugin).__name__
+            self.log.info('Running {} on {} loaded node(s)'.format(plugin_name, len(rows)))
+            start = timer()
+            batch_size = self.get_batch_size((NODE_LOADED, plugin_name))
+            int_nodes_created = 0
+            position = 0
+            while position < len(rows):
+                size = batch_size.size if split else BATCH_SIZE
+                batch = rows[position:position + size]
+                position += size
+                if split:
+                    # Plugins keep state outside of the transaction, so their batches can't be retried
+                    int_nodes_created += sum(self.run_batch(session, batch, write, batch_size, retry=False))
+                else:
+                    int_nodes_created += write(session, batch)
+            elapsed = timer() - start
+            self.plugin_timings[plugin_name] = (len(rows), int_nodes_created, elapsed)
+            self.log.info('{} intermediate node(s) created by {} in {:.2f} seconds'.format(int_nodes_created,
+                                                                                          plugin_name, elapsed))
+
+    def get_file_dependencies(self, file_list):
+        """
+        Find node type of each data file, and types of its parent pointer columns
+        :param file_list: data files
+        :return: dict of file name -> (node type, set of parent types)
+        """
+        file_dependencies = {}
+        for file_name in file_list:
+            node_type = None
+            parent_types = set()
+            for _, obj, _ in self.get_row_store(file_name):
+                node_type = obj.get(NODE_TYPE)
+                for key in obj.keys():
+                    if is_parent_pointer(key):
+                        parent_type = key.split('.')[0]
+                        if parent_type in self.schema.relationships.get(node_type, {}):
+                            parent_types.add(parent_type)
+                break
+            file_dependencies[file_name] = (node_type, parent_types)
+        return file_dependencies
+
+    def get_fused_files(self, file_list, levels=None):
+        """
+        Find data files whose nodes and relationships can be loaded in a single pass: all their parents are already
+        in DB or loaded by earlier files. Other files need all nodes loaded before their relationships.
+        :param file_list: data files
+        :param levels: levels of file groups returned by get_load_levels when files are loaded concurrently,
+                       files are loaded in order of file_list otherwise
+        :return: set of file names
+        """
+        if levels is not None:
+            stages = {file_name: level_num for level_num, groups in enumerate(levels) for group in groups
+                      for file_name in group}
+        else:
+            stages = {file_name: index for index, file_name in enumerate(file_list)}
+        file_dependencies = self.get_file_dependencies(file_list)
+        # Stage where the last file of each node type is loaded
+        last_stages = {}
+        for file_name, (node_type, _) in file_dependencies.items():
+            last_stages[node_type] = max(last_stages.get(node_type, stages[file_name]), stages[file_name])
+        fused_files = set()
+        for file_name, (node_type, parent_types) in file_dependencies.items():
+            # Files referring to their own node type, or to parents loaded later, need two passes
+            if all(last_stages.get(parent_type, -1) < stages[file_name] for parent_type in parent_types):
+                fused_files.add(file_name)
+        self.log.info('{} of {} file(s) will be loaded in a single pass'.format(len(fused_files), len(file_list)))
+        return fused_files
+
+    def get_load_levels(self, file_list):
+        """
+        Group data files by levels of the dependency DAG built from parent pointer columns and schema relationships,
+        files in a level only depend on files in lower levels
+        :param file_list: data files
+        :return: list of levels, each level is a list of file groups, files in a group are loaded in order by one
+                 worker
+        """
+        file_types = {}
+        dependencies = {}
+        plugin_types = set()
+        for file_name, (node_type, parent_types) in self.get_file_dependencies(file_list).items():
+            parent_types = parent_types - {node_type}
+            file_types[file_name] = node_type
+            dependencies.setdefault(node_type, set()).update(parent_types)
+            if self.runs_plugins(node_type, parent_types):
+                plugin_types.add(node_type)
+
+        # Only parents loaded from the same dataset need to be waited for
+        for node_type, parent_types in dependencies.items():
+            parent_types.intersection_update(dependencies.keys())
+        type_levels = {}
+        level = 0
+        remaining = set(dependencies.keys())
+        while remaining:
+            ready = {node_type for node_type in remaining if dependencies[node_type].issubset(type_levels.keys())}
+            if not ready:
+                self.log.warning('Circular dependencies found between node types: {}, they will be loaded one by one'
+                                 .format(', '.join(sorted(str(node_type) for node_type in remaining))))
+                ready = remaining
+                plugin_types.update(remaining)
+            for node_type in ready:
+                type_levels[node_type] = level
+            remaining -= ready
+            level += 1
+
+        levels = [{} for _ in range(level)]
+        for file_name in file_list:
+            node_type = file_types[file_name]
+            group_key = node_type
+            # Plugins keep state between rows, files that run them (or have circular dependencies) are loaded by
+            # one worker
+            if node_type in plugin_types:
+                group_key = None
+            levels[type_levels[node_type]].setdefault(group_key, []).append(file_name)
+        return [list(groups.values()) for groups in levels]
+
+    def runs_plugins(self, node_type, parent_types):
+        """
+        Check if loading relationships of a node type may run plugins
+        :param node_type: node type
+        :param parent_types: types of parent pointer columns
+        """
+        for plugin in self.plugins:
+            if any(plugin.should_run(parent_type, MISSING_PARENT) for parent_type in parent_types):
+                return True
+        return False
+
+    def get_batch_size(self, node_type):
+        batch_size = self.batch_sizes.get(node_type)
+        if batch_size is None:
+            with self.cache_lock:
+                batch_size = self.batch_sizes.get(node_type)
+                if batch_size is None:
+                    batch_size = AdaptiveBatchSize(self.min_batch_size, self.max_batch_size, BATCH_SIZE)
+                    self.batch_sizes[node_type] = batch_size
+        return batch_size
+
+    def run_batch(self, session, chunk, write, batch_size, retry=True, idempotent=True):
+        """
+        Write a chunk of rows in its own transaction and adapt batch size from commit time. Transactions failed with
+        transient errors are retried with backoff, chunks still failing after all retries are split in halves.
+        :param session: session to begin transactions on
+        :param chunk: list of (line number, prepared node) tuples
+        :param write: function(tx, chunk) that writes the chunk and returns its result
+        :param batch_size: AdaptiveBatchSize of the chunk
+        :param retry: False if write has side effects outside of the transaction, e.g. plugins
+        :param idempotent: False if writing a chunk twice is not safe, chunks failed while committing won't be retried
+        :return: list of results of committed transactions
+        """
+        attempt = 0
+        while True:
+            start = timer()
+            committing = False
+            try:
+                with session.begin_transaction() as tx:
+                    result = write(tx, chunk)
+                    committing = True
+                    tx.commit()
+                batch_size.update(len(chunk), timer() - start)
+                return [result]
+            except Exception as e:
+                # Commit may have succeeded if connection was lost while committing
+                if not retry or not is_retriable_error(e) or (committing and not idempotent):
+                    raise
+                attempt += 1
+                first_line, last_line = chunk[0][0], chunk[-1][0]
+                if attempt > self.batch_retries:
+                    if len(chunk) < 2:
+                        raise
+                    batch_size.shrink()
+                    middle = len(chunk) // 2
+                    self.log.warning('Lines {}-{}: batch failed {} times, splitting it: {}'.format(
+                        first_line, last_line, attempt, e))
+                    return self.run_batch(session, chunk[:middle], write, batch_size, retry, idempotent) + \
+                        self.run_batch(session, chunk[middle:], write, batch_size, retry, idempotent)
+                delay = get_retry_delay(attempt)
+                self.log.warning('Lines {}-{}: transient error, retry in {} seconds: {}'.format(
+                    first_line, last_line, delay, e))
+                time.sleep(delay)
+
+    def _load_levels(self, levels, load_file, loading_mode):
+        """
+        Load levels of data files in order, file groups in a level are loaded concurrently on separate sessions
+        :param levels: levels of file groups returned by get_load_levels
+        :param load_file: load_nodes or load_relationships
+        """
+        with ThreadPoolExecutor(max_workers=self.load_workers) as executor:
+            for level_num, groups in enumerate(levels):
+                self.log.info('Loading level {} of {}: {} group(s) of files'.format(level_num + 1, len(levels),
+                                                                                   len(groups)))
+                futures = [executor.submit(self._load_file_group, group, load_file, loading_mode) for group in groups]
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in not_done:
+                    future.cancel()
+                for future in futures:
+                    if future in done and future.exception():
+                        raise future.exception()
+
+    def _load_file_group(self, file_group, load_file, loading_mode):
+        with self.driver.session() as session:
+            for file_name in file_group:
+                load_file(session, file_name, loading_mode, True)
 
     # Remove extra spaces at beginning and end of the keys and values
     @staticmethod
     def cleanup_node(node):
         return {key if not key else key.strip(): value if not value else value.strip() for key, value in node.items()}
 
+    def get_column_plan(self, keys, node_type):
+        """
+        Get compiled column plan for a header, plan is compiled on first use and cached
+        :param keys: tuple of column names
+        :param node_type: node type of rows
+        :return: list of (column name, value converter or None, parent id field or None, extra properties) tuples
+        """
+        plan_key = (keys, node_type)
+        plan = self.column_plans.get(plan_key)
+        if plan is None:
+            with self.cache_lock:
+                plan = self.column_plans.get(plan_key)
+                if plan is None:
+                    plan = self._compile_column_plan(keys, node_type)
+                    self.column_plans[plan_key] = plan
+        return plan
+
+    def _compile_column_plan(self, keys, node_type):
+        save_parent_id = node_type in self.schema.props.save_parent_id
+        plan = []
+        for key in keys:
+            search_node_type = node_type
+            search_key = key
+            parent_pointer = is_parent_pointer(key)
+            if parent_pointer:
+                search_node_type, search_key = key.split('.')
+            elif self.schema.is_relationship_property(key):
+                search_node_type, search_key = key.split(self.rel_prop_delimiter)
+
+            key_type = self.schema.get_prop_type(search_node_type, search_key)
+            if key_type == 'Boolean':
+                convert = self._convert_boolean
+            elif key_type == 'Int':
+                convert = convert_int
+            elif key_type == 'Float':
+                convert = convert_float
+            elif key_type == 'Array':
+                convert = self._convert_array
+            elif key_type == 'DateTime' or key_type == 'Date':
+                convert = convert_date
+            else:
+                convert = None
+
+            # Add parent id field(s) into node
+            parent_id_field = None
+            if save_parent_id and parent_pointer:
+                parent, field_name = key.split('.')
+                if field_name in keys:
+                    combined = '{}_{}'.format(parent, field_name)
+                    self.log.debug(
+                        '"{}" field is in both current node and parent "{}", use {} instead !'.format(key, parent,
+                                                                                                    combined))
+                    field_name = combined
+                parent_id_field = field_name
+
+            # Extra properties only depend on column, except original value which is the value of the column
+            extra_props = tuple(self.schema.get_extra_props(node_type, key, COLUMN_VALUE).items())
+            plan.append((key, convert, parent_id_field, extra_props))
+        return plan
+
+    def _convert_boolean(self, value):
+        if isinstance(value, str):
+            if BOOLEAN_TRUE_PATTERN.search(value):
+                return True
+            elif BOOLEAN_FALSE_PATTERN.search(value):
+                return False
+            else:
+                self.log.debug('Unsupported Boolean value: "{}"'.format(value))
+        return None
+
+    def _convert_array(self, value):
+        items = self.schema.get_list_values(value)
+        # todo: need to transform items if item type is not string
+        return json.dumps(items)
+
     # Cleanup values for Boolean, Int and Float types
     # Add uuid to nodes if one not exists
     # Add parent id(s)
@@ -385,81 +1279,18 @@ class DataLoader:
         node_type = obj.get(NODE_TYPE, None)
         # Cleanup values for Boolean, Int and Float types
         if node_type:
-            df_validation_result = pd.DataFrame(columns=['File Name', 'Property', 'Value', 'Reason', 'Line Numbers', 'Severity'])
-            for key, value in obj.items():
-                search_node_type = node_type
-                search_key = key
-                if is_parent_pointer(key):
-                    search_node_type, search_key = key.split('.')
-                elif self.schema.is_relationship_property(key):
-                    search_node_type, search_key = key.split(self.rel_prop_delimiter)
-
-                key_type = self.schema.get_prop_type(search_node_type, search_key)
-                if key_type == 'Boolean':
-                    cleaned_value = None
-                    if isinstance(value, str):
-                        if re.search(r'yes|true', value, re.IGNORECASE):
-                            cleaned_value = True
-                        elif re.search(r'no|false', value, re.IGNORECASE):
-                            cleaned_value = False
-                        else:
-                            self.log.debug('Unsupported Boolean value: "{}"'.format(value))
-                            cleaned_value = None
-                    obj[key] = cleaned_value
-                elif key_type == 'Int':
-                    try:
-                        if value is None:
-                            cleaned_value = None
-                        else:
-                            cleaned_value = int(value)
-                    except ValueError:
-                        cleaned_value = None
-                    obj[key] = cleaned_value
-                elif key_type == 'Float':
-                    try:
-                        if value is None:
-                            cleaned_value = None
-                        else:
-                            cleaned_value = float(value)
-                    except ValueError:
-                        cleaned_value = None
-                    obj[key] = cleaned_value
-                elif key_type == 'Array':
-                    items = self.schema.get_list_values(value)
-                    # todo: need to transform items if item type is not string
-                    obj[key] = json.dumps(items)
-                elif key_type == 'DateTime' or key_type == 'Date':
-                    if value is None:
-                        cleaned_value = None
-                    else:
-                        cleaned_value = reformat_date(value)
-                    obj[key] = cleaned_value
             obj2 = {}
-            for key, value in obj.items():
+            for key, convert, parent_id_field, extra_props in self.get_column_plan(tuple(obj.keys()), node_type):
+                value = obj[key]
+                if convert:
+                    value = convert(value)
                 obj2[key] = value
-                # Add parent id field(s) into node
-                if obj[NODE_TYPE] in self.schema.props.save_parent_id and is_parent_pointer(key):
-                    header = key.split('.')
-                    if len(header) > 2:
-                        self.log.warning('Column header "{}" has multiple periods!'.format(key))
-                        df_validation_result = self.update_field_validation_result(df_validation_result, file_name, "", "column_header_has_multiple_periods", "warning")
-                        if obj[NODE_TYPE] not in self.df_validation_dict.keys():
-                            self.df_validation_dict[obj[NODE_TYPE]] = df_validation_result
-                        else:
-                            self.df_validation_dict[obj[NODE_TYPE]] = pd.concat([self.df_validation_dict[obj[NODE_TYPE]], df_validation_result])
-                    field_name = header[1]
-                    parent = header[0]
-                    combined = '{}_{}'.format(parent, field_name)
-                    if field_name in obj:
-                        self.log.debug(
-                            '"{}" field is in both current node and parent "{}", use {} instead !'.format(key, parent,
-                                                                                                        combined))
-                        field_name = combined
-                    # Add an value for parent id
-                    obj2[field_name] = value
+                # Add an value for parent id
+                if parent_id_field:
+                    obj2[parent_id_field] = value
                 # Add extra properties if any
-                for extra_prop_name, extra_value in self.schema.get_extra_props(node_type, key, value).items():
-                    obj2[extra_prop_name] = extra_value
+                for extra_prop_name, extra_value in extra_props:
+                    obj2[extra_prop_name] = value if extra_value is COLUMN_VALUE else extra_value
 
             if UUID not in obj2:
                 id_field = self.schema.get_id_field(obj2)
@@ -476,12 +1307,9 @@ class DataLoader:
         elif not self.cheat_mode:
             self.log.error('No "type" column in file')
             #sys.exit(1)
-            df_validation_result = pd.DataFrame(columns=['File Name', 'Property', 'Value', 'Reason', 'Line Numbers', 'Severity'])
-            df_validation_result = self.update_field_validation_result(df_validation_result, file_name, "", "type_column_missing", "error")
-            if OTHER not in self.df_validation_dict.keys():
-                self.df_validation_dict[OTHER] = df_validation_result
-            else:
-                self.df_validation_dict[OTHER] = pd.concat([self.df_validation_dict[OTHER], df_validation_result])
+            field_results = []
+            self.update_field_validation_result(field_results, file_name, "", "type_column_missing", "error")
+            self.add_validation_result(OTHER, self.get_field_validation_frame(field_results))
             self.skip_validation_flag = True
             return obj
         else: #if enable cheat mode and bypass the validation
@@ -496,63 +1324,98 @@ class DataLoader:
                 result.append('{}: {}'.format(key, value))
         return '{{ {} }}'.format(', '.join(result))
 
+    def index_dataset(self, file_list):
+        """
+        Index IDs of all nodes defined in data files, referred by parent pointers or case IDs in these files.
+        Until loading starts, parents found in the index are not checked against DB,
+        and validate_parents_exist_in_file and validate_cases_exist_in_file can run without DB
+        :param file_list: data files of the dataset
+        """
+        # Parent types and ID fields referred by data files
+        referred = {CASE_NODE: {CASE_ID}}
+        for file_name in file_list:
+            if not self.get_row_store(file_name):
+                continue
+            for key in self.get_first_row(file_name).keys():
+                if is_parent_pointer(key):
+                    label, prop = key.split('.')
+                    referred.setdefault(label, set()).add(prop)
+
+        self.dataset_parent_ids = {}
+        for file_name in file_list:
+            for _, obj in self.get_prepared_rows(file_name):
+                props = referred.get(obj.get(NODE_TYPE), ())
+                for prop in props:
+                    value = obj.get(prop)
+                    if value is not None:
+                        self.dataset_parent_ids.setdefault((obj[NODE_TYPE], prop), set()).add(value)
+        for (label, prop), values in self.dataset_parent_ids.items():
+            self.log.info('{} (:{}) node(s) found in data files'.format(len(values), label))
+
+    def get_validation_session(self):
+        """
+        Open a session to validate parents in data files
+        :return: session, a context without session if DB is not available but data files are indexed,
+                 or None if neither is available
+        """
+        if self.driver and isinstance(self.driver, Driver):
+            return self.driver.session()
+        if self.dataset_parent_ids is not None:
+            self.log.info('No database available, validating parents against data files only')
+            return nullcontext()
+        self.log.error('Invalid Neo4j Python Driver!')
+        return None
+
     # Validate all cases exist in a data (TSV/TXT) file
     def validate_cases_exist_in_file(self, file_name, max_violations):
-        if not self.driver or not isinstance(self.driver, Driver):
-            self.log.error('Invalid Neo4j Python Driver!')
+        validation_session = self.get_validation_session()
+        if validation_session is None:
             return False
-        with self.driver.session() as session:
-            file_encoding = check_encoding(file_name)
-            with open(file_name, encoding=file_encoding) as in_file:
-                self.log.info('Validating relationships in file "{}" ...'.format(file_name))
-                reader = csv.DictReader(in_file, delimiter='\t')
-                line_num = 1
-                validation_failed = False
-                violations = 0
-                for org_obj in reader:
-                    obj = self.prepare_node(org_obj, file_name)
-                    line_num += 1
-                    # Validate parent exist
-                    if CASE_ID in obj:
-                        case_id = obj[CASE_ID]
-                        if not self.node_exists(session, CASE_NODE, CASE_ID, case_id):
-                            self.log.error(
-                                'Invalid data at line {}: Parent (:{} {{ {}: "{}" }}) does not exist!'.format(
-                                    line_num, CASE_NODE, CASE_ID, case_id))
-                            validation_failed = True
-                            violations += 1
-                            if violations >= max_violations:
-                                return False
-                return not validation_failed
+        with validation_session as session:
+            case_ids = {obj[CASE_ID] for _, obj in self.get_prepared_rows(file_name) if CASE_ID in obj}
+            self.check_parent_ids(session, {(CASE_NODE, CASE_ID): case_ids})
+            self.log.info('Validating relationships in file "{}" ...'.format(file_name))
+            validation_failed = False
+            violations = 0
+            for line_num, obj in self.get_prepared_rows(file_name):
+                # Validate parent exist
+                if CASE_ID in obj:
+                    case_id = obj[CASE_ID]
+                    if not self.parent_exists(session, CASE_NODE, CASE_ID, case_id):
+                        self.log.error(
+                            'Invalid data at line {}: Parent (:{} {{ {}: "{}" }}) does not exist!'.format(
+                                line_num, CASE_NODE, CASE_ID, case_id))
+                        validation_failed = True
+                        violations += 1
+                        if violations >= max_violations:
+                            return False
+            return not validation_failed
 
     # Validate all parents exist in a data (TSV/TXT) file
     def validate_parents_exist_in_file(self, file_name, max_violations):
-        if not self.driver or not isinstance(self.driver, Driver):
-            self.log.error('Invalid Neo4j Python Driver!')
+        validation_session = self.get_validation_session()
+        if validation_session is None:
             return False
-        with self.driver.session() as session:
-            file_encoding = check_encoding(file_name)
-            with open(file_name, encoding=file_encoding) as in_file:
-                self.log.info('Validating relationships in file "{}" ...'.format(file_name))
-                reader = csv.DictReader(in_file, delimiter='\t')
-                line_num = 1
-                validation_failed = False
-                violations = 0
-                for org_obj in reader:
-                    line_num += 1
-                    obj = self.prepare_node(org_obj, file_name)
-                    results = self.collect_relationships(obj, session, False, line_num)
-                    relationships = results[RELATIONSHIPS]
-                    provided_parents = results[PROVIDED_PARENTS]
-                    if provided_parents > 0:
-                        if len(relationships) == 0:
-                            self.log.error('Invalid data at line {}: No parents found!'.format(line_num))
-                            validation_failed = True
-                            violations += 1
-                            if violations >= max_violations:
-                                return False
-                    else:
-                        self.log.info('Line: {} - No parents found'.format(line_num))
+        with validation_session as session:
+            self.prefetch_parent_ids(session, file_name)
+            self.log.info('Validating relationships in file "{}" ...'.format(file_name))
+            validation_failed = False
+            violations = 0
+            # DB doesn't change while validating, so one_to_one references of whole file are checked together
+            one_to_one_checker = OneToOneChecker(self.schema, (obj for _, obj in self.get_prepared_rows(file_name)))
+            for line_num, obj in self.get_prepared_rows(file_name):
+                results = self.collect_relationships(obj, session, False, line_num, one_to_one_checker)
+                relationships = results[RELATIONSHIPS]
+                provided_parents = results[PROVIDED_PARENTS]
+                if provided_parents > 0:
+                    if len(relationships) == 0:
+                        self.log.error('Invalid data at line {}: No parents found!'.format(line_num))
+                        validation_failed = True
+                        violations += 1
+                        if violations >= max_violations:
+                            return False
+                else:
+                    self.log.info('Line: {} - No parents found'.format(line_num))
 
         return not validation_failed
 
@@ -574,253 +1437,280 @@ class DataLoader:
 
         return node
 
+    def get_first_row(self, file_name):
+        """
+        Get the first cleaned row of a data file, the whole file is only read if its rows are already stored
+        """
+        store = self.row_stores.get(file_name)
+        if store is not None:
+            _, row, _ = next(iter(store))
+            return row
+        with open(file_name, encoding=check_encoding(file_name)) as in_file:
+            return self.cleanup_node(next(csv.DictReader(in_file, delimiter='\t')))
+
     # Validate the field names
     def validate_field_name(self, file_name):
-        df_validation_result = pd.DataFrame(columns=['File Name', 'Property', 'Value', 'Reason', 'Line Numbers', 'Severity'])
-        file_encoding = check_encoding(file_name)
-        with open(file_name, encoding=file_encoding) as in_file:
-            reader = csv.DictReader(in_file, delimiter='\t')
-            row = next(reader)
-            row = self.cleanup_node(row)
-            row_prepare_node = self.prepare_node(row, file_name)
-            if self.skip_validation_flag:
-                return False
-            parent_pointer = []
-            for key in row_prepare_node.keys():
-                if is_parent_pointer(key):
-                    parent_pointer.append(key)
-            error_list = []
-            parent_error_list = []
-            for key in row.keys():
-                if key not in parent_pointer:
-                    try:
-                        if key not in self.schema.get_props_for_node(row['type']) and key != 'type':
-                            error_list.append(key)
-                    except:
+        field_results = []
+        row = self.get_first_row(file_name)
+        row_prepare_node = self.prepare_node(row, file_name)
+        if self.skip_validation_flag:
+            return False
+        parent_pointer = []
+        for key in row_prepare_node.keys():
+            if is_parent_pointer(key):
+                parent_pointer.append(key)
+        error_list = []
+        parent_error_list = []
+        for key in row.keys():
+            if key not in parent_pointer:
+                try:
+                    if key not in self.schema.get_props_for_node(row['type']) and key != 'type':
                         error_list.append(key)
-                else:
-                    try:
-                        if key.split('.')[1] not in self.schema.get_props_for_node(key.split('.')[0]):
-                            parent_error_list.append(key)
-                    except:
-                        parent_error_list.append(key)
-            if len(error_list) > 0:
-                for error_field_name in error_list:
-                    self.log.warning('Property: "{}" not found in data model'.format(error_field_name))
-                    df_validation_result = self.update_field_validation_result(df_validation_result, file_name, error_field_name, "property_not_found_in_model", "warning")
-            if len(parent_error_list) > 0:
-                for parent_error_field_name in parent_error_list:
-                    self.log.error('Parent pointer: "{}" not found in data model'.format(parent_error_field_name))
-                    df_validation_result = self.update_field_validation_result(df_validation_result, file_name, parent_error_field_name, "parent_pointer_not_found_in_model", "error")
-                if len(df_validation_result) > 0:
-                    if row[NODE_TYPE] not in self.df_validation_dict.keys():
-                        self.df_validation_dict[row[NODE_TYPE]] = df_validation_result
-                    else:
-                        self.df_validation_dict[row[NODE_TYPE]] = pd.concat([self.df_validation_dict[row[NODE_TYPE]], df_validation_result])
-                self.log.error('Parent pointer not found in the data model, abort loading!')
-                return False
-        if len(df_validation_result) > 0:
-            if row[NODE_TYPE] not in self.df_validation_dict.keys():
-                    self.df_validation_dict[row[NODE_TYPE]] = df_validation_result
+                except:
+                    error_list.append(key)
             else:
-                self.df_validation_dict[row[NODE_TYPE]] = pd.concat([self.df_validation_dict[row[NODE_TYPE]], df_validation_result])
+                try:
+                    if key.split('.')[1] not in self.schema.get_props_for_node(key.split('.')[0]):
+                        parent_error_list.append(key)
+                except:
+                    parent_error_list.append(key)
+        if len(error_list) > 0:
+            for error_field_name in error_list:
+                self.log.warning('Property: "{}" not found in data model'.format(error_field_name))
+                self.update_field_validation_result(field_results, file_name, error_field_name, "property_not_found_in_model", "warning")
+        if len(parent_error_list) > 0:
+            for parent_error_field_name in parent_error_list:
+                self.log.error('Parent pointer: "{}" not found in data model'.format(parent_error_field_name))
+                self.update_field_validation_result(field_results, file_name, parent_error_field_name, "parent_pointer_not_found_in_model", "error")
+            if len(field_results) > 0:
+                self.add_validation_result(row[NODE_TYPE], self.get_field_validation_frame(field_results))
+            self.log.error('Parent pointer not found in the data model, abort loading!')
+            return False
+        if len(field_results) > 0:
+            self.add_validation_result(row[NODE_TYPE], self.get_field_validation_frame(field_results))
         return True
     # update field validation result
-    def update_field_validation_result(self, df_validation_result, file_name, error_field_name, reason, severity):
+    def update_field_validation_result(self, field_results, file_name, error_field_name, reason, severity):
+        field_results.append((os.path.basename(file_name), error_field_name, reason, severity))
+        return field_results
+
+    @staticmethod
+    def get_field_validation_frame(field_results):
+        """
+        Build report frame of field validation results collected by update_field_validation_result
+        """
+        df_validation_result = pd.DataFrame(columns=VALIDATION_RESULT_COLUMNS)
         tmp_df_validation_result_field = pd.DataFrame()
-        tmp_df_validation_result_field['File Name'] = [os.path.basename(file_name)]
-        tmp_df_validation_result_field['Property'] = [error_field_name]
-        tmp_df_validation_result_field['Reason'] =  [reason]
-        tmp_df_validation_result_field['Severity'] = [severity]
-        df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_field])
-        return df_validation_result
+        tmp_df_validation_result_field['File Name'] = [result[0] for result in field_results]
+        tmp_df_validation_result_field['Property'] = [result[1] for result in field_results]
+        tmp_df_validation_result_field['Reason'] = [result[2] for result in field_results]
+        tmp_df_validation_result_field['Severity'] = [result[3] for result in field_results]
+        return pd.concat([df_validation_result, tmp_df_validation_result_field])
+
+    def add_validation_result(self, node_type, df_validation_result):
+        if self.validation_report is not None:
+            self.validation_report.add_frame(node_type, df_validation_result)
+        else:
+            self.df_validation_dict.setdefault(node_type, []).append(df_validation_result)
     # Validate file
-    def validate_file(self, file_name, max_violations, verbose):
+    def validate_rows(self, rows, verbose):
+        """
+        Validate cleaned rows on their own, duplicate IDs and violations are checked by validate_file
+        :param rows: iterable of (line number, cleaned row) tuples
+        :return: generator of (line number, node type, ID field, node ID, properties signature, validation result)
+                 tuples, signature is None if node has no ID, validation result is None if nothing is reported
+        """
+        for line_num, obj in rows:
+            id_field = self.schema.get_id_field(obj)
+            node_id = self.schema.get_id(obj)
+            props_signature = get_props_signature(self.get_node_properties(obj)) if node_id else None
+            validate_result = self.schema.validate_node(obj[NODE_TYPE], obj, verbose)
+            if validate_result['result'] and not validate_result['invalid_properties'] and \
+                    not validate_result['missing_properties']:
+                validate_result = None
+            yield line_num, obj[NODE_TYPE], id_field, node_id, props_signature, validate_result
+
+    def validate_file(self, file_name, max_violations, verbose, records=None):
+        """
+        Validate a data file
+        :param records: validation records of all rows from validate_rows, rows of file are validated if None
+        :return: True if file is valid
+        """
         self.skip_validation_flag = False
-        file_encoding = check_encoding(file_name)
-        with open(file_name, encoding=file_encoding) as in_file:
-            self.log.info('Validating file "{}" ...'.format(file_name))
-            reader = csv.DictReader(in_file, delimiter='\t')
-            line_num = 1
-            validation_failed = False
-            violations = 0
-            ids = {}
-            df_validation_result = pd.DataFrame(columns=['File Name', 'Property', 'Value', 'Reason', 'Line Numbers', 'Severity'])
-            field_validation_result = self.validate_field_name(file_name)
-            if not field_validation_result:
-                return False
-            df_invalid = pd.DataFrame(columns=['invalid_properties', 'invalid_values', 'invalid_reason', 'invalid_line_num', 'node_type'])
-            df_missing = pd.DataFrame(columns=['missing_properties', 'missing_reason', 'missing_line_num', 'node_type'])
-            df_duplicate_id = pd.DataFrame(columns=['duplicate_id', 'duplicate_reason', 'duplicate_id_field', 'duplicate_line_num', 'node_type'])
-            duplicate_id = []
-            duplicate_reason = []
-            duplicate_line_num = []
-            duplicate_node_type = []
-            duplicate_id_field = []
-            for org_obj in reader:
-                obj = self.cleanup_node(org_obj)
-                props = self.get_node_properties(obj)
-                line_num += 1
-                id_field = self.schema.get_id_field(obj)
-                node_id = self.schema.get_id(obj)
-
-                if node_id:
-                    if node_id in ids:
-                        if get_props_signature(props) != ids[node_id]['props']:
-                            validation_failed = True
-                            self.log.error(
-                                f'Invalid data at line {line_num}: duplicate {id_field}: {node_id}, found in line: '
-                                f'{", ".join(ids[node_id]["lines"])}')
-                            ids[node_id]['lines'].append(str(line_num))
-                            duplicate_id.append(node_id)
-                            duplicate_reason.append('duplicate_id')
-                            duplicate_line_num.append(line_num)
-                            duplicate_node_type.append(obj[NODE_TYPE])
-                            duplicate_id_field.append(id_field)
-                        else:
-                            # Same ID exists in same file, but properties are also same, probably it's pointing same
-                            # object to multiple parents
-                            self.log.debug(
-                                f'Duplicated data at line {line_num}: duplicate {id_field}: {node_id}, found in line: '
-                                f'{", ".join(ids[node_id]["lines"])}')
-                            duplicate_id.append(node_id)
-                            duplicate_reason.append('many_to_many')
-                            duplicate_line_num.append(line_num)
-                            duplicate_node_type.append(obj[NODE_TYPE])
-                            duplicate_id_field.append(id_field)
-                    else:
-                        ids[node_id] = {'props': get_props_signature(props), 'lines': [str(line_num)]}
-
-                validate_result = self.schema.validate_node(obj[NODE_TYPE], obj, verbose)
-                try:
-                    if len(validate_result['invalid_properties']) > 0:
-                        tmp_df_invalid = pd.DataFrame()
-                        tmp_df_invalid['invalid_properties'] = validate_result['invalid_properties']
-                        tmp_df_invalid['invalid_values'] = validate_result['invalid_values']
-                        tmp_df_invalid['invalid_reason'] = validate_result['invalid_reason']
-                        tmp_df_invalid['invalid_line_num'] = line_num
-                        tmp_df_invalid['node_type'] = obj[NODE_TYPE]
-                        df_invalid = pd.concat([df_invalid,tmp_df_invalid])
-
-                except Exception as e:
-                    print(e)
-                try:
-                    if len(validate_result['missing_properties']) > 0:
-                        tmp_df_missing = pd.DataFrame()
-                        tmp_df_missing['missing_properties'] = validate_result['missing_properties']
-                        tmp_df_missing['missing_reason'] = validate_result['missing_reason']
-                        tmp_df_missing['missing_line_num'] = line_num
-                        tmp_df_missing['node_type'] = obj[NODE_TYPE]
-                        df_missing = pd.concat([df_missing, tmp_df_missing])
-                except Exception as e:
-                    print(e)
-                if not validate_result['result'] and not validate_result['warning']:
-                    for msg in validate_result['messages']:
-                        self.log.error('Invalid data at line {}: "{}"!'.format(line_num, msg))
+        self.log.info('Validating file "{}" ...'.format(file_name))
+        validation_failed = False
+        violations = 0
+        ids = DuplicateIdDetector()
+        df_validation_result = pd.DataFrame(columns=VALIDATION_RESULT_COLUMNS)
+        field_validation_result = self.validate_field_name(file_name)
+        if not field_validation_result:
+            return False
+        # Invalid and missing values of all rows are buffered by column, and turned into frames once per file
+        invalid = {column: [] for column in INVALID_COLUMNS}
+        missing = {column: [] for column in MISSING_COLUMNS}
+        df_duplicate_id = pd.DataFrame(columns=['duplicate_id', 'duplicate_reason', 'duplicate_id_field', 'duplicate_line_num', 'node_type'])
+        duplicate_id = []
+        duplicate_reason = []
+        duplicate_line_num = []
+        duplicate_node_type = []
+        duplicate_id_field = []
+        node_type = None
+        if records is None:
+            records = self.validate_rows(((line_num, obj) for line_num, obj, _ in self.get_row_store(file_name)),
+                                         verbose)
+        for line_num, node_type, id_field, node_id, props_signature, validate_result in records:
+            duplicate = ids.check(node_id, props_signature, line_num) if node_id else None
+            if duplicate:
+                conflict, lines = duplicate
+                found_lines = ', '.join(str(line) for line in lines)
+                if conflict:
                     validation_failed = True
-                    violations += 1
-                    if violations >= max_violations:
-                        #return False, df_validation_dict
-                        break
-                elif not validate_result['result'] and validate_result['warning']:
-                    for msg in validate_result['messages']:
-                        self.log.warning('Invalid data at line {}: "{}"!'.format(line_num, msg))
-            # ouput the data vlidation result
-            df_duplicate_id['duplicate_id'] = duplicate_id
-            df_duplicate_id['duplicate_reason'] = duplicate_reason
-            df_duplicate_id['duplicate_line_num'] = duplicate_line_num
-            df_duplicate_id['node_type'] = duplicate_node_type
-            df_duplicate_id['duplicate_id_field'] = duplicate_id_field
-            ''''''
-            if len(df_invalid) > 0:
-                df_invalid = df_invalid.sort_values(by=['invalid_properties'])
-                df_invalid = df_invalid.explode('invalid_line_num').groupby(['invalid_properties', 'invalid_values', 'invalid_reason', 'node_type'])['invalid_line_num'].unique().reset_index()
-                tmp_df_validation_result_invalid = pd.DataFrame()
-                tmp_df_validation_result_invalid['File Name'] = [os.path.basename(file_name)] * len(df_invalid)
-                tmp_df_validation_result_invalid['Property'] = df_invalid['invalid_properties']
-                tmp_df_validation_result_invalid['Value'] =  df_invalid['invalid_values']
-                tmp_df_validation_result_invalid['Reason'] =  df_invalid['invalid_reason']
-                tmp_df_validation_result_invalid['Line Numbers'] = self.convert_line_num_list(list(df_invalid['invalid_line_num']))
-                tmp_df_validation_result_invalid['Severity'] = ["error"] * len(df_invalid)
-                df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_invalid])
-            if len(df_missing) >0:
-                df_missing = df_missing.sort_values(by=['missing_properties'])
-                df_missing = df_missing.explode('missing_line_num').groupby(['missing_properties', 'missing_reason', 'node_type'])['missing_line_num'].unique().reset_index()
-                tmp_df_validation_result_missing = pd.DataFrame()
-                tmp_df_validation_result_missing['File Name'] = [os.path.basename(file_name)] * len(df_missing)
-                tmp_df_validation_result_missing['Property'] = df_missing['missing_properties']
-                tmp_df_validation_result_missing['Reason'] =  df_missing['missing_reason']
-                tmp_df_validation_result_missing['Line Numbers'] = self.convert_line_num_list(list(df_missing['missing_line_num']))
-                tmp_df_validation_result_missing['Severity'] = ["error"] * len(df_missing)
-                df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_missing])
-            if len(df_duplicate_id) > 0:
-                df_duplicate_id = df_duplicate_id.explode('duplicate_line_num').groupby(['duplicate_id', 'duplicate_reason', 'duplicate_id_field', 'node_type'])['duplicate_line_num'].unique().reset_index()
-                tmp_df_validation_result_duplicate= pd.DataFrame()
-                tmp_df_validation_result_duplicate['File Name'] = [os.path.basename(file_name)] * len(df_duplicate_id)
-                tmp_df_validation_result_duplicate['Property'] = df_duplicate_id['duplicate_id_field']
-                tmp_df_validation_result_duplicate['Value'] = df_duplicate_id['duplicate_id']
-                tmp_df_validation_result_duplicate['Reason'] = df_duplicate_id['duplicate_reason']
-                tmp_df_validation_result_duplicate['Line Numbers'] = self.convert_line_num_list(list(df_duplicate_id['duplicate_line_num']))
-                tmp_df_validation_result_duplicate['Severity'] = ["error"] * len(df_duplicate_id)
-                df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_duplicate])
-            if len(df_validation_result) > 0:
-                if obj[NODE_TYPE] not in self.df_validation_dict.keys():
-                    self.df_validation_dict[obj[NODE_TYPE]] = df_validation_result
+                    self.log.error(
+                        f'Invalid data at line {line_num}: duplicate {id_field}: {node_id}, found in line: '
+                        f'{found_lines}')
+                    duplicate_id.append(node_id)
+                    duplicate_reason.append('duplicate_id')
+                    duplicate_line_num.append(line_num)
+                    duplicate_node_type.append(node_type)
+                    duplicate_id_field.append(id_field)
                 else:
-                    self.df_validation_dict[obj[NODE_TYPE]] = pd.concat([self.df_validation_dict[obj[NODE_TYPE]], df_validation_result])
-            return not validation_failed
-
-    def convert_line_num_list(self, line_num_list):
-        if len(line_num_list) > 0:
-            new_line_num_list = []
-            for line_num in line_num_list:
-                line_num.sort()
-                line_num_str = [str(x) for x in line_num]
-                if len(line_num) > 1:
-                    new_line_num_list.append(','.join(line_num_str))
+                    # Same ID exists in same file, but properties are also same, probably it's pointing same
+                    # object to multiple parents
+                    self.log.debug(
+                        f'Duplicated data at line {line_num}: duplicate {id_field}: {node_id}, found in line: '
+                        f'{found_lines}')
+                    duplicate_id.append(node_id)
+                    duplicate_reason.append('many_to_many')
+                    duplicate_line_num.append(line_num)
+                    duplicate_node_type.append(node_type)
+                    duplicate_id_field.append(id_field)
+
+            if validate_result is None:
+                continue
+            # Results of invalid nodes, e.g. unknown node type, have no property lists
+            count = len(validate_result.get('invalid_properties', []))
+            if count > 0:
+                if len(validate_result['invalid_values']) != count or len(validate_result['invalid_reason']) != count:
+                    self.log.error('Line {}: numbers of invalid properties, values and reasons are different, '
+                                   'invalid properties are not reported'.format(line_num))
                 else:
-                    new_line_num_list.append(line_num_str[0])
-            return new_line_num_list
-        else:
-            return line_num_list
+                    invalid['invalid_properties'].extend(validate_result['invalid_properties'])
+                    invalid['invalid_values'].extend(validate_result['invalid_values'])
+                    invalid['invalid_reason'].extend(validate_result['invalid_reason'])
+                    invalid['invalid_line_num'].extend([line_num] * count)
+                    invalid['node_type'].extend([node_type] * count)
+            count = len(validate_result.get('missing_properties', []))
+            if count > 0:
+                if len(validate_result['missing_reason']) != count:
+                    self.log.error('Line {}: numbers of missing properties and reasons are different, '
+                                   'missing properties are not reported'.format(line_num))
+                else:
+                    missing['missing_properties'].extend(validate_result['missing_properties'])
+                    missing['missing_reason'].extend(validate_result['missing_reason'])
+                    missing['missing_line_num'].extend([line_num] * count)
+                    missing['node_type'].extend([node_type] * count)
+            if not validate_result['result'] and not validate_result['warning']:
+                for msg in validate_result['messages']:
+                    self.log.error('Invalid data at line {}: "{}"!'.format(line_num, msg))
+                validation_failed = True
+                violations += 1
+                if violations >= max_violations:
+                    #return False, df_validation_dict
+                    break
+            elif not validate_result['result'] and validate_result['warning']:
+                for msg in validate_result['messages']:
+                    self.log.warning('Invalid data at line {}: "{}"!'.format(line_num, msg))
+        # ouput the data vlidation result
+        df_duplicate_id['duplicate_id'] = duplicate_id
+        df_duplicate_id['duplicate_reason'] = duplicate_reason
+        df_duplicate_id['duplicate_line_num'] = duplicate_line_num
+        df_duplicate_id['node_type'] = duplicate_node_type
+        df_duplicate_id['duplicate_id_field'] = duplicate_id_field
+        ''''''
+        # Same dtypes as appending rows to the empty frames
+        df_invalid = pd.DataFrame(invalid, columns=INVALID_COLUMNS, dtype=object)
+        df_missing = pd.DataFrame(missing, columns=MISSING_COLUMNS, dtype=object)
+        if len(df_invalid) > 0:
+            df_invalid = df_invalid.sort_values(by=['invalid_properties'])
+            df_invalid = df_invalid.explode('invalid_line_num').groupby(['invalid_properties', 'invalid_values', 'invalid_reason', 'node_type'])['invalid_line_num'].unique().reset_index()
+            tmp_df_validation_result_invalid = pd.DataFrame()
+            tmp_df_validation_result_invalid['File Name'] = [os.path.basename(file_name)] * len(df_invalid)
+            tmp_df_validation_result_invalid['Property'] = df_invalid['invalid_properties']
+            tmp_df_validation_result_invalid['Value'] =  df_invalid['invalid_values']
+            tmp_df_validation_result_invalid['Reason'] =  df_invalid['invalid_reason']
+            tmp_df_validation_result_invalid['Line Numbers'] = self.convert_line_num_list(list(df_invalid['invalid_line_num']))
+            tmp_df_validation_result_invalid['Severity'] = ["error"] * len(df_invalid)
+            df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_invalid])
+        if len(df_missing) >0:
+            df_missing = df_missing.sort_values(by=['missing_properties'])
+            df_missing = df_missing.explode('missing_line_num').groupby(['missing_properties', 'missing_reason', 'node_type'])['missing_line_num'].unique().reset_index()
+            tmp_df_validation_result_missing = pd.DataFrame()
+            tmp_df_validation_result_missing['File Name'] = [os.path.basename(file_name)] * len(df_missing)
+            tmp_df_validation_result_missing['Property'] = df_missing['missing_properties']
+            tmp_df_validation_result_missing['Reason'] =  df_missing['missing_reason']
+            tmp_df_validation_result_missing['Line Numbers'] = self.convert_line_num_list(list(df_missing['missing_line_num']))
+            tmp_df_validation_result_missing['Severity'] = ["error"] * len(df_missing)
+            df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_missing])
+        if len(df_duplicate_id) > 0:
+            df_duplicate_id = df_duplicate_id.explode('duplicate_line_num').groupby(['duplicate_id', 'duplicate_reason', 'duplicate_id_field', 'node_type'])['duplicate_line_num'].unique().reset_index()
+            tmp_df_validation_result_duplicate= pd.DataFrame()
+            tmp_df_validation_result_duplicate['File Name'] = [os.path.basename(file_name)] * len(df_duplicate_id)
+            tmp_df_validation_result_duplicate['Property'] = df_duplicate_id['duplicate_id_field']
+            tmp_df_validation_result_duplicate['Value'] = df_duplicate_id['duplicate_id']
+            tmp_df_validation_result_duplicate['Reason'] = df_duplicate_id['duplicate_reason']
+            tmp_df_validation_result_duplicate['Line Numbers'] = self.convert_line_num_list(list(df_duplicate_id['duplicate_line_num']))
+            tmp_df_validation_result_duplicate['Severity'] = ["error"] * len(df_duplicate_id)
+            df_validation_result = pd.concat([df_validation_result, tmp_df_validation_result_duplicate])
+        if len(df_validation_result) > 0:
+            self.add_validation_result(node_type, df_validation_result)
+        return not validation_failed
 
-    def get_new_statement(self, node_type, obj):
-        # statement is used to create current node
-        prop_stmts = []
+    def convert_line_num_list(self, line_num_list):
+        # Consecutive line numbers are reported as ranges, e.g. "3-1000"
+        return [compress_line_numbers(line_nums) for line_nums in line_num_list]
 
-        for key in obj.keys():
+    def get_node_row(self, obj):
+        """
+        Generate the parameters of one row in an UNWIND statement from a prepared node
+        :param obj: prepared node (dict), may contain parent pointers, relationship properties etc.
+        :return: an object (dict) that only contains properties to be saved on the node
+        """
+        row = {}
+        for key, value in obj.items():
             if key in excluded_fields:
                 continue
             elif is_parent_pointer(key):
                 continue
             elif self.schema.is_relationship_property(key):
                 continue
+            row[key] = value
+        return row
+
+    @staticmethod
+    def get_new_statement(node_type, keys):
+        # statement is used to create nodes, one for each row in $rows
+        prop_stmts = []
 
-            prop_stmts.append('{0}: ${0}'.format(key))
+        for key in keys:
+            prop_stmts.append('{0}: row.{0}'.format(key))
 
-        statement = 'CREATE (:{0} {{ {1} }})'.format(node_type, ' ,'.join(prop_stmts))
+        statement = 'UNWIND $rows AS row CREATE (:{0} {{ {1} }})'.format(node_type, ' ,'.join(prop_stmts))
         return statement
 
-    def get_upsert_statement(self, node_type, id_field, obj):
-        # statement is used to create current node
+    @staticmethod
+    def get_upsert_statement(node_type, id_field, keys):
+        # statement is used to create or update nodes, one for each row in $rows
         statement = ''
         prop_stmts = []
 
-        for key in obj.keys():
-            if key in excluded_fields:
-                continue
-            elif key == id_field:
-                continue
-            elif is_parent_pointer(key):
-                continue
-            elif self.schema.is_relationship_property(key):
+        for key in keys:
+            if key == id_field:
                 continue
+            prop_stmts.append('n.{0} = row.{0}'.format(key))
 
-            prop_stmts.append('n.{0} = ${0}'.format(key))
-
-        statement += 'MERGE (n:{0} {{ {1}: ${1} }})'.format(node_type, id_field)
-        statement += ' ON CREATE ' + 'SET n.{} = datetime(), '.format(CREATED) + ' ,'.join(prop_stmts)
-        statement += ' ON MATCH ' + 'SET n.{} = datetime(), '.format(UPDATED) + ' ,'.join(prop_stmts)
+        statement += 'UNWIND $rows AS row MERGE (n:{0} {{ {1}: row.{1} }})'.format(node_type, id_field)
+        statement += ' ON CREATE ' + ', '.join(['SET n.{} = datetime()'.format(CREATED)] + prop_stmts)
+        statement += ' ON MATCH ' + ', '.join(['SET n.{} = datetime()'.format(UPDATED)] + prop_stmts)
         return statement
 
     # Delete a node and children with no other parents recursively
@@ -881,78 +1771,262 @@ class DataLoader:
             raise Exception('Wrong loading_mode: {}'.format(loading_mode))
         self.log.info('{} nodes from file: {}'.format(action_word, file_name))
 
-        file_encoding = check_encoding(file_name)
-        with open(file_name, encoding=file_encoding) as in_file:
-            reader = csv.DictReader(in_file, delimiter='\t')
-            nodes_created = 0
-            nodes_updated = 0
-            nodes_deleted = 0
-            node_type = 'UNKNOWN'
-            relationship_deleted = 0
-            line_num = 1
-            transaction_counter = 0
+        nodes_created = 0
+        nodes_updated = 0
+        nodes_deleted = 0
+        node_type = 'UNKNOWN'
+        relationship_deleted = 0
+        chunk = []
+        if loading_mode == NEW_MODE:
+            self.check_new_nodes(session, file_name)
+
+        for line_num, obj in self.get_prepared_rows(file_name):
+            node_type = obj[NODE_TYPE]
+            chunk.append((line_num, obj))
+            if len(chunk) >= (self.get_batch_size(node_type).size if split else BATCH_SIZE):
+                n_created, n_updated, n_deleted, r_deleted = self._load_node_chunk(session, chunk, loading_mode,
+                                                                                  split)
+                nodes_created += n_created
+                nodes_updated += n_updated
+                nodes_deleted += n_deleted
+                relationship_deleted += r_deleted
+                chunk = []
+                if split:
+                    self.log.info(f'{line_num - 1} rows loaded ...')
+        if chunk:
+            n_created, n_updated, n_deleted, r_deleted = self._load_node_chunk(session, chunk, loading_mode, split)
+            nodes_created += n_created
+            nodes_updated += n_updated
+            nodes_deleted += n_deleted
+            relationship_deleted += r_deleted
 
-            # Use session in one transaction mode
-            tx = session
-            # Use transactions in split-transactions mode
-            if split:
-                tx = session.begin_transaction()
+        if loading_mode == DELETE_MODE:
+            self.log.info('{} node(s) deleted'.format(nodes_deleted))
+            self.log.info('{} relationship(s) deleted'.format(relationship_deleted))
+        else:
+            self.log.info('{} (:{}) node(s) loaded'.format(nodes_created, node_type))
+            self.log.info('{} (:{}) node(s) updated'.format(nodes_updated, node_type))
 
-            for org_obj in reader:
-                line_num += 1
-                transaction_counter += 1
-                obj = self.prepare_node(org_obj, file_name)
-                node_type = obj[NODE_TYPE]
-                node_id = self.schema.get_id(obj)
-                if not node_id:
-                    raise Exception('Line:{}: No ids found!'.format(line_num))
-                id_field = self.schema.get_id_field(obj)
-                if loading_mode == UPSERT_MODE:
-                    statement = self.get_upsert_statement(node_type, id_field, obj)
-                elif loading_mode == NEW_MODE:
-                    if self.node_exists(tx, node_type, id_field, node_id):
-                        raise Exception(
-                            'Line: {}: Node (:{} {{ {}: {} }}) exists! Abort loading!'.format(line_num, node_type,
-                                                                                              id_field, node_id))
-                    else:
-                        statement = self.get_new_statement(node_type, obj)
-                elif loading_mode == DELETE_MODE:
-                    n_deleted, r_deleted = self.delete_node(tx, obj)
-                    nodes_deleted += n_deleted
-                    relationship_deleted += r_deleted
-                else:
-                    raise Exception('Wrong loading_mode: {}'.format(loading_mode))
-
-                if loading_mode != DELETE_MODE:
-                    result = tx.run(statement, obj)
-                    count = result.consume().counters.nodes_created
-                    #count the updated nodes
-                    update_count = 0
-                    if result.consume().counters.nodes_created == 0 and result.consume().counters.nodes_deleted == 0:
-                        update_count = 1
+    def check_new_nodes(self, session, file_name):
+        """
+        Abort loading in new mode if any node of a file exists in DB
+        """
+        conflicts, missing_id_line = self.find_existing_nodes(session, file_name)
+        # A row without ID before the first conflict aborts loading at that row
+        if conflicts and (not missing_id_line or conflicts[0][0] < missing_id_line):
+            conflict_line, conflict_type, conflict_id_field, conflict_id = conflicts[0]
+            raise Exception(
+                'Line: {}: Node (:{} {{ {}: {} }}) exists! Abort loading!'.format(conflict_line, conflict_type,
+                                                                                  conflict_id_field,
+                                                                                  conflict_id))
+
+    def load_nodes_and_relationships(self, session, file_name, loading_mode, split=False):
+        """
+        Load nodes and relationships of a file in a single pass, relationships of each chunk are written right after
+        its nodes, in the same transaction. Parents of the file must be in DB before loading it.
+        """
+        if loading_mode == NEW_MODE:
+            action_word = 'Loading new'
+        elif loading_mode == UPSERT_MODE:
+            action_word = 'Loading'
+        else:
+            raise Exception('Wrong loading_mode: {}'.format(loading_mode))
+        self.log.info('{} nodes and relationships from file: {}'.format(action_word, file_name))
+
+        if loading_mode == NEW_MODE:
+            self.check_new_nodes(session, file_name)
+        self.prefetch_parent_ids(session, file_name)
+        nodes_created = 0
+        nodes_updated = 0
+        relationships_created = {}
+        int_nodes_created = 0
+        provided_parents = 0
+        node_type = 'UNKNOWN'
+        chunk = []
+
+        for line_num, obj in self.get_prepared_rows(file_name):
+            node_type = obj[NODE_TYPE]
+            chunk.append((line_num, obj))
+            if len(chunk) >= (self.get_batch_size(node_type).size if split else BATCH_SIZE):
+                n_created, n_updated, int_created, provided_parents = self._load_fused_chunk(
+                    session, chunk, loading_mode, split, relationships_created)
+                nodes_created += n_created
+                nodes_updated += n_updated
+                int_nodes_created += int_created
+                chunk = []
+                if split:
+                    self.log.info(f'{line_num - 1} rows loaded ...')
+        if chunk:
+            n_created, n_updated, int_created, provided_parents = self._load_fused_chunk(
+                session, chunk, loading_mode, split, relationships_created)
+            nodes_created += n_created
+            nodes_updated += n_updated
+            int_nodes_created += int_created
+
+        self.log.info('{} (:{}) node(s) loaded'.format(nodes_created, node_type))
+        self.log.info('{} (:{}) node(s) updated'.format(nodes_updated, node_type))
+        if provided_parents == 0:
+            self.log.warning('there is no parent mapping columns in the node {}'.format(node_type))
+        for rel, count in relationships_created.items():
+            self.log.info('{} {} relationship(s) loaded'.format(count, rel))
+        if int_nodes_created > 0:
+            self.log.info('{} intermediate node(s) loaded'.format(int_nodes_created))
+
+    def _load_fused_chunk(self, session, chunk, loading_mode, split, relationships_created):
+        """
+        Load nodes and then relationships of a chunk of prepared rows, in its own transaction(s) in split-transactions
+        mode
+        :return: tuple of nodes created, nodes updated, intermediate nodes created and parents provided in the last
+                 row
+        """
+        def write(tx, rows):
+            return (self._write_node_chunk(tx, rows, loading_mode),
+                    self._write_relationship_chunk(tx, rows, loading_mode))
+        if split:
+            obj = chunk[0][1]
+            parent_types = {key.split('.')[0] for key in obj.keys() if is_parent_pointer(key)}
+            results = self.run_batch(session, chunk, write, self.get_batch_size(obj[NODE_TYPE]),
+                                     retry=not self.runs_plugins(obj[NODE_TYPE], parent_types),
+                                     idempotent=loading_mode != NEW_MODE)
+        else:
+            results = [write(session, chunk)]
+
+        nodes_created, nodes_updated, _, _ = self._add_node_stats([result[0] for result in results])
+        int_nodes_created, provided_parents = self._add_relationship_stats([result[1] for result in results],
+                                                                           relationships_created)
+        return nodes_created, nodes_updated, int_nodes_created, provided_parents
+
+    def _load_node_chunk(self, session, chunk, loading_mode, split):
+        """
+        Load a chunk of prepared rows, in its own transaction(s) in split-transactions mode
+        :param session: session in split-transactions mode, otherwise the transaction of whole loading
+        :param chunk: list of (line number, prepared node) tuples
+        :return: tuple of nodes created, nodes updated, nodes deleted and relationships deleted
+        """
+        if split:
+            def write(tx, rows):
+                return self._write_node_chunk(tx, rows, loading_mode)
+            # Deleting updates statistics before commit, and creating new nodes twice isn't safe
+            results = self.run_batch(session, chunk, write, self.get_batch_size(chunk[0][1][NODE_TYPE]),
+                                     retry=loading_mode != DELETE_MODE, idempotent=loading_mode != NEW_MODE)
+        else:
+            results = [self._write_node_chunk(session, chunk, loading_mode)]
+        return self._add_node_stats(results)
+
+    def _add_node_stats(self, results):
+        """
+        Add results of _write_node_chunk to loading statistics
+        :return: tuple of nodes created, nodes updated, nodes deleted and relationships deleted
+        """
+        nodes_created = 0
+        nodes_updated = 0
+        nodes_deleted = 0
+        relationship_deleted = 0
+        with self.stats_lock:
+            for nodes_stat, n_deleted, r_deleted in results:
+                nodes_deleted += n_deleted
+                relationship_deleted += r_deleted
+                for node_type, (count, update_count) in nodes_stat.items():
                     self.nodes_created += count
                     self.nodes_updated += update_count
                     nodes_created += count
                     nodes_updated += update_count
                     self.nodes_stat[node_type] = self.nodes_stat.get(node_type, 0) + count
                     self.nodes_stat_updated[node_type] = self.nodes_stat_updated.get(node_type, 0) + update_count
-                # commit and restart a transaction when batch size reached
-                if split and transaction_counter >= BATCH_SIZE:
-                    tx.commit()
-                    tx = session.begin_transaction()
-                    self.log.info(f'{line_num - 1} rows loaded ...')
-                    transaction_counter = 0
-            # commit last transaction
-            if split:
-                tx.commit()
+        return nodes_created, nodes_updated, nodes_deleted, relationship_deleted
 
+    def _write_node_chunk(self, tx, chunk, loading_mode):
+        """
+        Write a chunk of prepared rows in given transaction
+        :return: tuple of node type -> (nodes created, nodes updated), nodes deleted and relationships deleted
+        """
+        nodes_deleted = 0
+        relationship_deleted = 0
+        # Rows with same node type, id field and columns share one UNWIND statement
+        batches = {}
+        for line_num, obj in chunk:
+            node_type = obj[NODE_TYPE]
+            node_id = self.schema.get_id(obj)
+            if not node_id:
+                raise Exception('Line:{}: No ids found!'.format(line_num))
+            id_field = self.schema.get_id_field(obj)
             if loading_mode == DELETE_MODE:
-                self.log.info('{} node(s) deleted'.format(nodes_deleted))
-                self.log.info('{} relationship(s) deleted'.format(relationship_deleted))
+                n_deleted, r_deleted = self.delete_node(tx, obj)
+                nodes_deleted += n_deleted
+                relationship_deleted += r_deleted
+                continue
+            elif loading_mode not in [NEW_MODE, UPSERT_MODE]:
+                raise Exception('Wrong loading_mode: {}'.format(loading_mode))
+            row = self.get_node_row(obj)
+            batches.setdefault((node_type, id_field, tuple(row.keys())), []).append(row)
+
+        nodes_stat = {}
+        for (node_type, id_field, keys), rows in batches.items():
+            if loading_mode == UPSERT_MODE:
+                statement = self.get_upsert_statement(node_type, id_field, keys)
             else:
-                self.log.info('{} (:{}) node(s) loaded'.format(nodes_created, node_type))
-                self.log.info('{} (:{}) node(s) updated'.format(nodes_updated, node_type))
-
+                statement = self.get_new_statement(node_type, keys)
+            result = tx.run(statement, {'rows': rows})
+            count = result.consume().counters.nodes_created
+            # Every row that didn't create a node updated an existing one
+            update_count = len(rows) - count
+            created, updated = nodes_stat.get(node_type, (0, 0))
+            nodes_stat[node_type] = (created + count, updated + update_count)
+        return nodes_stat, nodes_deleted, relationship_deleted
+
+    def find_existing_nodes(self, session, file_name):
+        """
+        Find rows in a data file whose nodes already exist in DB, or that repeat an ID of an earlier row in the file
+        :param session: session or transaction used to query DB
+        :param file_name: data file
+        :return: tuple of conflicts as a list of (line number, node type, id field, node id) in line order, and line
+                 number of the first row without an ID (None if all rows have IDs)
+        """
+        conflicts = []
+        missing_id_line = None
+        # (node type, id field) -> {node id: line number}
+        node_ids = {}
+        for line_num, obj in self.get_prepared_rows(file_name):
+            node_id = self.schema.get_id(obj)
+            if not node_id:
+                if not missing_id_line:
+                    missing_id_line = line_num
+                continue
+            node_type = obj[NODE_TYPE]
+            id_field = self.schema.get_id_field(obj)
+            ids = node_ids.setdefault((node_type, id_field), {})
+            if node_id in ids:
+                conflicts.append((line_num, node_type, id_field, node_id))
+            else:
+                ids[node_id] = line_num
+
+        for (node_type, id_field), ids in node_ids.items():
+            statement = 'UNWIND $ids AS id MATCH (n:{0} {{ {1}: id }}) RETURN DISTINCT n.{1} AS id'.format(node_type,
+                                                                                                     id_field)
+            values = list(ids.keys())
+            for i in range(0, len(values), BATCH_SIZE):
+                result = session.run(statement, {'ids': values[i:i + BATCH_SIZE]})
+                for record in result:
+                    node_id = record['id']
+                    conflicts.append((ids[node_id], node_type, id_field, node_id))
+        conflicts.sort(key=lambda conflict: conflict[0])
+        return conflicts, missing_id_line
+
+    def check_new_nodes_in_files(self, file_list):
+        """
+        Report all rows in data files whose nodes already exist, used by dry run in NEW_MODE
+        :return: True if no conflicts found
+        """
+        passed = True
+        with self.driver.session() as session:
+            for file_name in file_list:
+                self.log.info('Checking existing nodes in file "{}" ...'.format(file_name))
+                conflicts, _ = self.find_existing_nodes(session, file_name)
+                for line_num, node_type, id_field, node_id in conflicts:
+                    self.log.error('Line: {}: Node (:{} {{ {}: {} }}) exists!'.format(line_num, node_type, id_field,
+                                                                                      node_id))
+                    passed = False
+        return passed
 
     def node_exists(self, session, label, prop, value):
         statement = 'MATCH (m:{0} {{ {1}: ${1} }}) return m'.format(label, prop)
@@ -962,8 +2036,137 @@ class DataLoader:
             self.log.warning('More than one nodes found! ')
         return count >= 1
 
-    def collect_relationships(self, obj, session, create_intermediate_node, line_num):
+    def clear_parent_id_cache(self):
+        with self.cache_lock:
+            self.existing_parent_ids = {}
+            self.checked_parent_ids = {}
+            self.dataset_parent_ids = None
+
+    def add_parent_ids(self, label, prop, values):
+        """
+        Record IDs of nodes known to exist in DB, e.g. intermediate nodes created by plugins
+        """
+        with self.cache_lock:
+            self.existing_parent_ids.setdefault((label, prop), set()).update(values)
+            self.checked_parent_ids.setdefault((label, prop), set()).update(values)
+
+    def prefetch_parent_ids(self, session, file_name):
+        """
+        Read distinct parent IDs of all parent pointer columns in a file, and check them against DB in bulk
+        :param session: session or transaction used to query DB, None if validating without DB
+        :param file_name: data file
+        """
+        parent_ids = {}
+        for _, obj, _ in self.get_row_store(file_name):
+            for key, value in obj.items():
+                if is_parent_pointer(key) and value:
+                    label, prop = key.split('.')
+                    parent_ids.setdefault((label, prop), set()).update(self.schema.get_list_values(value))
+        self.check_parent_ids(session, parent_ids)
+
+    def check_parent_ids(self, session, parent_ids):
+        """
+        Check parent IDs not defined in indexed data files against DB in bulk, results are used by parent_exists
+        :param session: session or transaction used to query DB, None if validating without DB
+        :param parent_ids: dict of (label, id field) -> set of parent IDs
+        """
+        if session is None:
+            return
+        for (label, prop), values in parent_ids.items():
+            with self.cache_lock:
+                if self.dataset_parent_ids:
+                    values = values - self.dataset_parent_ids.get((label, prop), set())
+                values = list(values - self.checked_parent_ids.get((label, prop), set()))
+            if not values:
+                continue
+            statement = 'UNWIND $ids AS id MATCH (m:{0} {{ {1}: id }}) RETURN DISTINCT m.{1} AS id'.format(label, prop)
+            found = 0
+            for i in range(0, len(values), BATCH_SIZE):
+                batch = values[i:i + BATCH_SIZE]
+                result = session.run(statement, {'ids': batch})
+                batch_existing = {record['id'] for record in result}
+                found += len(batch_existing)
+                # IDs are marked as checked only after existing ones are recorded, so other workers never see
+                # an existing parent as checked but missing
+                with self.cache_lock:
+                    self.existing_parent_ids.setdefault((label, prop), set()).update(batch_existing)
+                    self.checked_parent_ids.setdefault((label, prop), set()).update(batch)
+            self.log.info('{} of {} (:{}) parent node(s) found in DB'.format(found, len(values), label))
+
+    def parent_exists(self, session, label, prop, value):
+        """
+        Check if a parent node exists in indexed data files or DB, using IDs prefetched from DB when available
+        """
+        with self.cache_lock:
+            if self.dataset_parent_ids and value in self.dataset_parent_ids.get((label, prop), ()):
+                return True
+            if value in self.existing_parent_ids.get((label, prop), ()):
+                return True
+            if value in self.checked_parent_ids.get((label, prop), ()) or session is None:
+                return False
+        exists = self.node_exists(session, label, prop, value)
+        # Value is marked as checked only after it's recorded as existing, so other workers never see an existing
+        # parent as checked but missing
+        with self.cache_lock:
+            if exists:
+                self.existing_parent_ids.setdefault((label, prop), set()).add(value)
+            self.checked_parent_ids.setdefault((label, prop), set()).add(value)
+        return exists
+
+    def create_missing_parents(self, session, chunk):
+        """
+        Create missing parents of a chunk of rows with plugins supporting batches, one create_nodes call per plugin.
+        Each missing parent is requested once, by the first row referring to it.
+        :param session: session or transaction used to create nodes
+        :param chunk: list of (line number, prepared node) tuples
+        :return: tuple of number of nodes created, and set of (parent type, parent ID, line number) that plugins
+                 failed to create
+        """
+        batch_plugins = [plugin for plugin in self.plugins if has_batch_api(plugin)]
+        if not batch_plugins:
+            return 0, set()
+        requests = {}
+        requested = set()
+        for line_num, obj in chunk:
+            node_type = obj[NODE_TYPE]
+            for key, value in obj.items():
+                if not is_parent_pointer(key):
+                    continue
+                other_node, other_id = key.split('.')
+                relationship = self.schema.get_relationship(node_type, other_node)
+                # Undefined relationships are reported by collect_relationships
+                if not isinstance(relationship, dict) or not relationship[RELATIONSHIP_TYPE]:
+                    continue
+                for parent_id in self.schema.get_list_values(value):
+                    if (other_node, other_id, parent_id) in requested or \
+                            self.parent_exists(session, other_node, other_id, parent_id):
+                        continue
+                    requested.add((other_node, other_id, parent_id))
+                    for plugin in batch_plugins:
+                        if plugin.should_run(other_node, MISSING_PARENT):
+                            requests.setdefault(plugin, []).append(
+                                {'line_num': line_num, 'node_type': other_node, 'node_id': parent_id, 'src': obj,
+                                 'id_field': other_id})
+
+        nodes_created = 0
+        failed_parents = set()
+        for plugin, rows in requests.items():
+            results = plugin.create_nodes(session, MISSING_PARENT,
+                                          [{key: value for key, value in row.items() if key != 'id_field'}
+                                           for row in rows])
+            for row, created in zip(rows, results):
+                if created:
+                    nodes_created += 1
+                    self.add_parent_ids(row['node_type'], row['id_field'], [row['node_id']])
+                else:
+                    failed_parents.add((row['node_type'], row['node_id'], row['line_num']))
+        return nodes_created, failed_parents
+
+    def collect_relationships(self, obj, session, create_intermediate_node, line_num, one_to_one_checker=None,
+                              failed_parents=frozenset()):
         node_type = obj[NODE_TYPE]
+        if one_to_one_checker is None:
+            one_to_one_checker = OneToOneChecker(self.schema, [obj])
         relationships = []
         int_node_created = 0
         provided_parents = 0
@@ -984,14 +2187,20 @@ class DataLoader:
                     if not relationship_name:
                         self.log.error('Line: {}: Relationship not found!'.format(line_num))
                         raise Exception('Undefined relationship, abort loading!')
-                    if not self.node_exists(session, other_node, other_id, value):
+                    if not self.parent_exists(session, other_node, other_id, value):
                         create_parent = False
                         if create_intermediate_node:
                             for plugin in self.plugins:
                                 if plugin.should_run(other_node, MISSING_PARENT):
                                     create_parent = True
-                                    if plugin.create_node(session, line_num, other_node, value, obj):
+                                    # Batch call of the chunk already failed for this row
+                                    if has_batch_api(plugin) and (other_node, value, line_num) in failed_parents:
+                                        created = False
+                                    else:
+                                        created = plugin.create_node(session, line_num, other_node, value, obj)
+                                    if created:
                                         int_node_created += 1
+                                        self.add_parent_ids(other_node, other_id, [value])
                                         relationships.append(
                                             {PARENT_TYPE: other_node, PARENT_ID_FIELD: other_id, PARENT_ID: value,
                                             RELATIONSHIP_TYPE: relationship_name, MULTIPLIER: multiplier})
@@ -1010,9 +2219,10 @@ class DataLoader:
                                                                                                 other_id,
                                                                                                 value))
                     else:
-                        if multiplier == ONE_TO_ONE and self.parent_already_has_child(session, node_type, obj,
-                                                                                    relationship_name, other_node,
-                                                                                    other_id, value):
+                        id_field = self.schema.get_id_field(obj)
+                        pattern = (node_type, id_field, relationship_name, other_node, other_id)
+                        if multiplier == ONE_TO_ONE and one_to_one_checker.has_other_child(session, pattern, value,
+                                                                                           obj.get(id_field)):
                             self.log.error(
                                 'Line: {}: one_to_one relationship failed, parent already has a child!'.format(line_num))
                         else:
@@ -1028,62 +2238,6 @@ class DataLoader:
         return {RELATIONSHIPS: relationships, INT_NODE_CREATED: int_node_created, PROVIDED_PARENTS: provided_parents,
                 RELATIONSHIP_PROPS: relationship_properties}
 
-    def parent_already_has_child(self, session, node_type, node, relationship_name, parent_type, parent_id_field,
-                                 parent_id):
-        statement = 'MATCH (n:{})-[r:{}]->(m:{} {{ {}: $parent_id }}) return n'.format(node_type, relationship_name,
-                                                                                       parent_type, parent_id_field)
-        result = session.run(statement, {"parent_id": parent_id})
-        if result:
-            child = result.single()
-            if child:
-                find_current_node_statement = 'MATCH (n:{0} {{ {1}: ${1} }}) return n'.format(node_type,
-                                                                                              self.schema.get_id_field(
-                                                                                                  node))
-                current_node_result = session.run(find_current_node_statement, node)
-                if current_node_result:
-                    current_node = current_node_result.single()
-                    return child[0].id != current_node[0].id
-                else:
-                    self.log.error('Could NOT find current node!')
-
-        return False
-
-    # Check if a relationship of same type exists, if so, return a statement which can delete it, otherwise return False
-    def has_existing_relationship(self, session, node_type, node, relationship, count_same_parent=False):
-        relationship_name = relationship[RELATIONSHIP_TYPE]
-        parent_type = relationship[PARENT_TYPE]
-        parent_id_field = relationship[PARENT_ID_FIELD]
-
-        base_statement = 'MATCH (n:{0} {{ {1}: ${1} }})-[r:{2}]->(m:{3})'.format(node_type,
-                                                                                 self.schema.get_id_field(node),
-                                                                                 relationship_name, parent_type)
-        statement = base_statement + ' return m.{} AS {}'.format(parent_id_field, PARENT_ID)
-        result = session.run(statement, node)
-        if result:
-            old_parent = result.single()
-            if old_parent:
-                if count_same_parent:
-                    del_statement = base_statement + ' delete r'
-                    return del_statement
-                else:
-                    old_parent_id = old_parent[PARENT_ID]
-                    if old_parent_id != relationship[PARENT_ID]:
-                        self.log.warning('Old parent is different from new parent, delete relationship to old parent:'
-                                         + ' (:{} {{ {}: "{}" }})!'.format(parent_type, parent_id_field, old_parent_id))
-                        del_statement = base_statement + ' delete r'
-                        return del_statement
-        else:
-            self.log.error('Remove old relationship failed: Query old relationship failed!')
-
-        return False
-
-    def remove_old_relationship(self, session, node_type, node, relationship):
-        del_statement = self.has_existing_relationship(session, node_type, node, relationship)
-        if del_statement:
-            del_result = session.run(del_statement, node)
-            if not del_result:
-                self.log.error('Delete old relationship failed!')
-
     def load_relationships(self, session, file_name, loading_mode, split=False):
         if loading_mode == NEW_MODE:
             action_word = 'Loading new'
@@ -1093,97 +2247,270 @@ class DataLoader:
             raise Exception('Wrong loading_mode: {}'.format(loading_mode))
         self.log.info('{} relationships from file: {}'.format(action_word, file_name))
 
-        file_encoding = check_encoding(file_name)
-        with open(file_name, encoding=file_encoding) as in_file:
-            reader = csv.DictReader(in_file, delimiter='\t')
-            relationships_created = {}
-            int_nodes_created = 0
-            line_num = 1
-            transaction_counter = 0
-
-            # Use session in one transaction mode
-            tx = session
-            # Use transactions in split-transactions mode
-            if split:
-                tx = session.begin_transaction()
-            for org_obj in reader:
-                line_num += 1
-                transaction_counter += 1
-                obj = self.prepare_node(org_obj, file_name)
-                node_type = obj[NODE_TYPE]
-                results = self.collect_relationships(obj, tx, True, line_num)
-                relationships = results[RELATIONSHIPS]
-                int_nodes_created += results[INT_NODE_CREATED]
-                provided_parents = results[PROVIDED_PARENTS]
-                relationship_props = results[RELATIONSHIP_PROPS]
-                if provided_parents > 0:
-                    if len(relationships) == 0:
-                        raise Exception('Line: {}: No parents found, abort loading!'.format(line_num))
-                    for relationship in relationships:
-                        relationship_name = relationship[RELATIONSHIP_TYPE]
-                        multiplier = relationship[MULTIPLIER]
-                        parent_node = relationship[PARENT_TYPE]
-                        parent_id_field = relationship[PARENT_ID_FIELD]
-                        parent_id = relationship[PARENT_ID]
-                        properties = relationship_props.get(relationship_name, {})
-                        if multiplier in [DEFAULT_MULTIPLIER, ONE_TO_ONE]:
-                            if loading_mode == UPSERT_MODE:
-                                self.remove_old_relationship(tx, node_type, obj, relationship)
-                            elif loading_mode == NEW_MODE:
-                                if self.has_existing_relationship(tx, node_type, obj, relationship, True):
-                                    raise Exception(
-                                        'Line: {}: Relationship already exists, abort loading!'.format(line_num))
-                            else:
-                                raise Exception('Wrong loading_mode: {}'.format(loading_mode))
-                        else:
-                            self.log.debug('Multiplier: {}, no action needed!'.format(multiplier))
-                        prop_statement = ', '.join(self.get_relationship_prop_statements(properties))
-                        statement = 'MATCH (m:{0} {{ {1}: $__parentID__ }})'.format(parent_node, parent_id_field)
-                        statement += ' MATCH (n:{0} {{ {1}: ${1} }})'.format(node_type,
-                                                                             self.schema.get_id_field(obj))
-                        statement += ' MERGE (n)-[r:{}]->(m)'.format(relationship_name)
-                        statement += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
-                        statement += ', {}'.format(prop_statement) if prop_statement else ''
-                        statement += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
-                        statement += ', {}'.format(prop_statement) if prop_statement else ''
-
-                        result = tx.run(statement, {**obj, "__parentID__": parent_id, **properties})
-                        count = result.consume().counters.relationships_created
-                        self.relationships_created += count
-                        relationship_pattern = '(:{})->[:{}]->(:{})'.format(node_type, relationship_name, parent_node)
-                        relationships_created[relationship_pattern] = relationships_created.get(relationship_pattern,
-                                                                                                0) + count
-                        self.relationships_stat[relationship_name] = self.relationships_stat.get(relationship_name,
-                                                                                                 0) + count
-                    for plugin in self.plugins:
-                        if plugin.should_run(node_type, NODE_LOADED):
-                            if plugin.create_node(session=tx, line_num=line_num, src=obj):
-                                int_nodes_created += 1
-                # commit and restart a transaction when batch size reached
-                if split and transaction_counter >= BATCH_SIZE:
-                    tx.commit()
-                    tx = session.begin_transaction()
+        self.prefetch_parent_ids(session, file_name)
+        relationships_created = {}
+        int_nodes_created = 0
+        provided_parents = 0
+        node_type = 'UNKNOWN'
+        chunk = []
+
+        for line_num, obj in self.get_prepared_rows(file_name):
+            node_type = obj[NODE_TYPE]
+            chunk.append((line_num, obj))
+            if len(chunk) >= (self.get_batch_size(node_type).size if split else BATCH_SIZE):
+                int_created, provided_parents = self._load_relationship_chunk(session, chunk, loading_mode, split,
+                                                                             relationships_created)
+                int_nodes_created += int_created
+                chunk = []
+                if split:
                     self.log.info(f'{line_num - 1} rows loaded ...')
-                    transaction_counter = 0
-
-            # commit last transaction
-            if split:
-                tx.commit()
-            if provided_parents == 0:
-                    self.log.warning('there is no parent mapping columns in the node {}'.format(node_type))
-            for rel, count in relationships_created.items():
-                self.log.info('{} {} relationship(s) loaded'.format(count, rel))
-            if int_nodes_created > 0:
-                self.log.info('{} intermediate node(s) loaded'.format(int_nodes_created))
+        if chunk:
+            int_created, provided_parents = self._load_relationship_chunk(session, chunk, loading_mode, split,
+                                                                         relationships_created)
+            int_nodes_created += int_created
+
+        if provided_parents == 0:
+            self.log.warning('there is no parent mapping columns in the node {}'.format(node_type))
+        for rel, count in relationships_created.items():
+            self.log.info('{} {} relationship(s) loaded'.format(count, rel))
+        if int_nodes_created > 0:
+            self.log.info('{} intermediate node(s) loaded'.format(int_nodes_created))
 
         return True
 
+    def _load_relationship_chunk(self, session, chunk, loading_mode, split, relationships_created):
+        """
+        Load relationships of a chunk of prepared rows, in its own transaction(s) in split-transactions mode
+        :param session: session in split-transactions mode, otherwise the transaction of whole loading
+        :param chunk: list of (line number, prepared node) tuples
+        :param relationships_created: relationship pattern -> count of relationships created from current file
+        :return: tuple of intermediate nodes created and parents provided in the last row
+        """
+        if split:
+            def write(tx, rows):
+                return self._write_relationship_chunk(tx, rows, loading_mode)
+            obj = chunk[0][1]
+            parent_types = {key.split('.')[0] for key in obj.keys() if is_parent_pointer(key)}
+            # Plugins keep state outside of the transaction, so their batches can't be retried
+            results = self.run_batch(session, chunk, write, self.get_batch_size(obj[NODE_TYPE]),
+                                     retry=not self.runs_plugins(obj[NODE_TYPE], parent_types))
+        else:
+            results = [self._write_relationship_chunk(session, chunk, loading_mode)]
+        return self._add_relationship_stats(results, relationships_created)
+
+    def _add_relationship_stats(self, results, relationships_created):
+        """
+        Add results of _write_relationship_chunk to loading statistics
+        :param relationships_created: relationship pattern -> count of relationships created from current file
+        :return: tuple of intermediate nodes created and parents provided in the last row
+        """
+        int_nodes_created = 0
+        provided_parents = 0
+        with self.stats_lock:
+            for relationships_stat, int_created, provided_parents, loaded_nodes in results:
+                int_nodes_created += int_created
+                self.loaded_nodes.extend(loaded_nodes)
+                for (node_type, relationship_name, parent_node), count in relationships_stat.items():
+                    self.relationships_created += count
+                    relationship_pattern = '(:{})->[:{}]->(:{})'.format(node_type, relationship_name, parent_node)
+                    relationships_created[relationship_pattern] = \
+                        relationships_created.get(relationship_pattern, 0) + count
+                    self.relationships_stat[relationship_name] = \
+                        self.relationships_stat.get(relationship_name, 0) + count
+        return int_nodes_created, provided_parents
+
+    def _write_relationship_chunk(self, tx, chunk, loading_mode):
+        """
+        Write relationships of a chunk of prepared rows in given transaction
+        :return: tuple of (node type, relationship type, parent type) -> relationships created, intermediate nodes
+                 created, parents provided in the last row, and list of (line number, node type, id field, ID) of
+                 nodes for NODE_LOADED plugins
+        """
+        provided_parents = 0
+        # Relationships with same child, relationship type, parent and properties share one UNWIND statement
+        batches = {}
+        # Old relationships to delete before batches are written, keyed by (node type, id field, relationship type,
+        # parent type)
+        deletes = {}
+        # Keys of relationships not written yet, rows depending on them need the batches written first
+        pending_keys = set()
+        relationships_stat = {}
+        # Current parents of children in the chunk, queried in bulk per relationship pattern when first needed, and
+        # kept up to date with relationships written or deleted by the chunk
+        reconciled_children = self._get_reconciled_children(chunk)
+        existing_parents = {}
+        one_to_one_checker = OneToOneChecker(self.schema, (obj for _, obj in chunk))
+        int_nodes_created, failed_parents = self.create_missing_parents(tx, chunk)
+        # Nodes NODE_LOADED plugins run on after all files are loaded
+        loaded_nodes = []
+        for line_num, obj in chunk:
+            node_type = obj[NODE_TYPE]
+            row_keys = self._get_relationship_keys(obj)
+            if not pending_keys.isdisjoint(row_keys):
+                self._write_relationship_batches(tx, batches, relationships_stat, deletes)
+                one_to_one_checker.invalidate(pending_keys)
+                batches = {}
+                deletes = {}
+                pending_keys = set()
+            results = self.collect_relationships(obj, tx, True, line_num, one_to_one_checker, failed_parents)
+            relationships = results[RELATIONSHIPS]
+            int_nodes_created += results[INT_NODE_CREATED]
+            provided_parents = results[PROVIDED_PARENTS]
+            relationship_props = results[RELATIONSHIP_PROPS]
+            if provided_parents > 0:
+                if len(relationships) == 0:
+                    raise Exception('Line: {}: No parents found, abort loading!'.format(line_num))
+                id_field = self.schema.get_id_field(obj)
+                node_id = obj[id_field]
+                # Relationships of a row are only visible to later rows, like rows written one by one
+                row_parents = []
+                for relationship in relationships:
+                    relationship_name = relationship[RELATIONSHIP_TYPE]
+                    multiplier = relationship[MULTIPLIER]
+                    parent_node = relationship[PARENT_TYPE]
+                    parent_id_field = relationship[PARENT_ID_FIELD]
+                    parent_id = relationship[PARENT_ID]
+                    properties = relationship_props.get(relationship_name, {})
+                    if multiplier in [DEFAULT_MULTIPLIER, ONE_TO_ONE]:
+                        pattern = (node_type, id_field, relationship_name, parent_node, parent_id_field)
+                        if pattern not in existing_parents:
+                            existing_parents[pattern] = self._get_existing_parents(
+                                tx, pattern, reconciled_children.get(pattern, {node_id}))
+                        parents = existing_parents[pattern].setdefault(node_id, [])
+                        if loading_mode == UPSERT_MODE:
+                            if parents and parents[0] != parent_id:
+                                self.log.warning('Old parent is different from new parent, delete relationship to old'
+                                                 + ' parent: (:{} {{ {}: "{}" }})!'.format(parent_node,
+                                                                                          parent_id_field,
+                                                                                          parents[0]))
+                                deletes.setdefault(pattern[:4], set()).add(node_id)
+                                if multiplier == ONE_TO_ONE:
+                                    # Old parents become free for other children once the deletion is written
+                                    pending_keys.update((PARENT_ID_PARAM, parent_node, relationship_name, old_parent_id)
+                                                        for old_parent_id in parents)
+                                for other_pattern, children in existing_parents.items():
+                                    if other_pattern[:4] == pattern[:4] and node_id in children:
+                                        children[node_id].clear()
+                        elif loading_mode == NEW_MODE:
+                            if parents:
+                                raise Exception(
+                                    'Line: {}: Relationship already exists, abort loading!'.format(line_num))
+                        else:
+                            raise Exception('Wrong loading_mode: {}'.format(loading_mode))
+                        row_parents.append((parents, parent_id))
+                    else:
+                        self.log.debug('Multiplier: {}, no action needed!'.format(multiplier))
+                    batch_key = (node_type, id_field, relationship_name, parent_node, parent_id_field,
+                                 tuple(properties.keys()))
+                    batches.setdefault(batch_key, []).append(
+                        {**properties, CHILD_ID_PARAM: node_id, PARENT_ID_PARAM: parent_id})
+                for parents, parent_id in row_parents:
+                    parents.append(parent_id)
+                pending_keys.update(row_keys)
+                if any(plugin.should_run(node_type, NODE_LOADED) for plugin in self.plugins):
+                    loaded_nodes.append((line_num, node_type, id_field, node_id))
+        self._write_relationship_batches(tx, batches, relationships_stat, deletes)
+        return relationships_stat, int_nodes_created, provided_parents, loaded_nodes
+
+    def _get_reconciled_children(self, chunk):
+        """
+        Find children in a chunk whose many_to_one/one_to_one relationships are reconciled with their current parents
+        :param chunk: list of (line number, prepared node) tuples
+        :return: dict of (node type, id field, relationship type, parent type, parent id field) -> set of child IDs
+        """
+        children = {}
+        for _, obj in chunk:
+            node_type = obj[NODE_TYPE]
+            id_field = self.schema.get_id_field(obj)
+            for key in obj.keys():
+                if is_parent_pointer(key):
+                    parent_type, parent_id_field = key.split('.')
+                    relationship = self.schema.relationships.get(node_type, {}).get(parent_type)
+                    if isinstance(relationship, dict) and relationship[MULTIPLIER] in [DEFAULT_MULTIPLIER, ONE_TO_ONE]:
+                        pattern = (node_type, id_field, relationship[RELATIONSHIP_TYPE], parent_type, parent_id_field)
+                        children.setdefault(pattern, set()).add(obj.get(id_field))
+        return children
+
+    def _get_existing_parents(self, tx, pattern, child_ids):
+        """
+        Query current parents of children in bulk
+        :param pattern: (node type, id field, relationship type, parent type, parent id field)
+        :param child_ids: IDs of children
+        :return: dict of child ID -> list of parent IDs
+        """
+        node_type, id_field, relationship_name, parent_type, parent_id_field = pattern
+        statement = 'UNWIND $ids AS id MATCH (n:{0} {{ {1}: id }})-[r:{2}]->(m:{3})'.format(node_type, id_field,
+                                                                                          relationship_name,
+                                                                                          parent_type)
+        statement += ' RETURN id AS {0}, m.{1} AS {2}'.format(CHILD_ID_PARAM, parent_id_field, PARENT_ID_PARAM)
+        child_ids = list(child_ids)
+        existing_parents = {}
+        for i in range(0, len(child_ids), BATCH_SIZE):
+            result = tx.run(statement, {'ids': child_ids[i:i + BATCH_SIZE]})
+            for record in result:
+                existing_parents.setdefault(record[CHILD_ID_PARAM], []).append(record[PARENT_ID_PARAM])
+        return existing_parents
+
+    def _get_relationship_keys(self, obj):
+        """
+        Find keys of relationships whose existing state is queried while loading a row: the row's own
+        many_to_one/one_to_one relationships, and one_to_one relationships of its parents
+        :param obj: prepared node (dict)
+        :return: set of keys
+        """
+        node_type = obj[NODE_TYPE]
+        node_id = self.schema.get_id(obj)
+        keys = set()
+        for key, value in obj.items():
+            if is_parent_pointer(key):
+                other_node = key.split('.')[0]
+                relationship = self.schema.relationships.get(node_type, {}).get(other_node)
+                if not isinstance(relationship, dict):
+                    continue
+                relationship_name = relationship[RELATIONSHIP_TYPE]
+                multiplier = relationship[MULTIPLIER]
+                if multiplier in [DEFAULT_MULTIPLIER, ONE_TO_ONE]:
+                    keys.add((CHILD_ID_PARAM, node_type, relationship_name, node_id))
+                if multiplier == ONE_TO_ONE:
+                    for parent_id in self.schema.get_list_values(value):
+                        keys.add((PARENT_ID_PARAM, other_node, relationship_name, parent_id))
+        return keys
+
+    def _write_relationship_batches(self, tx, batches, relationships_stat, deletes):
+        """
+        Delete old relationships, then write batched relationships with one UNWIND statement per batch
+        :param batches: dict of batch key -> list of rows
+        :param relationships_stat: (node type, relationship type, parent type) -> count, updated with counts created
+        :param deletes: dict of (node type, id field, relationship type, parent type) -> IDs of children whose
+                        relationships of the type are deleted
+        """
+        for (node_type, id_field, relationship_name, parent_node), child_ids in deletes.items():
+            statement = 'UNWIND $ids AS id MATCH (n:{0} {{ {1}: id }})-[r:{2}]->(m:{3}) DELETE r'.format(
+                node_type, id_field, relationship_name, parent_node)
+            tx.run(statement, {'ids': list(child_ids)}).consume()
+        for batch_key, rows in batches.items():
+            node_type, id_field, relationship_name, parent_node, parent_id_field, prop_keys = batch_key
+            prop_statement = ', '.join(self.get_relationship_prop_statements(prop_keys))
+            statement = 'UNWIND $rows AS row'
+            statement += ' MATCH (m:{0} {{ {1}: row.{2} }})'.format(parent_node, parent_id_field, PARENT_ID_PARAM)
+            statement += ' MATCH (n:{0} {{ {1}: row.{2} }})'.format(node_type, id_field, CHILD_ID_PARAM)
+            statement += ' MERGE (n)-[r:{}]->(m)'.format(relationship_name)
+            statement += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
+            statement += ', {}'.format(prop_statement) if prop_statement else ''
+            statement += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
+            statement += ', {}'.format(prop_statement) if prop_statement else ''
+
+            result = tx.run(statement, {'rows': rows})
+            count = result.consume().counters.relationships_created
+            stat_key = (node_type, relationship_name, parent_node)
+            relationships_stat[stat_key] = relationships_stat.get(stat_key, 0) + count
+
     @staticmethod
     def get_relationship_prop_statements(props):
         prop_stmts = []
 
         for key in props:
-            prop_stmts.append('r.{0} = ${0}'.format(key))
+            prop_stmts.append('r.{0} = row.{0}'.format(key))
         return prop_stmts
 
     def wipe_db(self, session, split=False):
@@ -0,0 +1,93 @@
+from array import array
+from hashlib import blake2b
+
+INITIAL_CAPACITY = 1024
+# Table grows when more than this part of slots are used
+MAX_LOAD_FACTOR = 0.5
+DIGEST_SIZE = 16
+
+
+def get_digest(value):
+    """
+    128-bit digest of a string as a pair of 64-bit integers
+    """
+    digest = blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=DIGEST_SIZE).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+
+class DuplicateIdDetector:
+    """
+    Finds repeated node IDs in a data file, and whether repeated IDs come with the same properties.
+
+    Each ID is kept as fixed-width digests of the ID and its properties signature, plus the line number it first
+    appeared at, in flat arrays of 64-bit integers used as an open-addressing hash table with linear probing.
+    Line numbers of later occurrences are only kept for IDs repeated with different properties.
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.count = 0
+        self._allocate(capacity)
+        # Lines of occurrences with properties different from the first one, keyed by ID digest
+        self.conflict_lines = {}
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = capacity - 1
+        # ID digest and properties digest of each slot, 4 integers per slot
+        self.digests = array('Q', bytes(capacity * 4 * 8))
+        # Line number of first occurrence in each slot, 0 for empty slots
+        self.lines = array('q', bytes(capacity * 8))
+
+    def __len__(self):
+        return self.count
+
+    def _find_slot(self, id_low, id_high):
+        digests = self.digests
+        lines = self.lines
+        slot = id_low & self.mask
+        while lines[slot]:
+            if digests[slot * 4] == id_low and digests[slot * 4 + 1] == id_high:
+                return slot
+            slot = (slot + 1) & self.mask
+        return slot
+
+    def _grow(self):
+        digests = self.digests
+        lines = self.lines
+        self._allocate(self.capacity * 2)
+        for old_slot, line_num in enumerate(lines):
+            if line_num:
+                offset = old_slot * 4
+                slot = self._find_slot(digests[offset], digests[offset + 1])
+                self.digests[slot * 4:slot * 4 + 4] = digests[offset:offset + 4]
+                self.lines[slot] = line_num
+
+    def check(self, node_id, props_signature, line_num):
+        """
+        Record an occurrence of a node ID
+        :param node_id: ID of the node
+        :param props_signature: signature of node properties, see get_props_signature
+        :param line_num: line number of the occurrence, must be positive
+        :return: None if ID is new, otherwise tuple of whether properties are different from the first occurrence,
+                 and line numbers of the first occurrence and earlier occurrences with different properties.
+                 Occurrences with different properties are added to these line numbers
+        """
+        id_low, id_high = get_digest(str(node_id))
+        props_low, props_high = get_digest(props_signature)
+        slot = self._find_slot(id_low, id_high)
+        offset = slot * 4
+        if not self.lines[slot]:
+            self.digests[offset:offset + 4] = array('Q', (id_low, id_high, props_low, props_high))
+            self.lines[slot] = line_num
+            self.count += 1
+            if self.count > self.capacity * MAX_LOAD_FACTOR:
+                self._grow()
+            return None
+
+        lines = [self.lines[slot]]
+        extra_lines = self.conflict_lines.get((id_low, id_high))
+        if extra_lines:
+            lines.extend(extra_lines)
+        conflict = self.digests[offset + 2] != props_low or self.digests[offset + 3] != props_high
+        if conflict:
+            self.conflict_lines.setdefault((id_low, id_high), []).append(line_num)
+        return conflict, lines
@@ -459,6 +459,8 @@ class FileLoader:
         try:
             self.loader = DataLoader(self.driver, self.schema)
             if isinstance(self.loader, DataLoader):
+                # Parents defined in other manifests are not looked up in DB
+                self.loader.index_dataset(manifests)
                 for file in manifests:
                     if not self.loader.validate_parents_exist_in_file(file, 1):
                         self.log.error('Validate parents in {} failed, abort loading!'.format(file))
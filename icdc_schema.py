@@ -1,6 +1,8 @@
+import operator
 import os
 import re
 import sys
+from functools import lru_cache
 import yaml
 from bento.common.utils import get_logger, MULTIPLIER, DEFAULT_MULTIPLIER, RELATIONSHIP_TYPE, get_uuid, \
     parse_date
@@ -34,18 +36,108 @@ MAX = 'maximum'
 EX_MIN = 'exclusiveMinimum'
 EX_MAX = 'exclusiveMaximum'
 DESCRIPTION = 'Desc'
+WRONG_TYPE = 'wrong_type'
+OUT_OF_RANGE = 'out_of_range'
+NON_PERMISSIVE_VALUE = 'non_permissive_value'
+PASS_TYPE = 'pass'
+BOOLEAN_PATTERN = re.compile(r'\b(?:yes|true|no|false|ltf)\b', re.IGNORECASE)
+# Kinds of keys in a node
+SKIPPED_KEY = 'skipped'
+RELATIONSHIP_KEY = 'relationship'
+PROPERTY_KEY = 'property'
+# Number of distinct date strings whose validation results are cached
+DATE_CACHE_SIZE = 65536
 
 
 def is_parent_pointer(field_name):
     return re.fullmatch(r'\w+\.\w+', field_name) is not None
 
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def is_valid_date(str_value):
+    try:
+        parse_date(str_value)
+        return True
+    except ValueError:
+        return False
+
+
+def pass_validator(str_value):
+    return True, PASS_TYPE
+
+
+def compile_range_validator(convert, model_type):
+    """
+    Compile validator of Int or Float values, same as ICDC_Schema._validate_type
+
+    :param convert: int or float
+    :param model_type: dict specify value type and boundary/range
+    :return: validator function
+    """
+    bounds = [(operator.lt, model_type[MIN]) if MIN in model_type else None,
+              (operator.gt, model_type[MAX]) if MAX in model_type else None,
+              (operator.le, model_type[EX_MIN]) if EX_MIN in model_type else None,
+              (operator.ge, model_type[EX_MAX]) if EX_MAX in model_type else None]
+    bounds = [bound for bound in bounds if bound]
+
+    def validate(str_value):
+        if str_value:
+            try:
+                value = convert(str_value)
+            except ValueError:
+                return False, WRONG_TYPE
+            for compare, bound in bounds:
+                if compare(value, bound):
+                    return False, OUT_OF_RANGE
+        return True, PASS_TYPE
+    return validate
+
+
+def validate_boolean(str_value):
+    if str_value and not BOOLEAN_PATTERN.match(str_value):
+        return False, WRONG_TYPE
+    return True, PASS_TYPE
+
+
+def compile_enum_validator(enum):
+    """
+    Compile validator of String values with permissible value list, same as ICDC_Schema._validate_type
+
+    :param enum: permissible values
+    :return: validator function
+    """
+    permissible_values = frozenset(enum)
+
+    def validate(str_value):
+        if not isinstance(str_value, str):
+            return False, WRONG_TYPE
+        if str_value != '' and str_value not in permissible_values:
+            return False, NON_PERMISSIVE_VALUE
+        return True, PASS_TYPE
+    return validate
+
+
+def validate_date(str_value):
+    if not isinstance(str_value, str):
+        return False, WRONG_TYPE
+    if str_value.strip() != '' and not is_valid_date(str_value):
+        return False, WRONG_TYPE
+    return True, PASS_TYPE
+
+
+def validate_object(str_value):
+    if not isinstance(str_value, dict):
+        return False, WRONG_TYPE
+    return True, PASS_TYPE
+
+
 class ICDC_Schema:
     def __init__(self, yaml_files, props):
         if not isinstance(props, Props):
             raise AssertionError
         self.props = props
         self.rel_prop_delimiter = props.rel_prop_delimiter
+        self.rel_prop_pattern = re.compile('^.+\\{}.+$'.format(self.rel_prop_delimiter))
         self.delimiter = props.delimiter
         if not yaml_files:
             raise Exception('File list is empty,could not initialize ICDC_Schema object!')
@@ -104,7 +196,28 @@ class ICDC_Schema:
                     raise Exception("More than one key property found for the same node")
         if len(id_fields) > 0:
             self.props.id_fields.update(id_fields)
-            
+
+        self.compile_all_validators()
+
+    def __getstate__(self):
+        # Compiled validators are closures that can't be pickled, they are compiled again when unpickled
+        state = self.__dict__.copy()
+        del state['node_validators']
+        del state['relationship_validators']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile_all_validators()
+
+    def compile_all_validators(self):
+        # Compile validators of all properties once, validate_node dispatches through these tables
+        self.node_validators = {node_type: self.compile_validators(node[PROPERTIES])
+                                for node_type, node in self.nodes.items()}
+        self.relationship_validators = {rel_type: self.compile_validators(rel[PROPERTIES])
+                                        for rel_type, rel in self.relationship_props.items()}
+        self.key_kinds = {}
+
 
     def get_node_id(self, node_type):
         node_id_list = []
@@ -423,82 +536,132 @@ class ICDC_Schema:
                 result['missing_properties'].append(prop)
                 result['missing_reason'].append('value_empty')
 
-        properties = self.nodes[model_type][PROPERTIES]
+        validators = self.node_validators[model_type]
         # Validate all properties in given object
         for key, value in obj.items():
-            if key == NODE_TYPE:
+            kind = self.get_key_kind(key)
+            if kind == SKIPPED_KEY:
                 continue
-            elif is_parent_pointer(key):
-                continue
-            elif self.is_relationship_property(key):
+            elif kind == RELATIONSHIP_KEY:
                 rel_type, rel_prop = key.split(self.rel_prop_delimiter)
-                if rel_type not in self.relationship_props:
+                if rel_type not in self.relationship_validators:
                     result['result'] = False
                     result['messages'].append(f'Relationship "{rel_type}" does NOT exist in data model!')
                     continue
-                elif rel_prop not in self.relationship_props[rel_type][PROPERTIES]:
+                elif rel_prop not in self.relationship_validators[rel_type]:
                     result['result'] = False
                     result['messages'].append(f'Property "{rel_prop}" does NOT exist in relationship "{rel_type}"!')
                     continue
 
-                prop_type = self.relationship_props[rel_type][PROPERTIES][rel_prop]
-                type_validation_result, error_type = self._validate_type(prop_type, value)
+                validator, prop_type = self.relationship_validators[rel_type][rel_prop]
+                type_validation_result, error_type = validator(value)
                 if not type_validation_result:
                     result['result'] = False
                     result['invalid_values'].append(value)
                     result['invalid_properties'].append(rel_prop)
                     result['invalid_reason'].append(error_type)
                     if not verbose:
-                        if error_type == "non_permissive_value":
+                        if error_type == NON_PERMISSIVE_VALUE:
                             result['messages'].append(
                                 'Property: "{}":"{}" is not in permissible value list!'.format(rel_prop, value))
-                        elif error_type == "wrong_type":
+                        elif error_type == WRONG_TYPE:
                             result['messages'].append(
                                 'Property: "{}":"{}" is in wrong type!'.format(rel_prop, value))
                     else:
                         result['messages'].append(
                             'Property: "{}":"{}" is not a valid "{}" type!'.format(rel_prop, value, prop_type))
 
-            elif key not in properties:
+            elif key not in validators:
                 self.log.debug('Property "{}" is not in data model!'.format(key))
             else:
-                prop_type = properties[key]
-                type_validation_result, error_type = self._validate_type(prop_type, value)
+                validator, prop_type = validators[key]
+                type_validation_result, error_type = validator(value)
                 if not type_validation_result:
+                    # Arrays report the invalid item instead of the whole value
                     if type(error_type) is tuple:
-                        result['result'] = False
-                        result['invalid_values'].append(error_type[0])
-                        result['invalid_properties'].append(key)
-                        result['invalid_reason'].append(error_type[1])
-                        if not verbose:
-                            if error_type[1] == "non_permissive_value":
-                                result['messages'].append(
-                                    'Property: "{}":"{}" is not in permissible value list!'.format(key, error_type[0]))
-                            elif error_type[1] == "wrong_type":
-                                result['messages'].append(
-                                    'Property: "{}":"{}" is in wrong type!'.format(key, error_type[0]))
-                        else:
+                        value, error_type = error_type
+                    result['result'] = False
+                    result['invalid_values'].append(value)
+                    result['invalid_properties'].append(key)
+                    result['invalid_reason'].append(error_type)
+                    if not verbose:
+                        if error_type == NON_PERMISSIVE_VALUE:
                             result['messages'].append(
-                                'Property: "{}":"{}" is not a valid "{}" type!'.format(key, error_type[0], prop_type))
-                    else:
-                        result['result'] = False
-                        result['invalid_values'].append(value)
-                        result['invalid_properties'].append(key)
-                        result['invalid_reason'].append(error_type)
-                        if not verbose:
-                            if error_type == "non_permissive_value":
-                                result['messages'].append(
-                                    'Property: "{}":"{}" is not in permissible value list!'.format(key, value))
-                            elif error_type == "wrong_type":
-                                result['messages'].append(
-                                    'Property: "{}":"{}" is in wrong type!'.format(key, value))
-                        else:
+                                'Property: "{}":"{}" is not in permissible value list!'.format(key, value))
+                        elif error_type == WRONG_TYPE:
                             result['messages'].append(
-                                'Property: "{}":"{}" is not a valid "{}" type!'.format(key, value, prop_type))
-
+                                'Property: "{}":"{}" is in wrong type!'.format(key, value))
+                    else:
+                        result['messages'].append(
+                            'Property: "{}":"{}" is not a valid "{}" type!'.format(key, value, prop_type))
 
         return result
 
+    def compile_validators(self, properties):
+        """
+        Compile validators of properties
+
+        :param properties: dict of property name -> property type
+        :return: dict of property name -> (validator, property type)
+        """
+        return {prop: (self.compile_validator(prop_type), prop_type) for prop, prop_type in properties.items()}
+
+    def compile_validator(self, model_type):
+        """
+        Compile a validator function for given property type, validator returns same results as _validate_type.
+        Types without a specialized validator use _validate_type
+
+        :param model_type: dict specify value type, permissible values and boundary/range
+        :return: function takes a value and returns (is valid, error type)
+        """
+        value_type = model_type[PROP_TYPE]
+        if value_type == 'Float':
+            return compile_range_validator(float, model_type)
+        elif value_type == 'Int':
+            return compile_range_validator(int, model_type)
+        elif value_type == 'Boolean':
+            return validate_boolean
+        elif value_type == 'String':
+            if ENUM in model_type:
+                return compile_enum_validator(model_type[ENUM])
+            return pass_validator
+        elif value_type in ['Date', 'DateTime']:
+            return validate_date
+        elif value_type == 'Object':
+            return validate_object
+        elif value_type == 'Array' and isinstance(model_type.get(ITEM_TYPE), dict) and ENUM in model_type[ITEM_TYPE]:
+            return self._compile_array_validator(model_type[ITEM_TYPE])
+        return lambda str_value: self._validate_type(model_type, str_value)
+
+    def _compile_array_validator(self, item_type):
+        validate_item = self.compile_validator(item_type)
+
+        def validate(str_value):
+            for item in self.get_list_values(str_value):
+                validation_result, error_type = validate_item(item)
+                if not validation_result:
+                    return False, (item, error_type)
+            return True, PASS_TYPE
+        return validate
+
+    def get_key_kind(self, key):
+        """
+        Find out how a key in a node is validated, results are cached since nodes of same file share their keys
+
+        :param key: key in a node
+        :return: SKIPPED_KEY, RELATIONSHIP_KEY or PROPERTY_KEY
+        """
+        kind = self.key_kinds.get(key)
+        if kind is None:
+            if key == NODE_TYPE or is_parent_pointer(key):
+                kind = SKIPPED_KEY
+            elif self.is_relationship_property(key):
+                kind = RELATIONSHIP_KEY
+            else:
+                kind = PROPERTY_KEY
+            self.key_kinds[key] = kind
+        return kind
+
     @staticmethod
     def _validate_value_range(model_type, value):
         """
@@ -683,4 +846,4 @@ class ICDC_Schema:
             return obj[id_field]
 
     def is_relationship_property(self, key):
-        return re.match('^.+\{}.+$'.format(self.rel_prop_delimiter), key)
+        return self.rel_prop_pattern.match(key)
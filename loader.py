@@ -22,6 +22,8 @@ os.environ[APP_NAME] = 'Data_Loader'
 
 from config import BentoConfig
 from data_loader import DataLoader
+from columnar_loader import ColumnarDataLoader
+from validation_report import REPORT_FORMATS
 from bento.common.s3 import S3Bucket, upload_log_file
 
 DEFAULT_MAX_VIOLATIONS = 1000000
@@ -51,6 +53,28 @@ def parse_arguments(args = None):
     parser.add_argument('--dataset', help='Dataset directory')
     parser.add_argument('--split-transactions', help='Creates a separate transaction for each file',
                         action='store_true')
+    parser.add_argument('--min-batch-size', type=int,
+                        help='Minimum number of rows per transaction in split transactions mode')
+    parser.add_argument('--max-batch-size', type=int,
+                        help='Maximum number of rows per transaction in split transactions mode')
+    parser.add_argument('--batch-retries', type=int,
+                        help='Times a transaction failed with a transient error is retried')
+    parser.add_argument('--columnar', help='Read and convert data files by column with pandas',
+                        action='store_true')
+    parser.add_argument('--fused', help='Load nodes and relationships of a file in a single pass when its parents'
+                                        ' are already loaded', action='store_true')
+    parser.add_argument('--validation-workers', type=int,
+                        help='Number of processes validating data files concurrently')
+    parser.add_argument('--validation-chunk-size', type=float,
+                        help='Size (MB) of chunks large data files are split into when validated by multiple processes')
+    parser.add_argument('--validate-sample', type=int,
+                        help='Validate first N rows and N randomly sampled rows of each file before full validation')
+    parser.add_argument('--validation-report-format', help='Format of validation report file',
+                        choices=REPORT_FORMATS)
+    parser.add_argument('--load-workers', type=int,
+                        help='Number of files loaded concurrently in split transactions mode')
+    parser.add_argument('--row-store-memory-limit', type=int,
+                        help='Memory (MB) shared by rows of all files before spilling them to temp files')
     parser.add_argument('--upload-log-dir', help='Upload destination dir for log file,  if dir in s3, use the format, s3://[bucket]/[prefix]')
     parser.add_argument('--database-type', help='The database type, can be either neo4j or memgraph', choices=[NEO4J, MEMGRAPH])
     return parser.parse_args(args)
@@ -101,6 +125,31 @@ def process_arguments(args, log):
     # Conditionally Required Fields
     if args.split_transactions:
         config.split_transactions = args.split_transactions
+    if args.min_batch_size:
+        config.min_batch_size = args.min_batch_size
+    if args.max_batch_size:
+        config.max_batch_size = args.max_batch_size
+    if args.batch_retries is not None:
+        config.batch_retries = args.batch_retries
+    if args.columnar:
+        config.columnar = args.columnar
+    if args.fused:
+        config.fused = args.fused
+    if args.load_workers:
+        config.load_workers = args.load_workers
+    if args.validation_workers:
+        config.validation_workers = args.validation_workers
+    if args.validation_chunk_size:
+        config.validation_chunk_size = args.validation_chunk_size
+    if args.validation_report_format:
+        config.validation_report_format = args.validation_report_format
+    if args.validate_sample:
+        config.validate_sample = args.validate_sample
+    if config.validation_report_format and config.validation_report_format not in REPORT_FORMATS:
+        log.error('validation_report_format must be one of {}, abort loading'.format(', '.join(REPORT_FORMATS)))
+        sys.exit(1)
+    if args.row_store_memory_limit:
+        config.row_store_memory_limit = args.row_store_memory_limit
     if args.no_backup:
         config.no_backup = args.no_backup
     if args.backup_folder:
@@ -239,7 +288,7 @@ def main(args):
             else:
                 props = Props(config.prop_file)
             schema = ICDC_Schema(config.schema_files, props)
-            if not config.dry_run or config.loading_mode == DELETE_MODE:
+            if not config.dry_run or config.loading_mode in [DELETE_MODE, NEW_MODE]:
                 driver = GraphDatabase.driver(
                     config.neo4j_uri,
                     auth=(config.neo4j_user, config.neo4j_password),
@@ -253,7 +302,8 @@ def main(args):
                     plugins.append(prepare_plugin(plugin_config, schema))
             if config.memgraph_snapshot_dir:
                 memgraph_snapshot_dir = config.memgraph_snapshot_dir
-            loader = DataLoader(driver, schema, config, memgraph_snapshot_dir, plugins)
+            loader_class = ColumnarDataLoader if config.columnar else DataLoader
+            loader = loader_class(driver, schema, config, memgraph_snapshot_dir, plugins)
 
             load_result = loader.load(file_list, config.cheat_mode, config.dry_run, config.loading_mode, config.wipe_db,
                         config.max_violations, config.temp_folder, config.verbose, split=config.split_transactions,
@@ -261,7 +311,7 @@ def main(args):
             
             if load_result == False:
                 if loader.validation_result_file_key != "":
-                    zip_file_key = loader.validation_result_file_key.replace(".xlsx", ".zip")
+                    zip_file_key = os.path.splitext(loader.validation_result_file_key)[0] + ".zip"
                     with zipfile.ZipFile(zip_file_key, 'w') as zipf:
                         zipf.write(loader.validation_result_file_key, os.path.basename(loader.validation_result_file_key))
                         zipf.write(log_file, os.path.basename(log_file))
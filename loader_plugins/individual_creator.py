@@ -36,10 +36,10 @@ class IndividualCreator:
             return False
 
         statement = f'''
-            MATCH (c:{CASE_NODE})<--(r:{REGISTRATION_NODE}) 
+            MATCH (c:{CASE_NODE})<--(r:{REGISTRATION_NODE} {{ {id_field}: ${id_field} }})
             OPTIONAL match (c)-->(i:{INDIVIDUAL_NODE})
             WITH r, collect(DISTINCT c) AS cc, collect(distinct i) AS ci 
-            WHERE size(cc) > 1 and r.{id_field} = ${id_field}
+            WHERE size(cc) > 1
             RETURN cc, ci
         '''
         result = session.run(statement, {id_field: node_id})
@@ -68,15 +68,137 @@ class IndividualCreator:
 
             return individual_created
 
+    # Create individual nodes and connect cases of multi-case registrations, for all registrations of a chunk
+    def create_nodes(self, session, event, rows):
+        results = [False] * len(rows)
+        if event != NODE_LOADED:
+            return results
+        # Registration ID -> index of first row loading it
+        registrations = {}
+        for index, row in enumerate(rows):
+            src = row.get('src')
+            if src[NODE_TYPE] != REGISTRATION_NODE:
+                continue
+            registrations.setdefault(src[self.schema.get_id_field(src)], index)
+        if not registrations:
+            return results
+        id_field = self.schema.get_id_field({NODE_TYPE: REGISTRATION_NODE})
+
+        statement = f'''
+            UNWIND $ids AS r_id
+            MATCH (r:{REGISTRATION_NODE} {{ {id_field}: r_id }})-->(c:{CASE_NODE})
+            WITH r_id, r, collect(DISTINCT c) AS cc
+            WHERE size(cc) > 1
+            UNWIND cc AS c
+            OPTIONAL MATCH (c)-->(i:{INDIVIDUAL_NODE})
+            RETURN r_id, id(r) AS r_node, id(c) AS c_id, collect(DISTINCT id(i)) AS i_ids
+        '''
+        result = session.run(statement, {'ids': list(registrations.keys())})
+        # Registration ID -> case node ID -> individual node IDs, only first registration node of an ID is used
+        registration_cases = {}
+        registration_nodes = {}
+        for record in result:
+            r_id = record['r_id']
+            if registration_nodes.setdefault(r_id, record['r_node']) != record['r_node']:
+                continue
+            registration_cases.setdefault(r_id, {})[record['c_id']] = set(record['i_ids'])
+
+        # Registrations are resolved in order of rows, cases connected by earlier registrations are seen by later ones
+        case_individuals = {}
+        new_individuals = []
+        connections = []
+        for r_id, index in registrations.items():
+            cases = registration_cases.get(r_id)
+            if not cases:
+                continue
+            for c_id, i_ids in cases.items():
+                case_individuals.setdefault(c_id, set()).update(i_ids)
+            individual_nodes = set().union(*(case_individuals[c_id] for c_id in cases))
+            if len(individual_nodes) > 1:
+                msg = f"Line: {rows[index].get('line_num')}: More than one individuals associated with one dog!"
+                self.log.error(msg)
+                raise Exception(msg)
+            elif len(individual_nodes) == 1:
+                i_id = individual_nodes.pop()
+            else:
+                # New individuals are referred to by their registration IDs until they are created
+                i_id = ('new', r_id)
+                new_individuals.append(r_id)
+                results[index] = True
+            for c_id in cases:
+                if i_id not in case_individuals[c_id]:
+                    case_individuals[c_id].add(i_id)
+                    connections.append((c_id, i_id))
+
+        created = self.create_individuals(session, {r_id: self.schema.get_uuid_for_node(INDIVIDUAL_NODE, r_id)
+                                                    for r_id in new_individuals})
+        self.connect_cases_to_individuals(session, [
+            (c_id, created[i_id[1]] if isinstance(i_id, tuple) else i_id) for c_id, i_id in connections])
+        return results
+
+    # Allocate consecutive canine_individual_ids after the largest one in DB, zero-padded to 4 digits.
+    # Largest ID is read in the same transaction the individuals are created in, once per batch, so IDs created by
+    # other loaders or rolled back are never reused from an earlier batch
+    def allocate_individual_ids(self, session, count):
+        id_field = self.schema.props.id_fields.get(INDIVIDUAL_NODE)
+        statement = f'MATCH (i:{INDIVIDUAL_NODE}) RETURN max(toInteger(i.{id_field})) AS max_id'
+        max_id = session.run(statement).single()['max_id'] or 0
+        return ['{:04d}'.format(max_id + offset) for offset in range(1, count + 1)]
+
+    def create_individuals(self, session, uuids):
+        """
+        Create individual nodes in one statement
+        :param uuids: dict of registration ID -> UUID of its new individual
+        :return: dict of registration ID -> node ID of its individual
+        """
+        if not uuids:
+            return {}
+        id_field = self.schema.props.id_fields.get(INDIVIDUAL_NODE)
+        statement = f'''
+            UNWIND $rows AS row
+            CREATE (i:{INDIVIDUAL_NODE} {{ {id_field}: row.i_id, {CREATED}: datetime(), {UUID}: row.{UUID} }})
+            RETURN row.r_id AS r_id, id(i) AS node_id
+        '''
+        rows = [{'r_id': r_id, 'i_id': i_id, UUID: uuid}
+                for (r_id, uuid), i_id in zip(uuids.items(), self.allocate_individual_ids(session, len(uuids)))]
+        result = session.run(statement, {'rows': rows})
+        node_ids = {record['r_id']: record['node_id'] for record in result}
+        count = result.consume().counters.nodes_created
+        self.nodes_created += count
+        self.nodes_stat[INDIVIDUAL_NODE] = self.nodes_stat.get(INDIVIDUAL_NODE, 0) + count
+        # Updated counts are reported for every node type loaded
+        self.nodes_stat_updated[INDIVIDUAL_NODE] = self.nodes_stat_updated.get(INDIVIDUAL_NODE, 0)
+        return node_ids
+
+    def connect_cases_to_individuals(self, session, connections):
+        """
+        Connect cases to individuals in one statement
+        :param connections: list of (case node ID, individual node ID) tuples
+        """
+        if not connections:
+            return
+        relationship_name = self.schema.get_relationship(CASE_NODE, INDIVIDUAL_NODE).get('relationship_type')
+        statement = f'''
+            UNWIND $rows AS row
+            MATCH (i:{INDIVIDUAL_NODE})
+            WHERE id(i) = row.i_id
+            MATCH (c:{CASE_NODE})
+            WHERE id(c) = row.c_id
+            MERGE (c)-[r:{relationship_name}]->(i)
+              ON CREATE SET r.{CREATED} = datetime()
+        '''
+        result = session.run(statement, {'rows': [{'c_id': c_id, 'i_id': i_id} for c_id, i_id in connections]})
+        count = result.consume().counters.relationships_created
+        self.relationships_created += count
+        self.relationships_stat[relationship_name] = self.relationships_stat.get(relationship_name, 0) + count
+
     def create_individual(self, session, uuid):
         id_field = self.schema.props.id_fields.get(INDIVIDUAL_NODE)
         statement = f'''
-            MATCH (i:{INDIVIDUAL_NODE}) WITH apoc.number.format(coalesce(max(toInteger(i.canine_individual_id)) + 1, 
-            1), '0000') AS i_id CREATE (i:{INDIVIDUAL_NODE} {{ {id_field}: i_id, {CREATED}: datetime(), 
-            {UUID}:${UUID} }}) 
+            CREATE (i:{INDIVIDUAL_NODE} {{ {id_field}: $i_id, {CREATED}: datetime(), {UUID}:${UUID} }})
             RETURN id(i) AS node_id
             '''
-        result = session.run(statement, {UUID: uuid})
+        result = session.run(statement, {'i_id': self.allocate_individual_ids(session, 1)[0], UUID: uuid})
         if result:
             i_id = result.single()
             count = result.consume().counters.nodes_created
@@ -1,3 +1,4 @@
+from bisect import bisect_left, bisect_right
 from datetime import timedelta
 
 from neo4j import Session, Transaction
@@ -27,6 +28,45 @@ CASE_ID = 'case_id'
 CASE_NODE = 'case'
 
 
+class CaseCycles:
+    """
+    Cycles of a case as sorted intervals, a visit date is assigned to the first cycle (by start date) containing it,
+    or to the first cycle if it's within PREDATE days before the first cycle started
+    """
+    def __init__(self, cycles):
+        """
+        :param cycles: list of cycle data dicts, END_DATE is None for cycles without end dates
+        """
+        self.cycles = sorted(cycles, key=lambda cycle: cycle[START_DATE])
+        self.starts = [cycle[START_DATE] for cycle in self.cycles]
+        # Running maximum of end dates, first cycle ending on or after a date is found by bisecting it
+        self.max_ends = []
+        max_end = None
+        for cycle in self.cycles:
+            end_date = cycle[END_DATE] if cycle[END_DATE] else parse_date(FOREVER)
+            max_end = end_date if max_end is None or end_date > max_end else max_end
+            self.max_ends.append(max_end)
+
+    def find(self, date):
+        """
+        Find cycle of a visit date
+        :return: tuple of cycle data dict (None if date doesn't belong to any cycles), and True if date is before
+                 first cycle
+        """
+        if not self.cycles:
+            return None, False
+        started = bisect_right(self.starts, date)
+        if started == 0:
+            first_date = self.starts[0]
+            if date >= first_date - timedelta(days=PREDATE):
+                return self.cycles[0], True
+            return None, False
+        index = bisect_left(self.max_ends, date)
+        if index < started:
+            return self.cycles[index], False
+        return None, False
+
+
 # Intermediate node creator
 class VisitCreator:
     def __init__(self, schema):
@@ -40,36 +80,43 @@ class VisitCreator:
         self.nodes_stat = {}
         self.nodes_stat_updated = {}
         self.relationships_stat = {}
-        # Dictionary to cache case IDs and their associated cycles in order to prevent redundant querying
+        # Dictionary to cache case IDs and their associated cycles (CaseCycles) in order to prevent redundant querying
         self.cycle_map = {}
 
     def should_run(self, node_type, event):
         return node_type == VISIT_NODE and event == MISSING_PARENT
 
-    def create_node(self, session, line_num, node_type, node_id, src):
+    def get_visit_date(self, session, line_num, node_type, node_id, src):
+        """
+        Check arguments of a visit to create
+        :return: visit date, or None if visit can't be created
+        """
         if node_type != VISIT_NODE:
             self.log.debug("Line: {}: Won't create node for type: '{}'".format(line_num, VISIT_NODE))
-            return False
+            return None
         if not node_id:
             self.log.error("Line: {}: Can't create (:{}) node for id: '{}'".format(line_num, VISIT_NODE, node_id))
-            return False
+            return None
         if not src:
             self.log.error("Line: {}: Can't create (:{}) node for empty object".format(line_num, VISIT_NODE))
-            return False
+            return None
         if not session or (not isinstance(session, Session) and not isinstance(session, Transaction)):
             self.log.error("Neo4j session is not valid!")
-            return False
+            return None
         date_map = self.schema.props.visit_date_in_nodes
         if NODE_TYPE not in src:
             self.log.error('Line: {}: Given object doesn\'t have a "{}" field!'.format(line_num, NODE_TYPE))
-            return False
+            return None
         source_type = src[NODE_TYPE]
         date = src[date_map[source_type]]
         if not date:
             self.log.error('Line: {}: Visit date is empty!'.format(line_num))
-            return False
-        if NODE_TYPE not in src:
-            self.log.error('Line: {}: Given object doesn\'t have a "{}" field!'.format(line_num, NODE_TYPE))
+            return None
+        return date
+
+    def create_node(self, session, line_num, node_type, node_id, src):
+        date = self.get_visit_date(session, line_num, node_type, node_id, src)
+        if not date:
             return False
         statement = 'MERGE (v:{} {{ {}: $node_id, {}: $date, {}: true, {}: ${} }})'.format(
             VISIT_NODE, VISIT_ID, VISIT_DATE, INFERRED, UUID, UUID)
@@ -96,75 +143,188 @@ class VisitCreator:
         else:
             return False
 
+    def create_nodes(self, session, event, rows):
+        """
+        Create visits of a chunk of rows with batched statements, and connect new visits to their cycles or cases
+        :param event: should be MISSING_PARENT
+        :param rows: list of dicts with line_num, node_type, node_id and src keys, same as create_node arguments
+        :return: list of booleans, True if visit node was created for the row
+        """
+        results = [False] * len(rows)
+        if event != MISSING_PARENT:
+            return results
+        # Visit ID -> (row index, line number, visit date, source row)
+        visits = {}
+        for index, row in enumerate(rows):
+            line_num, node_id, src = row['line_num'], row['node_id'], row['src']
+            date = self.get_visit_date(session, line_num, row['node_type'], node_id, src)
+            if date and node_id not in visits:
+                visits[node_id] = (index, line_num, date, src)
+        if not visits:
+            return results
+
+        statement = 'UNWIND $rows AS row'
+        statement += ' OPTIONAL MATCH (e:{} {{ {}: row.node_id, {}: row.date, {}: true, {}: row.{} }})'.format(
+            VISIT_NODE, VISIT_ID, VISIT_DATE, INFERRED, UUID, UUID)
+        statement += ' WITH row, count(e) = 0 AS created'
+        statement += ' MERGE (v:{} {{ {}: row.node_id, {}: row.date, {}: true, {}: row.{} }})'.format(
+            VISIT_NODE, VISIT_ID, VISIT_DATE, INFERRED, UUID, UUID)
+        statement += ' ON CREATE SET v.{} = datetime()'.format(CREATED)
+        statement += ' ON MATCH SET v.{} = datetime()'.format(UPDATED)
+        statement += ' RETURN row.node_id AS node_id, created'
+        result = session.run(statement, {'rows': [
+            {'node_id': node_id, 'date': date, UUID: self.schema.get_uuid_for_node(VISIT_NODE, node_id)}
+            for node_id, (_, _, date, _) in visits.items()]})
+        created_visits = [record['node_id'] for record in result if record['created']]
+        count = len(created_visits)
+        update_count = len(visits) - count
+        self.nodes_created += count
+        self.nodes_updated += update_count
+        self.nodes_stat[VISIT_NODE] = self.nodes_stat.get(VISIT_NODE, 0) + count
+        self.nodes_stat_updated[VISIT_NODE] = self.nodes_stat_updated.get(VISIT_NODE, 0) + update_count
+        for node_id in created_visits:
+            results[visits[node_id][0]] = True
+        self.connect_visits(session, [(visits[node_id][1], node_id, visits[node_id][3][CASE_ID], visits[node_id][2])
+                                      for node_id in created_visits])
+        return results
+
+    def connect_visits(self, session, visits):
+        """
+        Connect new visits to their cycles, or to their cases if they don't belong to any cycles, with one statement
+        per relationship type
+        :param visits: list of (line number, visit ID, case ID, visit date) tuples
+        """
+        self.get_cycles(session, [case_id for _, _, case_id, _ in visits])
+        cycle_rows = []
+        case_rows = []
+        for line_num, visit_id, case_id, visit_date in visits:
+            if not self.cycle_map[case_id].cycles:
+                self.log.error('Line: {}: No cycles found for case: {}'.format(line_num, case_id))
+                self.log.error('Line: {}: Visit: "{}" does NOT belong to a cycle!'.format(line_num, visit_id))
+                continue
+            cycle_data = self.find_cycle(line_num, case_id, visit_date)
+            if cycle_data:
+                cycle_rows.append({'line_num': line_num, 'visit_id': visit_id, 'cycle_id': cycle_data[CYCLE_ID]})
+            else:
+                self.log.warning('Line: {}: Date: {} does not belong to any cycles, connected to case {} directly!'
+                                 .format(line_num, visit_date, case_id))
+                case_rows.append({'line_num': line_num, 'visit_id': visit_id, 'case_id': case_id})
+
+        if cycle_rows:
+            relationship_name = self.schema.get_relationship(VISIT_NODE, CYCLE_NODE)[RELATIONSHIP_TYPE]
+            connect_stmt = 'UNWIND $rows AS row'
+            connect_stmt += ' MATCH (v:{} {{ {}: row.visit_id }})'.format(VISIT_NODE, VISIT_ID)
+            connect_stmt += ' MATCH (c:{}) WHERE id(c) = row.cycle_id'.format(CYCLE_NODE)
+            connect_stmt += ' MERGE (v)-[r:{} {{ {}: true }}]->(c)'.format(relationship_name, INFERRED)
+            connect_stmt += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
+            connect_stmt += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
+            for row in self.run_connect_statement(session, connect_stmt, cycle_rows, relationship_name):
+                self.log.error(
+                    'Line: {}: Create (:visit)-[:of_cycle]->(:cycle) relationship failed!'.format(row['line_num']))
+                self.log.error('Line: {}: Visit: "{}" does NOT belong to a cycle!'.format(row['line_num'],
+                                                                                       row['visit_id']))
+        if case_rows:
+            relationship_name = self.schema.get_relationship(VISIT_NODE, CASE_NODE)[RELATIONSHIP_TYPE]
+            cnt_statement = 'UNWIND $rows AS row'
+            cnt_statement += ' MATCH (c:{} {{ {}: row.case_id }})'.format(CASE_NODE, CASE_ID)
+            cnt_statement += ' MATCH (v:{} {{ {}: row.visit_id }})'.format(VISIT_NODE, VISIT_ID)
+            cnt_statement += ' MERGE (c)<-[r:{} {{ {}: true }}]-(v)'.format(relationship_name, INFERRED)
+            cnt_statement += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
+            cnt_statement += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
+            for row in self.run_connect_statement(session, cnt_statement, case_rows, relationship_name):
+                self.log.error('Line: {}: Create (:{})-[:{}]->(:{}) relationship failed!'.format(
+                    row['line_num'], VISIT_NODE, relationship_name, CASE_NODE))
+                self.log.error('Line: {}: Visit: "{}" does NOT belong to a cycle!'.format(row['line_num'],
+                                                                                       row['visit_id']))
+
+    def run_connect_statement(self, session, statement, rows, relationship_name):
+        """
+        Run a batched statement connecting visits, and count relationships created
+        :return: rows whose relationship wasn't created
+        """
+        if not relationship_name:
+            return rows
+        statement += ' RETURN DISTINCT row.visit_id AS visit_id'
+        result = session.run(statement, {'rows': [{key: value for key, value in row.items() if key != 'line_num'}
+                                                  for row in rows]})
+        connected = {record['visit_id'] for record in result}
+        relationship_created = result.consume().counters.relationships_created
+        self.relationships_created += relationship_created
+        self.relationships_stat[relationship_name] = \
+            self.relationships_stat.get(relationship_name, 0) + relationship_created
+        return [row for row in rows if row['visit_id'] not in connected]
+
+    def get_cycles(self, session, case_ids):
+        """
+        Query cycles of cases not cached yet in one query, and cache them in cycle_map
+        :param case_ids: iterable of case IDs
+        """
+        case_ids = list({case_id for case_id in case_ids if case_id not in self.cycle_map})
+        if not case_ids:
+            return
+        cycles = {case_id: [] for case_id in case_ids}
+        find_cycles_stmt = 'MATCH (c:cycle) WHERE c.case_id IN $case_ids'
+        find_cycles_stmt += ' RETURN c, c.case_id AS case_id ORDER BY c.date_of_cycle_start'
+        result = session.run(find_cycles_stmt, {'case_ids': case_ids})
+        if result:
+            for record in result:
+                cycle = record.data()['c']
+                formatted_start_date = parse_date(cycle[START_DATE])
+                try:
+                    formatted_end_date = parse_date(cycle[END_DATE])
+                except ValueError:
+                    formatted_end_date = None
+                cycles[record['case_id']].append({
+                    START_DATE: formatted_start_date,
+                    END_DATE: formatted_end_date,
+                    CYCLE_ID: record[0].id
+                })
+        for case_id, cycle_data_array in cycles.items():
+            self.cycle_map[case_id] = CaseCycles(cycle_data_array)
+
+    def find_cycle(self, line_num, case_id, visit_date):
+        """
+        Find cycle of a visit in cached cycles of its case
+        :return: cycle data dict, or None if visit doesn't belong to any cycles
+        """
+        case_cycles = self.cycle_map[case_id]
+        cycle_data, before_first = case_cycles.find(parse_date(visit_date))
+        if cycle_data:
+            if before_first:
+                self.log.info(
+                    'Line: {}: Date: {} is before first cycle, but within {}'.format(line_num, visit_date, PREDATE)
+                    + ' days before first cycle started: {}, connected to first cycle'
+                    .format(date_to_string(case_cycles.starts[0])))
+            elif not cycle_data[END_DATE]:
+                self.log.warning('Line: {}: No end dates for cycle started on {} for {}'
+                                 .format(line_num, date_to_string(cycle_data[START_DATE]), case_id))
+        return cycle_data
+
     def connect_visit_to_cycle(self, session, line_num, visit_id, case_id, visit_date):
-        cycle_data_array = []
-        if case_id not in self.cycle_map:
-            find_cycles_stmt = 'MATCH (c:cycle) WHERE c.case_id = $case_id RETURN c ORDER BY c.date_of_cycle_start'
-            result = session.run(find_cycles_stmt, {'case_id': case_id})
-            if result:
-                # Iterates through each record in the result
-                for record in result:
-                    # Retrieves the cycle object from the record
-                    cycle = record.data()['c']
-                    # Stores the relevant cycle data in a dictionary
-                    formatted_start_date = parse_date(cycle[START_DATE])
-                    try:
-                        formatted_end_date = parse_date(cycle[END_DATE])
-                    except ValueError:
-                        formatted_end_date = None
-                    cycle_data = {
-                        START_DATE: formatted_start_date,
-                        END_DATE: formatted_end_date,
-                        CYCLE_ID: record[0].id
-                    }
-                    # Adds the dictionary to an array for storage
-                    cycle_data_array.append(cycle_data)
-                # The array of cycle data dictionaries is added to the cycle map
-                self.cycle_map[case_id] = cycle_data_array
-        else:
-            cycle_data_array = self.cycle_map[case_id]
-        if len(cycle_data_array) > 0:
-            first_date = None
-            pre_date = None
+        self.get_cycles(session, [case_id])
+        if self.cycle_map[case_id].cycles:
             relationship_name = self.schema.get_relationship(VISIT_NODE, CYCLE_NODE)[RELATIONSHIP_TYPE]
             if not relationship_name:
                 return False
-            for cycle_data in cycle_data_array:
-                date = parse_date(visit_date)
-                start_date = cycle_data[START_DATE]
-                if not first_date:
-                    first_date = start_date
-                    pre_date = first_date - timedelta(days=PREDATE)
-                if cycle_data[END_DATE]:
-                    end_date = cycle_data[END_DATE]
+            cycle_data = self.find_cycle(line_num, case_id, visit_date)
+            if cycle_data:
+                connect_stmt = 'MATCH (v:{} {{ {}: $visit_id }}) '.format(VISIT_NODE, VISIT_ID)
+                connect_stmt += 'MATCH (c:{}) WHERE id(c) = $cycle_id '.format(CYCLE_NODE)
+                connect_stmt += 'MERGE (v)-[r:{} {{ {}: true }}]->(c)'.format(relationship_name, INFERRED)
+                connect_stmt += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
+                connect_stmt += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
+
+                cnt_result = session.run(connect_stmt, {'visit_id': visit_id, 'cycle_id': cycle_data[CYCLE_ID]})
+                relationship_created = cnt_result.consume().counters.relationships_created
+                if relationship_created > 0:
+                    self.relationships_created += relationship_created
+                    self.relationships_stat[relationship_name] = \
+                        self.relationships_stat.get(relationship_name, 0) + relationship_created
+                    return True
                 else:
-                    self.log.warning('Line: {}: No end dates for cycle started on {} for {}'
-                                     .format(line_num, date_to_string(start_date), case_id))
-                    end_date = parse_date(FOREVER)
-                if (start_date <= date <= end_date) or (first_date > date >= pre_date):
-                    if first_date > date >= pre_date:
-                        self.log.info(
-                            'Line: {}: Date: {} is before first cycle, but within {}'.format(line_num, visit_date,
-                                                                                             PREDATE)
-                            + ' days before first cycle started: {}, connected to first cycle'
-                            .format(date_to_string(first_date)))
-                    connect_stmt = 'MATCH (v:{} {{ {}: $visit_id }}) '.format(VISIT_NODE, VISIT_ID)
-                    connect_stmt += 'MATCH (c:{}) WHERE id(c) = $cycle_id '.format(CYCLE_NODE)
-                    connect_stmt += 'MERGE (v)-[r:{} {{ {}: true }}]->(c)'.format(relationship_name, INFERRED)
-                    connect_stmt += ' ON CREATE SET r.{} = datetime()'.format(CREATED)
-                    connect_stmt += ' ON MATCH SET r.{} = datetime()'.format(UPDATED)
-
-                    cnt_result = session.run(connect_stmt, {'visit_id': visit_id, 'cycle_id': cycle_data[CYCLE_ID]})
-                    relationship_created = cnt_result.consume().counters.relationships_created
-                    if relationship_created > 0:
-                        self.relationships_created += relationship_created
-                        self.relationships_stat[relationship_name] = \
-                            self.relationships_stat.get(relationship_name, 0) + relationship_created
-                        return True
-                    else:
-                        self.log.error(
-                            'Line: {}: Create (:visit)-[:of_cycle]->(:cycle) relationship failed!'.format(line_num))
-                        return False
+                    self.log.error(
+                        'Line: {}: Create (:visit)-[:of_cycle]->(:cycle) relationship failed!'.format(line_num))
+                    return False
             self.log.warning('Line: {}: Date: {} does not belong to any cycles, connected to case {} directly!'.format(
                 line_num, visit_date, case_id))
             return self.connect_visit_to_case(session, line_num, visit_id, case_id)
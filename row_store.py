@@ -0,0 +1,191 @@
+import pickle
+import tempfile
+import threading
+
+DEFAULT_MEMORY_LIMIT_MB = 512
+ROWS_PER_BLOCK = 1000
+
+
+class RowStoreBudget:
+    """
+    Memory shared by the row stores of all data files. When the blocks kept in memory by all stores together exceed
+    the limit, the stores using most memory are moved to temporary files until the total is within the limit again.
+    """
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT_MB * 1024 * 1024):
+        self.memory_limit = memory_limit
+        self.stores = []
+        self.lock = threading.Lock()
+
+    def add_store(self, store):
+        with self.lock:
+            self.stores.append(store)
+
+    def remove_store(self, store):
+        with self.lock:
+            if store in self.stores:
+                self.stores.remove(store)
+
+    def get_memory_used(self):
+        with self.lock:
+            return sum(store.memory_used for store in self.stores)
+
+    def enforce(self):
+        """
+        Spill stores, largest first, until memory used by all stores is within the limit
+        """
+        with self.lock:
+            stores = sorted(self.stores, key=lambda store: store.memory_used, reverse=True)
+        memory_used = sum(store.memory_used for store in stores)
+        for store in stores:
+            if memory_used <= self.memory_limit:
+                break
+            memory_used -= store.memory_used
+            store.spill()
+
+
+class RowStore:
+    """
+    Append-only store of the rows of one data file, each row is kept as (line number, cleaned row, prepared row)
+
+    Rows are pickled in blocks as value tuples, the key tuples of rows are interned so that each distinct header is
+    only stored once. Cleaned values that are unchanged in the prepared row are pickled once for both.
+    Blocks are kept in memory while the pickled blocks of all stores sharing the budget fit in its limit,
+    after that blocks of the largest stores are moved to temporary files and read back from there.
+    """
+    def __init__(self, budget=None):
+        self.budget = budget if budget is not None else RowStoreBudget()
+        self.budget.add_store(self)
+        self.key_tuples = []
+        self.key_ids = {}
+        self.block = []
+        self.blocks = []
+        # (offset, length) of blocks spilled to temp file
+        self.block_offsets = []
+        self.memory_used = 0
+        self.temp_file = None
+        self.lock = threading.Lock()
+        self.row_count = 0
+
+    def _get_key_id(self, keys):
+        key_id = self.key_ids.get(keys)
+        if key_id is None:
+            key_id = len(self.key_tuples)
+            self.key_tuples.append(keys)
+            self.key_ids[keys] = key_id
+        return key_id
+
+    def append(self, line_num, obj, prepared):
+        """
+        Add a row to the store
+        :param line_num: line number of the row in data file
+        :param obj: cleaned row (dict)
+        :param prepared: prepared row (dict), or None if row can't be prepared
+        """
+        if prepared is None:
+            self.append_values(line_num, tuple(obj.keys()), tuple(obj.values()))
+        else:
+            self.append_values(line_num, tuple(obj.keys()), tuple(obj.values()), tuple(prepared.keys()),
+                               tuple(prepared.values()))
+
+    def append_values(self, line_num, obj_keys, obj_values, prepared_keys=None, prepared_values=None):
+        """
+        Add a row to the store as key and value tuples
+        :param line_num: line number of the row in data file
+        :param obj_keys: keys of cleaned row
+        :param obj_values: values of cleaned row
+        :param prepared_keys: keys of prepared row, or None if row can't be prepared
+        :param prepared_values: values of prepared row
+        """
+        if prepared_keys is None:
+            self.block.append((line_num, self._get_key_id(obj_keys), obj_values, None, None))
+        else:
+            # Share unchanged values with prepared row, so pickle stores them once
+            prepared_obj = dict(zip(prepared_keys, prepared_values))
+            obj_values = tuple(self._share_value(prepared_obj.get(key, value), value)
+                               for key, value in zip(obj_keys, obj_values))
+            self.block.append((line_num, self._get_key_id(obj_keys), obj_values, self._get_key_id(prepared_keys),
+                               prepared_values))
+        self.row_count += 1
+        if len(self.block) >= ROWS_PER_BLOCK:
+            self._save_block()
+
+    @staticmethod
+    def _share_value(prepared_value, value):
+        if type(prepared_value) is type(value) and prepared_value == value:
+            return prepared_value
+        return value
+
+    def finish(self):
+        """
+        Save rows still buffered, must be called after the last row is appended
+        """
+        if self.block:
+            self._save_block()
+
+    def _save_block(self):
+        data = pickle.dumps(self.block, protocol=pickle.HIGHEST_PROTOCOL)
+        self.block = []
+        with self.lock:
+            if self.temp_file:
+                self._write_to_temp_file(data)
+                return
+            self.blocks.append(data)
+            self.memory_used += len(data)
+        self.budget.enforce()
+
+    def spill(self):
+        """
+        Move blocks kept in memory to a temporary file, may be called by other threads sharing the budget
+        """
+        with self.lock:
+            if self.temp_file:
+                return
+            self.temp_file = tempfile.TemporaryFile(prefix='row_store_')
+            for data in self.blocks:
+                self._write_to_temp_file(data)
+            self.blocks = []
+            self.memory_used = 0
+
+    def _write_to_temp_file(self, data):
+        offset = self.temp_file.seek(0, 2)
+        self.temp_file.write(data)
+        self.block_offsets.append((offset, len(data)))
+
+    def _read_block(self, index):
+        with self.lock:
+            if self.temp_file:
+                offset, length = self.block_offsets[index]
+                self.temp_file.seek(offset)
+                data = self.temp_file.read(length)
+            else:
+                data = self.blocks[index]
+        return pickle.loads(data)
+
+    def is_spilled(self):
+        return self.temp_file is not None
+
+    def __len__(self):
+        return self.row_count
+
+    def __iter__(self):
+        # Blocks keep their order when spilled, so reading can continue if store is spilled while iterating
+        block_count = len(self.block_offsets) if self.temp_file else len(self.blocks)
+        key_tuples = self.key_tuples
+        for index in range(block_count):
+            for line_num, obj_keys, obj_values, prepared_keys, prepared_values in self._read_block(index):
+                obj = dict(zip(key_tuples[obj_keys], obj_values))
+                if prepared_keys is None:
+                    prepared = None
+                else:
+                    prepared = dict(zip(key_tuples[prepared_keys], prepared_values))
+                yield line_num, obj, prepared
+
+    def close(self):
+        with self.lock:
+            if self.temp_file:
+                self.temp_file.close()
+                self.temp_file = None
+            self.blocks = []
+            self.block_offsets = []
+            self.memory_used = 0
+        self.budget.remove_store(self)
@@ -0,0 +1,40 @@
+import unittest
+from neo4j.exceptions import TransientError, ServiceUnavailable, ClientError
+from adaptive_batch import AdaptiveBatchSize, is_retriable_error, get_retry_delay, TARGET_COMMIT_SECONDS, \
+    RETRY_MAX_DELAY
+
+
+class TestAdaptiveBatch(unittest.TestCase):
+    def test_batch_size(self):
+        self.assertRaises(ValueError, AdaptiveBatchSize, 0, 10)
+        self.assertRaises(ValueError, AdaptiveBatchSize, 100, 10)
+        batch_size = AdaptiveBatchSize(100, 2000, 1000)
+        # Partial batches don't grow the size
+        batch_size.update(10, 0)
+        self.assertEqual(batch_size.size, 1000)
+        batch_size.update(1000, 0)
+        self.assertEqual(batch_size.size, 1500)
+        batch_size.update(1500, 0)
+        self.assertEqual(batch_size.size, 2000)
+        batch_size.update(2000, TARGET_COMMIT_SECONDS * 2)
+        self.assertEqual(batch_size.size, 1000)
+        for i in range(10):
+            batch_size.shrink()
+        self.assertEqual(batch_size.size, 100)
+
+    def test_retriable_error(self):
+        deadlock = TransientError()
+        deadlock.code = 'Neo.TransientError.Transaction.DeadlockDetected'
+        self.assertTrue(is_retriable_error(deadlock))
+        terminated = TransientError()
+        terminated.code = 'Neo.TransientError.Transaction.Terminated'
+        self.assertFalse(is_retriable_error(terminated))
+        self.assertTrue(is_retriable_error(ServiceUnavailable()))
+        self.assertFalse(is_retriable_error(ClientError()))
+        self.assertFalse(is_retriable_error(ValueError()))
+        self.assertLess(get_retry_delay(1), get_retry_delay(2))
+        self.assertEqual(get_retry_delay(100), RETRY_MAX_DELAY)
+
+
+if __name__ == '__main__':
+    unittest.main()
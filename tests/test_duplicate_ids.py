@@ -0,0 +1,23 @@
+import unittest
+from duplicate_ids import DuplicateIdDetector
+
+
+class TestDuplicateIdDetector(unittest.TestCase):
+    def test_check(self):
+        detector = DuplicateIdDetector(capacity=2)
+        self.assertIsNone(detector.check('case1', 'props1', 2))
+        self.assertIsNone(detector.check('case2', 'props2', 3))
+        self.assertEqual(detector.check('case1', 'props1', 4), (False, [2]))
+        self.assertEqual(detector.check('case1', 'props3', 5), (True, [2]))
+        self.assertEqual(detector.check('case1', 'props1', 6), (False, [2, 5]))
+        self.assertEqual(detector.check('case1', 'props3', 7), (True, [2, 5]))
+        # Table grows while IDs are added
+        for line_num in range(8, 108):
+            self.assertIsNone(detector.check('sample{}'.format(line_num), 'props', line_num))
+        self.assertEqual(len(detector), 102)
+        self.assertEqual(detector.check('case2', 'props2', 108), (False, [3]))
+        self.assertEqual(detector.check('sample50', 'other', 109), (True, [50]))
+
+
+if __name__ == '__main__':
+    unittest.main()
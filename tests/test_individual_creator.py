@@ -0,0 +1,101 @@
+import unittest
+from types import SimpleNamespace
+from icdc_schema import ICDC_Schema
+from props import Props
+from bento.common.utils import NODE_LOADED
+from loader_plugins.individual_creator import IndividualCreator, REGISTRATION_NODE
+
+
+class FakeResult(list):
+    def __init__(self, records, nodes_created=0, relationships_created=0):
+        super().__init__(records)
+        self.counters = SimpleNamespace(nodes_created=nodes_created, relationships_created=relationships_created)
+
+    def single(self):
+        return self[0]
+
+    def consume(self):
+        return self
+
+
+class FakeSession:
+    """
+    Answers the statements of IndividualCreator from registration records, records created individuals and
+    connections
+    """
+    def __init__(self, registration_records, max_id=None):
+        self.registration_records = registration_records
+        self.max_id = max_id
+        self.created = []
+        self.connections = []
+
+    def run(self, statement, params=None):
+        if 'max(' in statement:
+            return FakeResult([{'max_id': self.max_id}])
+        if 'MERGE' in statement:
+            self.connections.extend((row['c_id'], row['i_id']) for row in params['rows'])
+            return FakeResult([], relationships_created=len(params['rows']))
+        if 'CREATE' in statement:
+            records = []
+            for row in params['rows']:
+                self.created.append(row)
+                records.append({'r_id': row['r_id'], 'node_id': 1000 + len(self.created)})
+            return FakeResult(records, nodes_created=len(records))
+        return FakeResult([record for record in self.registration_records if record['r_id'] in params['ids']])
+
+
+def registration(r_id, r_node, c_id, i_ids=()):
+    return {'r_id': r_id, 'r_node': r_node, 'c_id': c_id, 'i_ids': list(i_ids)}
+
+
+def rows(*r_ids):
+    return [{'line_num': line_num, 'src': {'type': REGISTRATION_NODE, 'uuid': r_id}}
+            for line_num, r_id in enumerate(r_ids, 2)]
+
+
+class TestIndividualCreator(unittest.TestCase):
+    def setUp(self):
+        props = Props('../config/props-icdc-pmvp.yml')
+        self.schema = ICDC_Schema(['../examples/icdc/data-model/icdc-model.yml',
+                                   '../examples/icdc/data-model/icdc-model-props.yml'], props)
+        self.creator = IndividualCreator(self.schema)
+
+    def test_chained_registrations(self):
+        # r2 shares case 2 with r1, so it reuses the individual r1 creates in the same chunk
+        session = FakeSession([registration('r1', 10, 1), registration('r1', 10, 2),
+                               registration('r2', 11, 2), registration('r2', 11, 3),
+                               registration('r3', 12, 4, [500]), registration('r3', 12, 5)], max_id=9)
+        results = self.creator.create_nodes(session, NODE_LOADED, rows('r1', 'r2', 'r3', 'r1'))
+        self.assertListEqual(results, [True, False, False, False])
+        self.assertListEqual([row['i_id'] for row in session.created], ['0010'])
+        self.assertListEqual(session.connections, [(1, 1001), (2, 1001), (3, 1001), (5, 500)])
+        self.assertEqual(self.creator.nodes_created, 1)
+        self.assertEqual(self.creator.relationships_created, 4)
+
+    def test_registration_on_several_nodes(self):
+        # Only the first registration node of an ID is used
+        session = FakeSession([registration('r1', 10, 1), registration('r1', 10, 2),
+                               registration('r1', 11, 3), registration('r1', 11, 4)])
+        self.assertListEqual(self.creator.create_nodes(session, NODE_LOADED, rows('r1')), [True])
+        self.assertListEqual(session.connections, [(1, 1001), (2, 1001)])
+
+    def test_more_than_one_individual(self):
+        session = FakeSession([registration('r1', 10, 1, [500]), registration('r1', 10, 2, [501])])
+        self.assertRaises(Exception, self.creator.create_nodes, session, NODE_LOADED, rows('r1'))
+        self.assertListEqual(session.created, [])
+
+    def test_allocate_individual_ids(self):
+        # Same zero-padding as apoc.number.format(id, '0000')
+        self.assertListEqual(self.creator.allocate_individual_ids(FakeSession([]), 2), ['0001', '0002'])
+        self.assertListEqual(self.creator.allocate_individual_ids(FakeSession([], max_id=9), 1), ['0010'])
+        self.assertListEqual(self.creator.allocate_individual_ids(FakeSession([], max_id=12345), 1), ['12346'])
+        # Largest ID is read again for every batch
+        session = FakeSession([registration('r1', 10, 1), registration('r1', 10, 2)], max_id=20)
+        self.creator.create_nodes(session, NODE_LOADED, rows('r1'))
+        session.max_id = 30
+        self.creator.create_nodes(session, NODE_LOADED, rows('r1'))
+        self.assertListEqual([row['i_id'] for row in session.created], ['0021', '0031'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,45 @@
 import unittest
 import os
+import tempfile
 from bento.common.utils import get_logger, removeTrailingSlash, UUID
-from data_loader import DataLoader
+from data_loader import DataLoader, check_encoding
+from row_store import RowStore, RowStoreBudget
+from bento.common.utils import NODE_LOADED
+from columnar_loader import ColumnarDataLoader
 from icdc_schema import ICDC_Schema
 from props import Props
 from neo4j import GraphDatabase
 
 
 
+class RecordingPlugin:
+    """
+    NODE_LOADED plugin recording rows it's called with
+    """
+    def __init__(self, node_type):
+        self.node_type = node_type
+        self.nodes_stat = {}
+        self.nodes_stat_updated = {}
+        self.relationships_stat = {}
+        self.nodes_created = 0
+        self.nodes_updated = 0
+        self.relationships_created = 0
+        self.calls = []
+
+    def should_run(self, node_type, event):
+        return node_type == self.node_type and event == NODE_LOADED
+
+    def create_node(self, session, **kwargs):
+        self.calls.append(('create_node', kwargs))
+        return True
+
+
+class BatchRecordingPlugin(RecordingPlugin):
+    def create_nodes(self, session, event, rows):
+        self.calls.append(('create_nodes', rows))
+        return [row['line_num'] % 2 == 0 for row in rows]
+
+
 class TestLoader(unittest.TestCase):
     def setUp(self):
         uri = 'bolt://localhost:7687'
@@ -50,10 +82,133 @@ class TestLoader(unittest.TestCase):
         result = self.loader.validate_parents_exist_in_file('data/pathology-reports-success.txt', 100)
         self.assertTrue(result)
 
+    def test_index_dataset(self):
+        loader = DataLoader(None, self.schema)
+        self.assertFalse(loader.validate_parents_exist_in_file('data/Dataset/NCATS-COP01-diagnosis.txt', 10))
+        loader.index_dataset(self.file_list)
+        self.assertEqual(len(loader.dataset_parent_ids[('case', 'case_id')]), 60)
+        # Parents defined in data files are validated without DB
+        for file_name in self.file_list:
+            self.assertTrue(loader.validate_parents_exist_in_file(file_name, 10))
+            self.assertTrue(loader.validate_cases_exist_in_file(file_name, 10))
+        self.assertFalse(loader.validate_parents_exist_in_file('data/pathology-reports-failure.txt', 10))
+        loader.clear_parent_id_cache()
+        self.assertIsNone(loader.dataset_parent_ids)
+
     def test_duplicated_ids(self):
         self.assertTrue(self.loader.validate_file('data/Dataset/NCATS-COP01-case.txt', 10))
         self.assertFalse(self.loader.validate_file('data/NCATS01-case-dup.txt', 10))
 
+    def test_validate_files_in_workers(self):
+        file_list = ['data/Dataset/NCATS-COP01-case.txt', 'data/NCATS01-case-dup.txt']
+        results = [self.loader.validate_file(file_name, 10, False) for file_name in file_list]
+        loader = DataLoader(self.driver, self.schema)
+        loader.validation_workers = 2
+        self.assertListEqual(loader.validate_files_in_workers(file_list, 10, False), results)
+        self.assertListEqual(list(loader.df_validation_dict.keys()), list(self.loader.df_validation_dict.keys()))
+
+    def test_validate_file_in_chunks(self):
+        file_name = 'data/NCATS01-case-dup.txt'
+        loader = DataLoader(self.driver, self.schema)
+        loader.validation_chunk_size = 0.001
+        chunks = loader.get_validation_chunks(file_name)
+        self.assertGreater(len(chunks), 1)
+        with open(file_name, 'rb') as in_file:
+            data = in_file.read()
+        for start, end in chunks:
+            self.assertEqual(data[start - 1:start], b'\n')
+        file_encoding = check_encoding(file_name)
+        chunk_results = [loader.validate_chunk(file_name, file_encoding, start, end, False) for start, end in chunks]
+        records = list(loader.validate_rows(((line_num, obj) for line_num, obj, _ in
+                                             self.loader.get_row_store(file_name)), False))
+        self.assertListEqual(list(loader.get_chunk_records(chunk_results)), records)
+
+    def test_row_store_budget(self):
+        budget = RowStoreBudget(1024 * 1024)
+        large_store = RowStore(budget)
+        small_store = RowStore(budget)
+        for line_num in range(2, 1002):
+            large_store.append(line_num, {'type': 'case', 'case_id': str(line_num)}, {'case_id': str(line_num)})
+        small_store.append(2, {'type': 'case', 'case_id': '2'}, None)
+        small_store.finish()
+        self.assertEqual(budget.get_memory_used(), large_store.memory_used + small_store.memory_used)
+        # Largest store is spilled when stores together exceed the limit
+        budget.memory_limit = budget.get_memory_used() - 1
+        budget.enforce()
+        self.assertTrue(large_store.is_spilled())
+        self.assertFalse(small_store.is_spilled())
+        self.assertListEqual(list(small_store), [(2, {'type': 'case', 'case_id': '2'}, None)])
+        self.assertEqual(list(large_store)[-1], (1001, {'type': 'case', 'case_id': '1001'}, {'case_id': '1001'}))
+        large_store.close()
+        small_store.close()
+        self.assertEqual(budget.get_memory_used(), 0)
+
+    def test_get_sample_rows(self):
+        file_name = 'data/NCATS01-case-dup.txt'
+        rows = list(self.loader.get_row_store(file_name))
+        first_rows, sampled_rows, row_count = self.loader.get_sample_rows(file_name, 5)
+        self.assertEqual(row_count, len(rows))
+        self.assertListEqual(first_rows, [(line_num, obj) for line_num, obj, _ in rows[:5]])
+        self.assertEqual(len(sampled_rows), min(5, len(rows) - 5))
+        # Same rows are sampled in every run
+        self.assertListEqual(self.loader.get_sample_rows(file_name, 5)[1], sampled_rows)
+        self.assertTrue(self.loader.validate_file_sample('data/Dataset/NCATS-COP01-case.txt', 5, False))
+
+    def test_run_node_loaded_plugins(self):
+        batch_plugin = BatchRecordingPlugin('case')
+        row_plugin = RecordingPlugin('case')
+        other_plugin = RecordingPlugin('sample')
+        loader = DataLoader(None, self.schema, plugins=[batch_plugin, row_plugin, other_plugin])
+        loader.loaded_nodes = [(2, 'case', 'case_id', 'c1'), (3, 'case', 'case_id', 'c2'),
+                               (5, 'case', 'case_id', 'c1'), (4, 'cohort', 'cohort_id', 'c1')]
+        loader.run_node_loaded_plugins(None, False)
+        # Nodes loaded more than once are processed once, with the line they were first loaded at
+        rows = [{'line_num': 2, 'src': {'type': 'case', 'case_id': 'c1'}},
+                {'line_num': 3, 'src': {'type': 'case', 'case_id': 'c2'}}]
+        self.assertListEqual(batch_plugin.calls, [('create_nodes', rows)])
+        self.assertListEqual(row_plugin.calls, [('create_node', row) for row in rows])
+        self.assertListEqual(other_plugin.calls, [])
+        self.assertEqual(loader.plugin_timings['BatchRecordingPlugin'][:2], (2, 1))
+        self.assertEqual(loader.plugin_timings['RecordingPlugin'][:2], (2, 2))
+        with self.assertLogs(loader.log, 'INFO') as logs:
+            loader.log_plugin_timings()
+        self.assertIn('Plugin BatchRecordingPlugin: 2 loaded node(s) processed, 1 intermediate node(s) created',
+                      logs.output[0])
+        self.assertIn('Plugin RecordingPlugin: 2 loaded node(s) processed, 2 intermediate node(s) created',
+                      logs.output[1])
+
+    def test_check_encoding(self):
+        self.assertEqual(check_encoding('data/Dataset/NCATS-COP01-case.txt'), 'utf-8')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_name = os.path.join(temp_dir, 'windows.txt')
+            with open(file_name, 'wb') as data_file:
+                data_file.write(b'type\tcase_id\ncase\tcaf\xe9\n')
+            self.assertEqual(check_encoding(file_name), 'windows-1252')
+            # Incomplete UTF-8 sequence at the end of file
+            with open(file_name, 'wb') as data_file:
+                data_file.write(b'type\tcase_id\ncase\tcaf\xc3')
+            self.assertEqual(check_encoding(file_name), 'windows-1252')
+
+    def test_columnar_loader(self):
+        columnar_loader = ColumnarDataLoader(self.driver, self.schema)
+        for file_name in self.file_list:
+            rows = list(self.loader.get_row_store(file_name))
+            self.assertListEqual(list(columnar_loader.get_row_store(file_name)), rows)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_name = os.path.join(temp_dir, 'case.txt')
+            with open(file_name, 'w') as data_file:
+                data_file.write('type\tcase_id\tcohort.cohort_id\n case \t 123 \tabc\n\ncase\t456\t\n')
+            rows = list(columnar_loader.get_row_store(file_name))
+            self.assertListEqual(rows, list(self.loader.get_row_store(file_name)))
+            self.assertEqual([row[0] for row in rows], [2, 3])
+
+    def test_get_fused_files(self):
+        fused_files = self.loader.get_fused_files(self.file_list)
+        self.assertSetEqual(fused_files, {"data/Dataset/COP-program.txt", "data/Dataset/NCATS-COP01-diagnosis.txt",
+                                          "data/Dataset/NCATS-COP01_study_file.txt"})
+        levels = self.loader.get_load_levels(self.file_list)
+        self.assertSetEqual(self.loader.get_fused_files(self.file_list, levels), set(self.file_list))
+
     def test_get_signature(self):
         self.assertEqual(self.loader.get_signature({}), '{  }')
         self.assertEqual(self.loader.get_signature({'key1': 'value1'}), '{ key1: value1 }')
@@ -48,6 +48,17 @@ class TestSchema(unittest.TestCase):
         self.assertEqual(self.schema.get_id_field({'type': 'file'}), 'uuid')
         self.assertEqual(self.schema.get_id_field({'type': 'demographic'}), 'uuid')
 
+    def test_compiled_validators(self):
+        model_types = [{'Type': 'Int', 'minimum': 0.0, 'exclusiveMaximum': 10.0}, {'Type': 'Float', 'maximum': 1.5},
+                       {'Type': 'Boolean'}, {'Type': 'String', 'enum': {'a', 'b'}}, {'Type': 'Date'},
+                       {'Type': 'Array', 'item_type': {'Type': 'String', 'enum': {'a', 'b'}}}]
+        values = ['', '1', '10', '-1', '1.5', '1.6', 'abc', 'Yes', 'no way', 'a', 'c', '2020-01-01', '2020-13-45',
+                  'a*b', 'a*c']
+        for model_type in model_types:
+            validator = self.schema.compile_validator(model_type)
+            for value in values:
+                self.assertEqual(validator(value), self.schema._validate_type(model_type, value))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from validation_report import compress_line_numbers, create_report, ValidationReport, TSV_FORMAT, JSONL_FORMAT
+
+
+class TestValidationReport(unittest.TestCase):
+    def test_compress_line_numbers(self):
+        self.assertEqual(compress_line_numbers([]), '')
+        self.assertEqual(compress_line_numbers([5]), '5')
+        self.assertEqual(compress_line_numbers([9, 2, 3, 4, 7, 8, 3]), '2-4,7-9')
+        self.assertEqual(compress_line_numbers(range(3, 1001)), '3-1000')
+        self.assertEqual(compress_line_numbers([2, 4, 6]), '2,4,6')
+
+    def test_tsv_report(self):
+        columns = ['File Name', 'Property', 'Value']
+        with tempfile.TemporaryDirectory() as temp_dir:
+            report = create_report(TSV_FORMAT, os.path.join(temp_dir, 'report'), columns)
+            report.add_frame('case', pd.DataFrame({'File Name': ['case.txt'], 'Property': ['case_id']}))
+            report.add_frame('sample', pd.DataFrame({'File Name': ['sample.txt'], 'Property': ['sample_id'],
+                                                     'Value': [3]}))
+            report.close()
+            with open(report.file_name) as report_file:
+                self.assertEqual(report_file.read(), 'Node Type\tFile Name\tProperty\tValue\n'
+                                                     'case\tcase.txt\tcase_id\t\nsample\tsample.txt\tsample_id\t3\n')
+
+    def test_discard(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            report = create_report(JSONL_FORMAT, os.path.join(temp_dir, 'report'), ['Property'])
+            report.discard()
+            report.add_row('case', ['case_id'])
+            self.assertTrue(os.path.isfile(report.file_name))
+            report.discard()
+            self.assertFalse(os.path.isfile(report.file_name))
+
+    def test_close_empty_report(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            report = create_report(TSV_FORMAT, os.path.join(temp_dir, 'missing', 'report'), ['Property'])
+            report.close()
+            with open(report.file_name) as report_file:
+                self.assertEqual(report_file.read(), 'Node Type\tProperty\n')
+
+    def test_incomplete_report(self):
+        class IncompleteReport(ValidationReport):
+            def open(self):
+                pass
+
+        # Sinks missing methods fail when created, not while writing a report
+        self.assertRaises(TypeError, IncompleteReport, 'report.txt', ['Property'])
+
+
+if __name__ == '__main__':
+    unittest.main()
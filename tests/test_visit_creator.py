@@ -0,0 +1,22 @@
+import unittest
+from datetime import datetime
+from loader_plugins.visit_creator import CaseCycles, START_DATE, END_DATE, CYCLE_ID
+
+
+class TestVisitCreator(unittest.TestCase):
+    def test_case_cycles(self):
+        cycles = CaseCycles([
+            {START_DATE: datetime(2020, 2, 1), END_DATE: None, CYCLE_ID: 3},
+            {START_DATE: datetime(2020, 1, 1), END_DATE: datetime(2020, 1, 10), CYCLE_ID: 1},
+            {START_DATE: datetime(2020, 1, 5), END_DATE: datetime(2020, 1, 20), CYCLE_ID: 2}
+        ])
+        self.assertEqual(cycles.find(datetime(2019, 12, 20)), (None, False))
+        self.assertEqual(cycles.find(datetime(2019, 12, 28))[0][CYCLE_ID], 1)
+        self.assertTrue(cycles.find(datetime(2019, 12, 28))[1])
+        # Overlapping cycles, first cycle containing the date wins
+        self.assertEqual(cycles.find(datetime(2020, 1, 7))[0][CYCLE_ID], 1)
+        self.assertEqual(cycles.find(datetime(2020, 1, 15))[0][CYCLE_ID], 2)
+        self.assertEqual(cycles.find(datetime(2020, 1, 25)), (None, False))
+        # Cycles without end dates never end
+        self.assertEqual(cycles.find(datetime(2030, 1, 1))[0][CYCLE_ID], 3)
+        self.assertEqual(CaseCycles([]).find(datetime(2020, 1, 1)), (None, False))
@@ -0,0 +1,178 @@
+import csv
+import json
+import math
+import os
+from abc import ABC, abstractmethod
+
+import xlsxwriter
+
+XLSX_FORMAT = 'xlsx'
+TSV_FORMAT = 'tsv'
+JSONL_FORMAT = 'jsonl'
+REPORT_FORMATS = [XLSX_FORMAT, TSV_FORMAT, JSONL_FORMAT]
+NODE_TYPE_COLUMN = 'Node Type'
+# Same header style as pandas.DataFrame.to_excel
+HEADER_STYLE = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def compress_line_numbers(line_nums):
+    """
+    Format line numbers as a comma separated list, consecutive line numbers are written as ranges, e.g. "2,5-9,12"
+    :param line_nums: iterable of int line numbers
+    :return: str
+    """
+    parts = []
+    start = end = None
+    for line_num in sorted(set(line_nums)):
+        if end is not None and line_num == end + 1:
+            end = line_num
+            continue
+        if start is not None:
+            parts.append(str(start) if start == end else '{}-{}'.format(start, end))
+        start = end = line_num
+    if start is not None:
+        parts.append(str(start) if start == end else '{}-{}'.format(start, end))
+    return ','.join(parts)
+
+
+def json_default(value):
+    # NumPy scalars are written as numbers, other values as strings
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class ValidationReport(ABC):
+    """
+    Sink of validation report rows, rows are written to the report file as soon as they are added,
+    so memory used doesn't grow with the size of the report. The file is created when the first row is added.
+    """
+    def __init__(self, file_name, columns):
+        self.file_name = file_name
+        self.columns = columns
+        self.rows_written = 0
+        self.opened = False
+
+    def add_frame(self, node_type, df_validation_result):
+        """
+        Write rows of a report frame
+        :param node_type: node type the rows belong to
+        :param df_validation_result: DataFrame with report columns
+        """
+        for row in df_validation_result.reindex(columns=self.columns).itertuples(index=False, name=None):
+            self.add_row(node_type, [None if is_blank(value) else value for value in row])
+
+    def add_row(self, node_type, values):
+        if not self.opened:
+            self._open()
+        self.write_row(node_type, values)
+        self.rows_written += 1
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        self.open()
+        self.opened = True
+
+    @abstractmethod
+    def open(self):
+        pass
+
+    @abstractmethod
+    def write_row(self, node_type, values):
+        pass
+
+    def close(self):
+        """
+        Finish the report file, an empty report file is created if no rows were added
+        """
+        if not self.opened:
+            self._open()
+        self.finish()
+
+    @abstractmethod
+    def finish(self):
+        pass
+
+    def discard(self):
+        """
+        Close and remove the report file
+        """
+        if self.opened:
+            self.finish()
+            os.remove(self.file_name)
+            self.opened = False
+
+
+class ExcelReport(ValidationReport):
+    """
+    Excel report with a worksheet per node type, written in xlsxwriter's constant_memory mode
+    """
+    def open(self):
+        self.workbook = xlsxwriter.Workbook(self.file_name, {'constant_memory': True})
+        self.header_format = self.workbook.add_format(HEADER_STYLE)
+        # Worksheet and next row of each node type
+        self.worksheets = {}
+
+    def write_row(self, node_type, values):
+        if node_type not in self.worksheets:
+            worksheet = self.workbook.add_worksheet(node_type)
+            for col, column in enumerate(self.columns):
+                worksheet.write(0, col, column, self.header_format)
+            self.worksheets[node_type] = [worksheet, 1]
+        worksheet, row = self.worksheets[node_type]
+        for col, value in enumerate(values):
+            if value is not None:
+                worksheet.write(row, col, value)
+        self.worksheets[node_type][1] = row + 1
+
+    def finish(self):
+        self.workbook.close()
+
+
+class TsvReport(ValidationReport):
+    """
+    Tab separated report of all node types, node type is in the first column
+    """
+    def open(self):
+        self.out_file = open(self.file_name, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.out_file, delimiter='\t')
+        self.writer.writerow([NODE_TYPE_COLUMN] + self.columns)
+
+    def write_row(self, node_type, values):
+        self.writer.writerow([node_type] + ['' if value is None else value for value in values])
+
+    def finish(self):
+        self.out_file.close()
+
+
+class JsonLinesReport(ValidationReport):
+    """
+    Report with a JSON object per line, keyed by column names, node type included
+    """
+    def open(self):
+        self.out_file = open(self.file_name, 'w', encoding='utf-8')
+
+    def write_row(self, node_type, values):
+        record = {NODE_TYPE_COLUMN: node_type}
+        record.update(zip(self.columns, values))
+        self.out_file.write(json.dumps(record, default=json_default) + '\n')
+
+    def finish(self):
+        self.out_file.close()
+
+
+def create_report(report_format, file_name_base, columns):
+    """
+    Create a validation report sink
+    :param report_format: one of REPORT_FORMATS
+    :param file_name_base: report file name without extension
+    :param columns: report columns
+    """
+    report_classes = {XLSX_FORMAT: ExcelReport, TSV_FORMAT: TsvReport, JSONL_FORMAT: JsonLinesReport}
+    if report_format not in report_classes:
+        raise ValueError('Invalid validation report format: "{}"'.format(report_format))
+    return report_classes[report_format]('{}.{}'.format(file_name_base, report_format), columns)